@@ -0,0 +1,46 @@
+import argparse
+import logging
+import sys
+
+from utils.mongo_connector import DB_NAME, get_db, close_client
+from utils.index_advisor import advise
+
+def main(strict: bool = False) -> int:
+    logging.basicConfig(
+        filename="advise_indexes.log",
+        filemode="w",
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(message)s"
+    )
+
+    print(f"🔹 Explaining the registered queries against '{DB_NAME}'")
+    report = advise(get_db())
+
+    problems = 0
+    for q in report["queries"]:
+        if "error" in q:
+            flag, detail = "❌", q["error"]
+        elif q["collscan"]:
+            flag, detail = "⚠️ COLLSCAN", f"{q['docs_examined']} docs examined"
+        elif q["in_memory_sort"]:
+            flag, detail = "⚠️ SORT", f"in-memory sort after {', '.join(q['indexes'])}"
+        else:
+            flag, detail = "✅", ", ".join(q["indexes"])
+        problems += flag != "✅"
+        print(f"   {flag:<12} {q['collection']}: {q['description']} ({detail})")
+        logging.info(f"{q['collection']}: {q['description']} -> {q}")
+
+    if report["unused"]:
+        print("🔸 Indexes no registered query uses:")
+        for col, name, ops in report["unused"]:
+            usage = "no $indexStats" if ops is None else f"{ops} ops since server start"
+            print(f"   {col}.{name} ({usage})")
+
+    print(f"{'✅' if not problems else '🔸'} {problems} queries without a clean index plan.")
+    close_client()
+    return 1 if strict and problems else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="explain() the representative queries and flag COLLSCANs / unused indexes")
+    parser.add_argument("--strict", action="store_true", help="exit with 1 when a query has no clean index plan")
+    sys.exit(main(parser.parse_args().strict))
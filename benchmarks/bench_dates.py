@@ -0,0 +1,75 @@
+"""
+Micro-benchmark: extractors.date_parser vs the old strptime loop.
+
+    python -m benchmarks.bench_dates [--n 200000]
+
+The mix mirrors what an ingest sees: JSON upload/analysis/procedure dates
+plus the dotted session stamps of a TXT report (mostly distinct values).
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from extractors import date_parser
+
+
+def legacy_to_dt(x):
+    """The previous procedure_builder._to_dt: every format in order, exception per miss."""
+    if x in date_parser.NULLS:
+        return None
+    s = str(x).strip()
+    for f in date_parser.FORMATS:
+        try:
+            return datetime.strptime(s, f)
+        except Exception:
+            pass
+    return None
+
+
+def realistic_mix(n: int, seed: int = 7):
+    rnd = random.Random(seed)
+    base = datetime(2025, 7, 23, 19, 4, 10)
+    out = []
+    for _ in range(n):
+        t = base + timedelta(milliseconds=rnd.randrange(0, 2 * 86400 * 1000))
+        r = rnd.random()
+        if r < 0.80:    # TXT session stamps
+            out.append(("ts", t.strftime("%Y.%m.%d_%H.%M.%S.") + f"{t.microsecond // 1000:03d}"))
+        elif r < 0.90:  # uploadDate / analysisDate
+            out.append(("uploadDate", t.strftime("%d-%b-%Y %H:%M:%S")))
+        elif r < 0.97:  # procedureDate (few distinct values → cache hits)
+            out.append(("procedureDate", t.strftime("%d-%b-%Y")))
+        else:           # odd formats that go through strptime
+            out.append(("other", t.strftime(rnd.choice(("%d/%m/%Y", "%b %d, %Y", "%d %b %Y")))))
+    return out
+
+
+def _time(fn, values):
+    start = time.perf_counter()
+    for field, v in values:
+        fn(v, field)
+    return time.perf_counter() - start
+
+
+def main(n: int):
+    values = realistic_mix(n)
+    for field, v in values[:2000]:
+        assert legacy_to_dt(v) == date_parser.parse_datetime(v, field), v
+
+    date_parser._parse_cached.cache_clear()
+    legacy = _time(lambda v, _f: legacy_to_dt(v), values)
+    fast = _time(date_parser.parse_datetime, values)
+    info = date_parser._parse_cached.cache_info()
+
+    print(f"values: {n}")
+    print(f"legacy strptime loop: {legacy:.3f}s ({n / legacy:,.0f}/s)")
+    print(f"date_parser:          {fast:.3f}s ({n / fast:,.0f}/s)  → {legacy / fast:.1f}x")
+    print(f"cache: {info.hits} hits / {info.misses} misses")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=200_000)
+    main(parser.parse_args().n)
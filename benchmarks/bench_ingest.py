@@ -0,0 +1,240 @@
+"""
+Ingest benchmarks on a synthetic case (benchmarks.synthetic), with a
+regression gate against a stored baseline.
+
+    python -m benchmarks.bench_ingest [--errors 70] [--max-sessions 330] [--catheters 10]
+        [--repeat 5] [--sink auto|mongomock|null]
+        [--baseline benchmarks/baseline_ingest.json] [--save-baseline] [--threshold 0.25]
+
+Measured: extract_blocks_from_txt, parse_fields_inline_format (every block
+of the case), build_procedure_document, loading analysis.json + building the
+procedure and UniqueErrors docs (json_procedure; json_stream does the same with
+ijson streaming, when installed) and the write path (save_parsed_docs)
+against mongomock, or an in-process null sink that only acknowledges writes
+when mongomock isn't installed. Reports latency (mean/p50/p95), throughput
+and peak memory (tracemalloc); exits with 1 when a benchmark's mean latency
+is more than `threshold` above the baseline, and with 2 when there is no
+baseline recorded with the same parameters (the gate can't pass unchecked).
+Timings are machine-specific: record the baseline with --save-baseline on the
+machine that runs the gate.
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks import synthetic
+from utils import mongo_connector
+from utils.lightning_loader import streaming_available
+from utils.txt_parser import extract_blocks_from_txt
+from extractors.field_utils import dispatch_header
+from extractors.field_parser import parse_fields_inline_format
+from extractors.procedure_builder import build_procedure_document
+from extractors.block_classifier import SKIP, configure_classifier
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline_ingest.json")
+
+
+# ------------------ write sinks ------------------
+
+class _Result:
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+class _NullCollection:
+    """Acknowledges every write without storing anything (client-side cost only)."""
+
+    def bulk_write(self, ops, ordered=True, session=None):
+        return _Result(bulk_api_result={"nUpserted": len(ops), "nInserted": 0, "nMatched": 0, "nModified": 0})
+
+    def insert_many(self, docs, ordered=True, session=None):
+        return _Result(inserted_ids=[None] * len(docs))
+
+    def delete_many(self, flt, session=None):
+        return _Result(deleted_count=0)
+
+    def update_one(self, flt, update, upsert=False, session=None):
+        return _Result(matched_count=0, modified_count=0)
+
+    def insert_one(self, doc, session=None):
+        return _Result(inserted_id=None)
+
+    def find_one(self, *args, **kwargs):
+        return None
+
+
+class _NullDB:
+    def __getitem__(self, name):
+        return _NullCollection()
+
+
+class _NullClient:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getitem__(self, name):
+        return _NullDB()
+
+    def close(self):
+        pass
+
+
+def use_sink(sink: str) -> str:
+    """Point mongo_connector at mongomock or the null sink; returns the sink used."""
+    if sink in ("auto", "mongomock"):
+        try:
+            import mongomock
+            client_cls = mongomock.MongoClient
+            sink = "mongomock"
+        except ImportError:
+            if sink == "mongomock":
+                raise
+            client_cls, sink = _NullClient, "null"
+    else:
+        client_cls = _NullClient
+    mongo_connector.close_client()
+    mongo_connector.MongoClient = client_cls
+    return sink
+
+
+# ------------------ measurement ------------------
+
+def measure(fn, repeat: int, items: int) -> dict:
+    """Warm up once, time `repeat` calls, then one more call under tracemalloc for peak memory."""
+    fn()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    mean = statistics.fmean(timings)
+    return {
+        "mean_ms": mean * 1000,
+        "p50_ms": timings[len(timings) // 2] * 1000,
+        "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000,
+        "items": items,
+        "items_per_s": items / mean if mean > 0 else 0.0,
+        "peak_kb": peak / 1024,
+    }
+
+
+def run_benchmarks(json_path: str, txt_path: str, repeat: int) -> dict:
+    from run_ingest import (  # after use_sink()
+        parse_blocks, save_parsed_docs, load_json, build_procedure, build_unique_errors,
+    )
+
+    configure_classifier(SKIP)
+    blocks = extract_blocks_from_txt(txt_path)
+    with open(json_path, "r", encoding="utf-8") as fh:
+        j = json.load(fh)
+
+    field_jobs = []
+    for block in blocks:
+        match = dispatch_header(block[0].strip().upper())
+        if match:
+            field_jobs.append((block[1:], match.fields, match.snake_fields))
+
+    def parse_fields():
+        for body, fields, snake in field_jobs:
+            parse_fields_inline_format(body, fields, snake_fields=snake)
+
+    parsed, _, _, _ = parse_blocks(blocks, j["lightningName"])
+
+    def json_procedure(stream=False):
+        streamed = [] if stream else None
+        proc_doc = build_procedure(load_json(json_path, streamed))
+        return build_unique_errors(proc_doc, proc_doc["lightningName"], streamed)
+
+    results = {
+        "extract_blocks": measure(lambda: extract_blocks_from_txt(txt_path), repeat, len(blocks)),
+        "parse_fields": measure(parse_fields, repeat, len(field_jobs)),
+        "build_procedure": measure(lambda: build_procedure_document(j), repeat, 1),
+        "json_procedure": measure(json_procedure, repeat, 1),
+    }
+    if streaming_available():
+        results["json_stream"] = measure(lambda: json_procedure(stream=True), repeat, 1)
+    results["write_path"] = measure(lambda: save_parsed_docs(parsed), repeat, len(parsed))
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Names of the benchmarks whose mean latency regressed beyond threshold."""
+    regressed = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if base and r["mean_ms"] > base["mean_ms"] * (1 + threshold):
+            regressed.append(name)
+    return regressed
+
+
+def main(args) -> int:
+    logging.disable(logging.CRITICAL)  # ingest logging isn't configured here; keep the report readable
+    sink = use_sink(args.sink)
+    params = {"errors": args.errors, "max_sessions": args.max_sessions, "catheters": args.catheters,
+              "repeat": args.repeat, "sink": sink}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path, txt_path = synthetic.write_case(tmp, "PC-BENCH", args.errors, args.max_sessions,
+                                                   args.catheters)
+        size_mb = os.path.getsize(txt_path) / 1e6
+        results = run_benchmarks(json_path, txt_path, args.repeat)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as fh:
+            stored = json.load(fh)
+        if stored.get("params") == params:
+            baseline = stored["results"]
+        else:
+            print(f"baseline {args.baseline} was recorded with {stored.get('params')} - not comparing")
+
+    print(f"case: {args.errors} errors (max {args.max_sessions} sessions), {args.catheters} catheters, "
+          f"TXT {size_mb:.2f} MB, sink={sink}")
+    print(f"{'benchmark':<16}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'items/s':>12}{'peak KB':>10}{'vs base':>9}")
+    for name, r in results.items():
+        base = baseline.get(name)
+        delta = f"{(r['mean_ms'] / base['mean_ms'] - 1) * 100:+.0f}%" if base else "-"
+        print(f"{name:<16}{r['mean_ms']:>10.2f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+              f"{r['items_per_s']:>12,.0f}{r['peak_kb']:>10.0f}{delta:>9}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as fh:
+            json.dump({"params": params, "results": results}, fh, indent=2)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+
+    if not baseline:
+        print(f"no comparable baseline in {args.baseline}: record one on this machine with --save-baseline")
+        return 2
+    regressed = compare(results, baseline, args.threshold)
+    if regressed:
+        print(f"REGRESSION (> {args.threshold:.0%} slower than baseline): {', '.join(regressed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest benchmarks on a synthetic CARTO case")
+    parser.add_argument("--errors", type=int, default=70)
+    parser.add_argument("--max-sessions", type=int, default=330)
+    parser.add_argument("--catheters", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--sink", choices=("auto", "mongomock", "null"), default="auto")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,213 @@
+"""
+Synthetic CARTO reports for benchmarks, modeled on data/Bookmarks Data3.txt
+and data/analysis.json.
+
+    python -m benchmarks.synthetic --out /tmp/cases [--cases 10] [--errors 70]
+        [--max-sessions 330] [--catheters 10]
+
+The TXT keeps the sample's leading event blocks (ABLATION ... PATCH EVENTS,
+QDOT MICRO CATHETER) verbatim and generates the CATHETER ID and ERROR ID
+blocks: one error gets `max_sessions` occurrences (like error 948 in the
+sample, 330), the rest a short random run. The JSON is the sample with the
+lightningName, cathetersUsed and uniqueErrors lists scaled to match.
+"""
+
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+SAMPLE_TXT = os.path.join(DATA_DIR, "Bookmarks Data3.txt")
+SAMPLE_JSON = os.path.join(DATA_DIR, "analysis.json")
+
+_BASE_TS = datetime(2025, 7, 25, 7, 0, 0)
+_CATHETER_MODELS = (
+    ("SOUNDSTAR eco 8F", "D1139108F", "📡 Ultrasound Catheter", "Ultrasound Imaging | ICE | 8F"),
+    ("DECA DYNAMIC TIP", "6DYNTP001 GFUB3573", "📍 Diagnostic Catheter", "Mapping | 10 Electrodes"),
+    ("OCTARAY 2-5-2-5-2 mm, D", "D-1609-02-S", "🗺️ Mapping Catheter", "High Density Mapping | 48 Electrodes"),
+    ("FARAWAVE 31mm", "FARAWAVE 31mm", "⚡ PFA Catheter", "Pulsed Field Ablation"),
+    ("THERMOCOOL SMARTTOUCH SF-5D Catheter, Micro Electrodes", "D135107", "🔥 Ablation Catheter",
+     "RF Ablation | Contact Force | Irrigated"),
+)
+_ERROR_MESSAGES = (
+    "Force sensor calibration error",
+    "No communication with PIU detected.",
+    "Magnetic sensor signal is noisy",
+    "Catheter temperature exceeds the limit",
+)
+
+
+def _stamp(t: datetime) -> str:
+    return t.strftime("%Y.%m.%d_%H.%M.%S.") + f"{t.microsecond // 1000:03d}"
+
+
+def _duration(seconds: int) -> str:
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def _block(header: str, body) -> list:
+    # header, underline, body, then the two blank lines every sample block ends with
+    return [header, "=" * len(header), *body, "", ""]
+
+
+def _sample_prologue() -> list:
+    """Sample lines up to the first CATHETER ID block (the generic event blocks)."""
+    with open(SAMPLE_TXT, "r", encoding="utf-8") as fh:
+        lines = fh.read().splitlines()
+    end = next(i for i, ln in enumerate(lines) if ln.startswith("CATHETER ID "))
+    return lines[:end]
+
+
+def catheter_block(catheter_id: int, rnd: random.Random) -> list:
+    name, part, category, caps = rnd.choice(_CATHETER_MODELS)
+    n_events = rnd.randint(2, 8)
+    start = _BASE_TS + timedelta(seconds=rnd.randint(0, 3600))
+    times = [start + timedelta(seconds=rnd.randint(60, 900) * i) for i in range(n_events)]
+    span = int((times[-1] - times[0]).total_seconds())
+    body = [
+        f"Total Events: {n_events}",
+        f"Event Type: {name} (Part: {part}) (ID: {catheter_id})",
+        f"First Occurrence: {_stamp(times[0])}",
+        f"Last Occurrence: {_stamp(times[-1])}",
+        f"Catheter IDs: {catheter_id}",
+        f"Part Number: {part}",
+        f"Clinical Category: {category}",
+        f"Electrodes: {rnd.randint(0, 48)}",
+        f"Thermocouples: {rnd.randint(0, 6)}",
+        f"Capabilities: {caps}",
+        f"Total Duration: {_duration(span)}",
+        "",
+        "Catheter connection and disconnection event Sessions:",
+        f"• {n_events} events detected with total duration: {_duration(span)}",
+        "• Attempting to extract connection sessions from event timeline...",
+        "",
+        "Detailed event timeline:",
+    ]
+    for i, t in enumerate(times, start=1):
+        state = "Catheter Connected" if i % 2 else "Catheter disconnected"
+        body.append(f"  - Event {i}: {_stamp(t)} - Connection: {state} [Catheter ID: {catheter_id}]")
+    return _block(f"CATHETER ID {catheter_id} - {name.upper()} (PART: {part.upper()}):", body)
+
+
+def error_block(error_id: int, occurrences: int, rnd: random.Random) -> list:
+    start = _BASE_TS + timedelta(seconds=rnd.randint(0, 3600))
+    end = start + timedelta(seconds=rnd.randint(1, 6000))
+    message = rnd.choice(_ERROR_MESSAGES)
+    body = [
+        f"Total Events: {occurrences * 2} (Raw events)",
+        f"Actual Error Occurrences: {occurrences}",
+        f"Event Type: Error ID {error_id}: {message}",
+        f"First Occurrence: {_stamp(start)}",
+        f"Last Occurrence: {_stamp(end)}",
+        f"Error Frequency: {occurrences} occurrences",
+        f"Event IDs: {error_id}",
+        f"Error IDs: {error_id}",
+        f"Total Duration: {_duration(int((end - start).total_seconds()))}",
+        "",
+        "Event Sessions:",
+        f"• SUMMARY: {occurrences} actual error occurrences (from {occurrences * 2} events)",
+        *(f"• Error occurrence #{i}" for i in range(1, occurrences + 1)),
+    ]
+    return _block(f"ERROR ID {error_id}:", body)
+
+
+def _error_plan(n_errors: int, max_sessions: int, rnd: random.Random):
+    """[(error_id, occurrences)]: the first error carries max_sessions, the rest 1..40."""
+    ids = rnd.sample(range(1, 7000), n_errors)
+    return [(eid, max_sessions if i == 0 else rnd.randint(1, min(40, max_sessions)))
+            for i, eid in enumerate(ids)]
+
+
+def case_plan(n_errors: int, max_sessions: int, n_catheters: int, seed: int = 0):
+    """Catheter IDs and [(error_id, occurrences)] shared by a case's TXT and JSON."""
+    rnd = random.Random(seed)
+    return rnd.sample(range(1000, 20000), n_catheters), _error_plan(n_errors, max_sessions, rnd)
+
+
+def generate_txt(n_errors: int = 70, max_sessions: int = 330, n_catheters: int = 10, seed: int = 0) -> str:
+    catheter_ids, errors = case_plan(n_errors, max_sessions, n_catheters, seed)
+    rnd = random.Random(seed + 1)
+    lines = _sample_prologue()
+    for cid in catheter_ids:
+        lines += catheter_block(cid, rnd)
+    for eid, occurrences in errors:
+        lines += error_block(eid, occurrences, rnd)
+    return "\n".join(lines) + "\n"
+
+
+def _minutes(seconds: int) -> str:
+    sign = "-" if seconds < 0 else ""
+    seconds = abs(seconds)
+    return f"{sign}{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+def generate_analysis(lightning_name: str, n_errors: int = 70, max_sessions: int = 330,
+                      n_catheters: int = 10, seed: int = 0) -> dict:
+    """The sample analysis.json with the case name and the catheter/error lists scaled."""
+    catheter_ids, error_plan = case_plan(n_errors, max_sessions, n_catheters, seed)
+    rnd = random.Random(seed + 2)
+    with open(SAMPLE_JSON, "r", encoding="utf-8") as fh:
+        j = json.load(fh)
+
+    j["lightningName"] = lightning_name
+    catheters = []
+    for cid in catheter_ids:
+        name, part, _, _ = rnd.choice(_CATHETER_MODELS)
+        connect = rnd.randint(0, 120)
+        catheters.append({
+            "catheterID": str(cid), "name": name, "partNumber": part, "lotNumber": "",
+            "connectionTimes": [{"connect": f"{connect}:{rnd.randint(0, 59):02d}",
+                                 "disConnect": f"{connect + rnd.randint(1, 60)}:{rnd.randint(0, 59):02d}",
+                                 "lotNumber": ""}],
+        })
+    j["caseOverview"]["cathetersUsed"] = catheters
+
+    errors = [{
+        "errorId": eid,
+        "message": rnd.choice(_ERROR_MESSAGES),
+        "count": occurrences,
+        "totalDurationInMinutes": _minutes(rnd.randint(-9600, 12000)),
+        "maxDurationInMinutes": _minutes(rnd.randint(0, 600)),
+    } for eid, occurrences in error_plan]
+    # ~10% before initialization, ~10% still open at the end, like the sample
+    tenth = len(errors) // 10
+    j["systemPerformanceAndErrorAnalysis"]["uniqueErrors"] = {
+        "beforeInitialize": {"closedErrors": errors[:tenth], "unclosedErrors": []},
+        "afterInitialize": {"closedErrors": errors[tenth:len(errors) - tenth],
+                            "unclosedErrors": errors[len(errors) - tenth:]},
+    }
+    j["uniqueErrors"] = f"<span>{len(errors)}</span>"
+    return j
+
+
+def write_case(out_dir: str, lightning_name: str, n_errors: int = 70, max_sessions: int = 330,
+               n_catheters: int = 10, seed: int = 0):
+    """Write <out_dir>/<lightning_name>/{analysis.json, Bookmarks <name>.txt}; returns (json_path, txt_path)."""
+    case_dir = os.path.join(out_dir, lightning_name)
+    os.makedirs(case_dir, exist_ok=True)
+    json_path = os.path.join(case_dir, "analysis.json")
+    txt_path = os.path.join(case_dir, f"Bookmarks {lightning_name}.txt")
+    with open(json_path, "w", encoding="utf-8") as fh:
+        json.dump(generate_analysis(lightning_name, n_errors, max_sessions, n_catheters, seed), fh,
+                  ensure_ascii=False, indent=2)
+    with open(txt_path, "w", encoding="utf-8") as fh:
+        fh.write(generate_txt(n_errors, max_sessions, n_catheters, seed))
+    return json_path, txt_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic analysis.json + Bookmarks TXT cases")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--cases", type=int, default=1)
+    parser.add_argument("--errors", type=int, default=70, help="ERROR ID blocks per case")
+    parser.add_argument("--max-sessions", type=int, default=330, help="occurrences of the longest error")
+    parser.add_argument("--catheters", type=int, default=10, help="CATHETER ID blocks per case")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for i in range(args.cases):
+        paths = write_case(args.out, f"PC-SYN{i:06d}", args.errors, args.max_sessions, args.catheters,
+                           seed=args.seed + i)
+        print(*paths)
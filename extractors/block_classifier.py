@@ -0,0 +1,138 @@
+"""
+block_classifier.py
+-------------------
+Decide what to do with a block whose header is not in BLOCK_FIELDS.
+
+Order of resolution:
+1) rules file   - JSON list of {"pattern": <header regex>, "target": <collection|skip|quarantine>}
+2) decisions    - answers given interactively in earlier runs (persisted JSON cache)
+3) policy       - ask | skip | quarantine | Events
+"""
+
+import json
+import logging
+import os
+import re
+import sys
+from utils.mongo_connector import Collections
+
+SKIP = "skip"
+QUARANTINE = "quarantine"
+ASK = "ask"
+
+TARGETS = (Collections.Events, Collections.Catheter, Collections.Errors, Collections.Procedures, SKIP, QUARANTINE)
+POLICIES = (ASK, SKIP, QUARANTINE, Collections.Events)
+
+_HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RULES_PATH = os.getenv("BLOCK_RULES_PATH", os.path.join(_HERE, "block_rules.json"))
+DECISIONS_PATH = os.getenv("BLOCK_DECISIONS_PATH", os.path.join(_HERE, "block_decisions.json"))
+DEFAULT_POLICY = os.getenv("UNKNOWN_BLOCK_POLICY", ASK)
+
+# menu order of the interactive prompt (same as before)
+_MENU = {
+    1: Collections.Events,
+    2: Collections.Catheter,
+    3: Collections.Errors,
+    4: Collections.Procedures,
+    0: SKIP,
+}
+
+
+def _decision_key(header: str) -> str:
+    return header.strip().upper()
+
+
+def _load_rules(path):
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as fh:
+        raw = json.load(fh)
+    rules = []
+    for r in raw:
+        target = r.get("target")
+        if target not in TARGETS:
+            raise ValueError(f"Invalid target '{target}' in {path} (allowed: {', '.join(TARGETS)})")
+        rules.append((re.compile(r["pattern"], re.IGNORECASE), target))
+    return rules
+
+
+class BlockClassifier:
+    def __init__(self, rules_path=RULES_PATH, decisions_path=DECISIONS_PATH, policy=DEFAULT_POLICY):
+        if policy not in POLICIES:
+            raise ValueError(f"Invalid policy '{policy}' (allowed: {', '.join(POLICIES)})")
+        self.policy = policy
+        self.rules = _load_rules(rules_path)
+        self.decisions_path = decisions_path
+        self.decisions = {}
+        if decisions_path and os.path.exists(decisions_path):
+            with open(decisions_path, "r", encoding="utf-8") as fh:
+                self.decisions = json.load(fh)
+
+    def classify(self, header: str) -> str:
+        """Return a collection name, 'skip' or 'quarantine' for an unrecognized header."""
+        for pattern, target in self.rules:
+            if pattern.search(header.strip()):
+                return target
+
+        decided = self.decisions.get(_decision_key(header))
+        if decided:
+            return decided
+
+        if self.policy == ASK:
+            return self._ask(header)
+        return self.policy
+
+    def _ask(self, header: str) -> str:
+        print("\n⚠️ Block not recognized automatically.")
+        print(f"   ➤ Header: {header.strip()}")
+        print("\nChoose which collection to assign this block to:")
+        print(f"  [1] {Collections.Events}")
+        print(f"  [2] {Collections.Catheter}")
+        print(f"  [3] {Collections.Errors}")
+        print(f"  [4] {Collections.Procedures}")
+        print("  [0] Not relevant – skip this block")
+
+        try:
+            choice = int(input("Enter choice (0–4): "))
+        except EOFError:
+            # no terminal (batch/worker process) - don't remember this as a decision
+            logging.warning(f"No answer for unrecognized header '{header.strip()}', skipping")
+            return SKIP
+        except Exception:
+            print("❌ Invalid input, skipping block")
+            return SKIP
+
+        target = _MENU.get(choice)
+        if target is None:
+            print("❌ Invalid input, skipping block")
+            return SKIP
+        self.remember(header, target)
+        return target
+
+    def remember(self, header: str, target: str):
+        """Persist a decision so later cases with the same header don't ask again."""
+        self.decisions[_decision_key(header)] = target
+        if not self.decisions_path:
+            return
+        tmp = self.decisions_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(self.decisions, fh, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp, self.decisions_path)
+
+
+_classifier = None
+
+def get_classifier() -> BlockClassifier:
+    global _classifier
+    if _classifier is None:
+        _classifier = BlockClassifier()
+    return _classifier
+
+def configure_classifier(policy: str = DEFAULT_POLICY, rules_path: str = RULES_PATH,
+                         decisions_path: str = DECISIONS_PATH):
+    """Replace the process-wide classifier (also used as a ProcessPool initializer)."""
+    global _classifier
+    if policy == ASK and (sys.stdin is None or not sys.stdin.isatty()):
+        policy = SKIP
+    _classifier = BlockClassifier(rules_path=rules_path, decisions_path=decisions_path, policy=policy)
+    return _classifier
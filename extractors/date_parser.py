@@ -0,0 +1,121 @@
+"""
+date_parser.py
+--------------
+Date/datetime parsing for CARTO exports.
+
+1) Fast paths: precompiled regexes for the formats we actually get
+   ('25-Jul-2025 18:31:49', '25-Jul-2025', '2025.07.25_09.20.00.312', ISO),
+   building the datetime straight from the groups.
+2) Fallback: strptime over FORMATS, trying first the format that last
+   matched for the same field/source.
+3) An LRU cache over the raw string (the result doesn't depend on the
+   order formats are tried in, since no two formats accept the same string).
+"""
+
+import re
+from datetime import datetime
+from functools import lru_cache
+
+NULLS = (None, "", "null", "NULL", "N/A", "n/a", "na", "-")
+
+FORMATS = (
+    # date + time
+    "%d-%b-%Y %H:%M:%S",   # 25-Jul-2025 18:31:49
+    "%d/%m/%Y %H:%M:%S",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y/%m/%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S.%fZ",
+    "%Y.%m.%d_%H.%M.%S.%f",  # 2025.07.25_09.20.00.312 (TXT session stamps)
+    # date only
+    "%d-%b-%Y",            # 25-Jul-2025
+    "%d %b %Y",            # 25 Jul 2025
+    "%b %d, %Y",           # Jul 25, 2025
+    "%Y-%m-%d",
+    "%Y/%m/%d",
+    "%d/%m/%Y",
+    "%d-%m-%Y",
+)
+
+_MONTHS = {m: i for i, m in enumerate(
+    ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), start=1)}
+
+_carto_stamp_re = re.compile(r"(\d{4})\.(\d{2})\.(\d{2})_(\d{2})\.(\d{2})\.(\d{2})\.(\d{3})")
+_dmy_mon_re = re.compile(r"(\d{1,2})-([A-Za-z]{3})-(\d{4})(?: (\d{1,2}):(\d{1,2}):(\d{1,2}))?")
+_iso_re = re.compile(r"(\d{4})-(\d{2})-(\d{2})(?:[ T](\d{2}):(\d{2}):(\d{2}))?")
+
+
+def _from_carto_stamp(m):
+    y, mo, d, h, mi, s, ms = (int(g) for g in m.groups())
+    return datetime(y, mo, d, h, mi, s, ms * 1000)
+
+def _from_dmy_mon(m):
+    month = _MONTHS.get(m.group(2).lower())
+    if month is None:
+        raise ValueError(m.group(2))
+    time_part = [int(g) for g in m.groups()[3:] if g is not None]
+    return datetime(int(m.group(3)), month, int(m.group(1)), *time_part)
+
+def _from_iso(m):
+    return datetime(*(int(g) for g in m.groups() if g is not None))
+
+_FAST_PATHS = (
+    (_carto_stamp_re, _from_carto_stamp),
+    (_dmy_mon_re, _from_dmy_mon),
+    (_iso_re, _from_iso),
+)
+
+# field/source -> format that matched last time
+_learned = {}
+
+
+def _fast_parse(s: str):
+    for rx, build in _FAST_PATHS:
+        m = rx.fullmatch(s)
+        if m:
+            try:
+                return build(m)
+            except ValueError:
+                return None  # e.g. 31-Feb → let strptime decide
+    return None
+
+def _slow_parse(s: str, field=None):
+    learned = _learned.get(field)
+    order = (learned,) + FORMATS if learned else FORMATS
+    for f in order:
+        try:
+            dt = datetime.strptime(s, f)
+        except ValueError:
+            continue
+        _learned[field] = f
+        return dt
+    return None
+
+
+@lru_cache(maxsize=4096)
+def _parse_cached(s: str, field=None):
+    return _fast_parse(s) or _slow_parse(s, field)
+
+
+def parse_datetime(x, field=None):
+    """
+    Parse many date & datetime formats. Return datetime or None.
+
+    Args:
+        x: raw value (str / None)
+        field (str): field or source name, used to learn which format to try first
+    """
+    if x in NULLS:
+        return None
+    return _parse_cached(str(x).strip(), field)
+
+
+def parse_carto_stamp(s: str):
+    """'2025.07.25_09.20.00.312' → datetime (None if not a CARTO stamp)."""
+    m = _carto_stamp_re.fullmatch(s)
+    if not m:
+        return None
+    try:
+        return _from_carto_stamp(m)
+    except ValueError:
+        return None
@@ -1,12 +1,15 @@
-import re
 from utils.mongo_connector import Collections
-from .field_utils import BLOCK_FIELDS, get_block_fields, to_snake_case
+from .field_utils import BLOCK_FIELDS, SNAKE_FIELDS, dispatch_header
 from .field_parser import parse_fields_inline_format
+from .typed_fields import apply_field_types
+from .block_classifier import QUARANTINE, get_classifier
 
-def parse_event_block(block_lines, lightning_name):
+def parse_event_block(block_lines, lightning_name, classifier=None):
     """
     Parse a block of text into a MongoDB document structure.
-    Determines collection based on block type.
+    Determines collection based on block type; unrecognized headers
+    go through the BlockClassifier (rules file, remembered decisions, policy).
+    Recognized fields are typed per block type (typed_fields.FIELD_TYPES).
     """
     if not block_lines:
         return None
@@ -14,82 +17,51 @@ def parse_event_block(block_lines, lightning_name):
     header = block_lines[0].strip().upper()
     body = block_lines[1:]
 
-    block_name, valid_fields = get_block_fields(header)
-
-    # Error ID block
-    if "ERROR ID" in header:
-        match = re.search(r"ERROR ID\s*(\d+)", header)
-        error_id_from_header = match.group(1) if match else None
-        doc_data, extra = parse_fields_inline_format(body, BLOCK_FIELDS["ERROR ID BLOCK"])
-        if error_id_from_header:
-            doc_data["error_id"] = error_id_from_header
+    # Known block types (Error ID / Catheter ID / events) - one dispatcher pass
+    match = dispatch_header(header)
+    if match:
+        doc_data, extra = parse_fields_inline_format(body, match.fields, snake_fields=match.snake_fields)
+        apply_field_types(doc_data, match.name)
+        if match.id_field and match.block_id:
+            doc_data[match.id_field] = match.block_id
         return {
             "lightning_name": lightning_name,
-            "event_type": "error_id_block",
+            "event_type": match.event_type,
+            "block_type": match.name,
             **doc_data,
             "extra": extra,
-            "_collection": Collections.Errors
+            "_collection": match.collection
         }
 
-    # Catheter detail block
-    if "CATHETER ID" in header:
-        doc_data, extra = parse_fields_inline_format(body, BLOCK_FIELDS["CATHETER DETAIL BLOCK"])
-        return {
-            "lightning_name": lightning_name,
-            "event_type": "catheter_detail_block",
-            **doc_data,
-            "extra": extra,
-            "_collection": Collections.Catheter
-        }
+    # Unknown → rules file / remembered decision / policy (may ask user)
+    target = (classifier or get_classifier()).classify(block_lines[0])
 
-    # Known events
-    if block_name:
-        doc_data, extra = parse_fields_inline_format(body, valid_fields)
-        return {
-            "lightning_name": lightning_name,
-            "event_type": to_snake_case(block_name),
-            **doc_data,
-            "extra": extra,
-            "_collection": Collections.Events
-        }
-
-    # Unknown → ask user
-    print("\n⚠️ Block not recognized automatically.")
-    print(f"   ➤ Header: {block_lines[0].strip()}")
-    print("\nChoose which collection to assign this block to:")
-    print(f"  [1] {Collections.Events}")
-    print(f"  [2] {Collections.Catheter}")
-    print(f"  [3] {Collections.Errors}")
-    print(f"  [4] {Collections.Procedures}")
-    print("  [0] Not relevant – skip this block")
+    if target == Collections.Events:
+        doc_data, extra = parse_fields_inline_format(body, BLOCK_FIELDS["ABLATION EVENTS"], snake_fields=SNAKE_FIELDS["ABLATION EVENTS"])
+        apply_field_types(doc_data, "ABLATION EVENTS")
+        return {"lightning_name": lightning_name, "event_type": "manual_events_block",
+                **doc_data, "extra": extra, "_collection": Collections.Events}
 
-    try:
-        choice = int(input("Enter choice (0–4): "))
+    if target == Collections.Catheter:
+        doc_data, extra = parse_fields_inline_format(body, BLOCK_FIELDS["CATHETER DETAIL BLOCK"], snake_fields=SNAKE_FIELDS["CATHETER DETAIL BLOCK"])
+        apply_field_types(doc_data, "CATHETER DETAIL BLOCK")
+        return {"lightning_name": lightning_name, "event_type": "manual_catheter_block",
+                **doc_data, "extra": extra, "_collection": Collections.Catheter}
 
-        if choice == 1:   # Events
-            doc_data, extra = parse_fields_inline_format(body, BLOCK_FIELDS["ABLATION EVENTS"])
-            return {"lightning_name": lightning_name, "event_type": "manual_events_block",
-                    **doc_data, "extra": extra, "_collection": Collections.Events}
+    if target == Collections.Errors:
+        doc_data, extra = parse_fields_inline_format(body, BLOCK_FIELDS["ERROR ID BLOCK"], snake_fields=SNAKE_FIELDS["ERROR ID BLOCK"])
+        apply_field_types(doc_data, "ERROR ID BLOCK")
+        return {"lightning_name": lightning_name, "event_type": "manual_error_block",
+                **doc_data, "extra": extra, "_collection": Collections.Errors}
 
-        elif choice == 2:   # Catheter
-            doc_data, extra = parse_fields_inline_format(body, BLOCK_FIELDS["CATHETER DETAIL BLOCK"])
-            return {"lightning_name": lightning_name, "event_type": "manual_catheter_block",
-                    **doc_data, "extra": extra, "_collection": Collections.Catheter}
+    if target == Collections.Procedures:
+        doc_data, extra = parse_fields_inline_format(body, set())
+        return {"lightning_name": lightning_name, "event_type": "manual_procedure_block",
+                **doc_data, "extra": extra, "_collection": Collections.Procedures}
 
-        elif choice == 3:   # Errors
-            doc_data, extra = parse_fields_inline_format(body, BLOCK_FIELDS["ERROR ID BLOCK"])
-            return {"lightning_name": lightning_name, "event_type": "manual_error_block",
-                    **doc_data, "extra": extra, "_collection": Collections.Errors}
+    if target == QUARANTINE:
+        return {"lightning_name": lightning_name, "event_type": "quarantined_block",
+                "header": block_lines[0].strip(), "raw_lines": list(body),
+                "_collection": Collections.Quarantine}
 
-        elif choice == 4:   # Procedures
-            doc_data, extra = parse_fields_inline_format(body, set())
-            return {"lightning_name": lightning_name, "event_type": "manual_procedure_block",
-                    **doc_data, "extra": extra, "_collection": Collections.Procedures}
-
-        else:
-            print("➡️ Skipping block")
-            return None
-
-    except Exception:
-        print("❌ Invalid input, skipping block")
-        return None
+    return None
@@ -1,23 +1,27 @@
 import re
 from .field_utils import to_snake_case
+from .session_parser import TIMELINE_FIELDS, KEEP_RAW_TIMELINES, parse_timeline
 
-def parse_fields_inline_format(lines, valid_fields):
+_subfield_prefix_pattern = re.compile(r"^[\s]*[^A-Za-z0-9]")
+
+def parse_fields_inline_format(lines, valid_fields, snake_fields=None):
     """
     Parse block body into recognized fields + extra fields.
     
     Args:
         lines (list[str]): lines from block body
         valid_fields (set[str]): valid field names in original format
+        snake_fields (frozenset[str]): precomputed snake_case of valid_fields (optional)
     
     Returns:
         (dict, dict): doc_data (recognized fields), extra_data (others)
     """
     doc_data, extra_data = {}, {}
     i = 0
-    subfield_prefix_pattern = re.compile(r"^[\s]*[^A-Za-z0-9]")
+    subfield_prefix_pattern = _subfield_prefix_pattern
 
     # Convert valid_fields to snake_case for comparison
-    valid_snake = {to_snake_case(f) for f in valid_fields}
+    valid_snake = snake_fields if snake_fields is not None else {to_snake_case(f) for f in valid_fields}
 
     while i < len(lines):
         line = lines[i].strip()
@@ -35,7 +39,14 @@ def parse_fields_inline_format(lines, valid_fields):
                 while i < len(lines) and subfield_prefix_pattern.match(lines[i]):
                     sublines.append(lines[i].strip())
                     i += 1
-                (doc_data if snake_key in valid_snake else extra_data)[snake_key] = sublines
+                target = doc_data if snake_key in valid_snake else extra_data
+                target[snake_key] = sublines
+                if snake_key in TIMELINE_FIELDS:
+                    timeline, unparsed = parse_timeline(sublines)
+                    if timeline:
+                        target[f"{snake_key}_parsed"] = timeline
+                        if not KEEP_RAW_TIMELINES:
+                            target[snake_key] = unparsed
                 continue
 
             # Normal case
@@ -1,4 +1,6 @@
 import re
+from collections import namedtuple
+from utils.mongo_connector import Collections
 
 # === Convert field names to snake_case ===
 def to_snake_case(name: str) -> str:
@@ -66,13 +68,104 @@ BLOCK_FIELDS = {
 }
 
 
+# Precomputed snake_case field sets (parse_fields_inline_format compares in snake_case)
+SNAKE_FIELDS = {name: frozenset(to_snake_case(f) for f in fields) for name, fields in BLOCK_FIELDS.items()}
+
+
+# === Header dispatcher ===
+BlockMatch = namedtuple(
+    "BlockMatch",
+    "name fields snake_fields collection event_type id_field block_id",
+)
+
+
+class HeaderDispatcher:
+    """
+    Single-pass header → block type lookup.
+
+    All registered header patterns are compiled into one regex; registration
+    order is priority (first registered wins when several match a header).
+    If a pattern has a capture group, group 1 is returned as block_id
+    (e.g. the error ID in 'ERROR ID 105').
+    """
+
+    def __init__(self):
+        self._types = []
+        self._regex = None
+
+    def register(self, name, pattern, fields, collection, event_type=None, id_field=None):
+        """
+        Register a block type.
+
+        Args:
+            name (str): block type name (key of BLOCK_FIELDS for the built-ins)
+            pattern (str): regex searched in the upper-cased header
+            fields (set[str]): valid field names in original format
+            collection (str): target collection
+            event_type (str): stored event_type (default: snake_case of name)
+            id_field (str): doc field that receives block_id, if any
+        """
+        self._types.append((
+            re.compile(pattern),
+            BlockMatch(name, fields, frozenset(to_snake_case(f) for f in fields),
+                       collection, event_type or to_snake_case(name), id_field, None),
+        ))
+        self._regex = None
+
+    def _compiled(self):
+        if self._regex is None:
+            # zero-width lookahead at every position: overlapping tokens are all seen,
+            # and at one position the alternation picks the highest-priority type
+            alts = "|".join(f"(?P<t{i}>{rx.pattern})" for i, (rx, _) in enumerate(self._types))
+            self._regex = re.compile(f"(?=(?:{alts}))")
+        return self._regex
+
+    def dispatch(self, header: str):
+        """Return a BlockMatch for the header, or None if no block type matches."""
+        header = header.upper()
+        best, best_pos = None, 0
+        for m in self._compiled().finditer(header):
+            i = int(m.lastgroup[1:])
+            if best is None or i < best:
+                best, best_pos = i, m.start()
+                if best == 0:
+                    break
+        if best is None:
+            return None
+
+        rx, match = self._types[best]
+        m = rx.match(header, best_pos)
+        block_id = m.group(1) if m and rx.groups else None
+        return match._replace(block_id=block_id)
+
+
+def _build_default_dispatcher():
+    d = HeaderDispatcher()
+    d.register("ERROR ID BLOCK", r"ERROR ID(?:\s*(\d+))?", BLOCK_FIELDS["ERROR ID BLOCK"],
+               Collections.Errors, event_type="error_id_block", id_field="error_id")
+    d.register("CATHETER DETAIL BLOCK", r"CATHETER ID(?:\s*(\d+))?", BLOCK_FIELDS["CATHETER DETAIL BLOCK"],
+               Collections.Catheter, event_type="catheter_detail_block")
+    for block_name, fields in BLOCK_FIELDS.items():
+        d.register(block_name, re.escape(block_name), fields, Collections.Events)
+    return d
+
+
+HEADER_DISPATCHER = _build_default_dispatcher()
+
+def register_block_type(name, pattern, fields, collection, event_type=None, id_field=None):
+    """Register a new block type on the default dispatcher (see HeaderDispatcher.register)."""
+    HEADER_DISPATCHER.register(name, pattern, fields, collection, event_type=event_type, id_field=id_field)
+
+def dispatch_header(header: str):
+    return HEADER_DISPATCHER.dispatch(header)
+
+
 def get_block_fields(header: str):
     """
     Return block type name and its valid fields based on the header.
     Example: "ABLATION EVENTS" → ("ABLATION EVENTS", {...fields...})
     """
-    header = header.upper()
-    for block_name, fields in BLOCK_FIELDS.items():
-        if block_name in header:
-            return block_name, fields
-    return None, set()
+    match = dispatch_header(header)
+    if match is None:
+        return None, set()
+    return match.name, match.fields
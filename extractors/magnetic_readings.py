@@ -0,0 +1,52 @@
+import re
+from utils.mongo_connector import Collections
+from .session_parser import parse_stamp, timeline_rows
+
+MAGNETIC_BLOCK = "MAGNETIC SENSOR EVENTS"
+
+# kinds from the parsed Event Sessions that are per-channel measurements
+_READING_KINDS = {"reading", "state", "alert", "channel"}
+
+# 'Channel 18: DISCONNECTED at 2025.07.25_08.24.15.633'
+_correlation_re = re.compile(r"Channel (\d+): ([A-Z_]+) at (\S+)")
+
+
+def _measurement(lightning_name, channel, ts, **fields):
+    doc = {
+        "ts": ts,
+        "meta": {"lightning_name": lightning_name, "channel": channel},
+        "_collection": Collections.MagneticReadings,
+    }
+    doc.update({k: v for k, v in fields.items() if v is not None})
+    return doc
+
+
+def explode_magnetic_readings(doc: dict) -> list:
+    """
+    Explode a MAGNETIC SENSOR EVENTS document into time-series measurements:
+    one per channel reading / coil state change (from event_sessions_parsed)
+    and one per 'ERROR 105 CORRELATION' entry (kind='correlation').
+    Returns [] for any other block.
+    """
+    if doc.get("block_type") != MAGNETIC_BLOCK:
+        return []
+    lightning_name = doc.get("lightning_name")
+    out = []
+
+    for row in timeline_rows(doc.get("event_sessions_parsed")):
+        if row["kind"] not in _READING_KINDS or row["ts"] is None or row["channel"] is None:
+            continue
+        out.append(_measurement(
+            lightning_name, row["channel"], row["ts"],
+            kind=row["kind"], label=row["label"], value=row["value"],
+            code=row["code"], event=row["event"],
+        ))
+
+    correlation = doc.get("error_105_correlation") or ""
+    for ch, state, stamp in _correlation_re.findall(correlation):
+        ts = parse_stamp(stamp)
+        if ts is None:
+            continue
+        out.append(_measurement(lightning_name, int(ch), ts, kind="correlation", label=state))
+
+    return out
@@ -1,6 +1,7 @@
 # path: bp/pro/extractors/procedure_builder.py
 import re
-from datetime import datetime
+from .date_parser import parse_datetime
+from .typed_fields import to_seconds
 
 # ------------------ helpers ------------------
 
@@ -30,35 +31,9 @@ def _strip_html(x):
     # remove simple HTML tags
     return re.sub(r"<[^>]+>", "", s).strip()
 
-def _to_dt(x):
-    """Parse many date & datetime formats. Return datetime or None."""
-    if x in (None, "", "null", "NULL", "N/A", "n/a", "na", "-"):
-        return None
-    s = str(x).strip()
-
-    fmts = (
-        # date + time
-        "%d-%b-%Y %H:%M:%S",   # 25-Jul-2025 18:31:49
-        "%d/%m/%Y %H:%M:%S",
-        "%Y-%m-%d %H:%M:%S",
-        "%Y/%m/%d %H:%M:%S",
-        "%Y-%m-%dT%H:%M:%S",
-        "%Y-%m-%dT%H:%M:%S.%fZ",
-        # date only
-        "%d-%b-%Y",            # 25-Jul-2025
-        "%d %b %Y",            # 25 Jul 2025
-        "%b %d, %Y",           # Jul 25, 2025
-        "%Y-%m-%d",
-        "%Y/%m/%d",
-        "%d/%m/%Y",
-        "%d-%m-%Y",
-    )
-    for f in fmts:
-        try:
-            return datetime.strptime(s, f)
-        except Exception:
-            pass
-    return None  # אם לא הצליח לפרש, נשאיר None
+def _to_dt(x, field=None):
+    """Parse many date & datetime formats. Return datetime or None (see date_parser)."""
+    return parse_datetime(x, field)  # אם לא הצליח לפרש, נחזיר None
 
 _num_re = re.compile(r"[-+]?\d*\.?\d+")
 def _to_int(x):
@@ -186,9 +161,9 @@ def build_procedure_document(j):
         "piuNum": _safe(j, "piuNum"),
         "lpNum": _safe(j, "lpNum"),
 
-        "installDate": _to_dt(_safe(j, "installDate")),
-        "uploadDate": _to_dt(_safe(j, "uploadDate")),
-        "analysisDate": _to_dt(_safe(j, "analysisDate")),
+        "installDate": _to_dt(_safe(j, "installDate"), "installDate"),
+        "uploadDate": _to_dt(_safe(j, "uploadDate"), "uploadDate"),
+        "analysisDate": _to_dt(_safe(j, "analysisDate"), "analysisDate"),
 
         "lightningName": _safe(j, "lightningName"),
         "lightningDescription": _safe(j, "lightningDescription"),
@@ -206,7 +181,7 @@ def build_procedure_document(j):
         "studiesCount": _to_int(_safe(j, "studiesCount")),
 
         "findings": _as_list(findings_raw),
-        "procedureDate": _to_dt(procedure_date_raw),
+        "procedureDate": _to_dt(procedure_date_raw, "procedureDate"),
 
         "cathetersUsed": _normalize_catheters(catheters_used_raw),
 
@@ -245,3 +220,60 @@ def build_procedure_document(j):
     }
 
     return doc
+
+
+# ------------------ uniqueErrors → per-error documents ------------------
+
+def unique_error_fields(phase, kind, entry):
+    """
+    One uniqueErrors entry → its UniqueErrors document, with the case fields
+    still empty (set by build_unique_error_documents); None for entries without
+    an errorId. Durations are kept as given and parsed to signed seconds.
+    """
+    if not isinstance(entry, dict) or entry.get("errorId") in (None, ""):
+        return None
+    return {
+        "lightning_name": None,
+        "hospital_name": None,
+        "procedure_date": None,
+        "phase": phase,
+        "closed": kind.lower().startswith("closed"),
+        "error_id": str(entry["errorId"]).strip(),
+        "message": (entry.get("message") or "").strip(),
+        "count": _to_int(entry.get("count")),
+        "total_duration": entry.get("totalDurationInMinutes"),
+        "total_duration_s": to_seconds(entry.get("totalDurationInMinutes")),
+        "max_duration": entry.get("maxDurationInMinutes"),
+        "max_duration_s": to_seconds(entry.get("maxDurationInMinutes")),
+    }
+
+
+def build_unique_error_documents(proc_doc, lightning_name, streamed=()):
+    """
+    Flatten a procedure doc's uniqueErrors (beforeInitialize/afterInitialize ×
+    closedErrors/unclosedErrors) into one document per error entry, keyed like
+    the Errors collection (lightning_name + error_id as a string) so the two
+    can be joined.
+
+    streamed: unique_error_fields of the entries that were streamed out of
+    analysis.json instead of being kept in the procedure doc (run_ingest.load_json);
+    they are completed in place.
+    """
+    docs = []
+    unique_errors = proc_doc.get("uniqueErrors")
+    if isinstance(unique_errors, dict):
+        for phase, lists in unique_errors.items():
+            if not isinstance(lists, dict):
+                continue
+            for kind, entries in lists.items():
+                docs.extend(d for d in (unique_error_fields(phase, kind, e) for e in _as_list(entries)) if d)
+    docs.extend(streamed)
+
+    case = {
+        "lightning_name": lightning_name,
+        "hospital_name": proc_doc.get("hospitalName"),
+        "procedure_date": proc_doc.get("procedureDate"),
+    }
+    for d in docs:
+        d.update(case)
+    return docs
@@ -0,0 +1,127 @@
+import os
+import re
+from .date_parser import parse_carto_stamp
+
+# Only the lines that did not convert (e.g. SUMMARY / cluster lines) are kept next
+# to the parsed timeline; set to 1 to keep every original bullet string as well
+KEEP_RAW_TIMELINES = os.getenv("KEEP_RAW_TIMELINES", "0") == "1"
+
+# Sub-list fields whose bullet lines are converted to timeline records
+TIMELINE_FIELDS = {
+    "event_sessions",
+    "detailed_event_timeline",
+    "catheter_connection_and_disconnection_event_sessions",
+}
+
+# Column order of a stored timeline; all-None columns are dropped (except kind/ts)
+TIMELINE_COLUMNS = ("event", "ts", "channel", "kind", "label", "value", "code", "connected", "end_ts", "duration_s")
+
+_STAMP = r"\d{4}\.\d{2}\.\d{2}_\d{2}\.\d{2}\.\d{2}\.\d{3}"
+
+_bullet_re = re.compile(r"^[\s•\-*]+")
+_event_re = re.compile(rf"^Event (\d+): ({_STAMP}) - \s*(.*)$")
+_session_re = re.compile(rf"^Session (\d+): ({_STAMP}) to ({_STAMP}) \(Duration: (-?\d+):(\d{{2}}):(\d{{2}})\)")
+_channel_ctx_re = re.compile(r"\bChannel (\d+)\b")
+
+_reading_re = re.compile(r"^(First reading|Last reading|Min value|Max value): ([-+]?\d*\.?\d+)")
+_state_re = re.compile(r"^(?:\W+\s*)?State: ([A-Z_]+) \(Code: (-?\d+)\)")
+_alert_re = re.compile(r"^(?:\W+\s*)?([A-Z_]+): Impedance=([-+]?\d*\.?\d+)")
+_connection_re = re.compile(r"^Connection: (Catheter (connected|disconnected))\b", re.IGNORECASE)
+_channel_only_re = re.compile(r"^Channel (\d+)$")
+
+
+# '2025.07.25_09.20.00.312' → datetime (None if not a CARTO stamp)
+parse_stamp = parse_carto_stamp
+
+
+def _record(**kw):
+    return {c: kw.get(c) for c in TIMELINE_COLUMNS}
+
+
+def parse_timeline_line(line: str, channel=None):
+    """
+    Parse one bullet line of a session/timeline list.
+
+    Returns:
+        (dict|None, int|None): record (None for summary/context lines), channel context after this line
+    """
+    text = _bullet_re.sub("", line).strip()
+
+    m = _session_re.match(text)
+    if m:
+        h, mi, sec = abs(int(m.group(4))), int(m.group(5)), int(m.group(6))
+        sign = -1 if m.group(4).startswith("-") else 1
+        return _record(event=int(m.group(1)), ts=parse_stamp(m.group(2)), kind="session",
+                       end_ts=parse_stamp(m.group(3)),
+                       duration_s=sign * (h * 3600 + mi * 60 + sec)), channel
+
+    m = _event_re.match(text)
+    if not m:
+        # context line ('Channel 18 (CRITICAL ...)', 'Impedance Timeline (Channel 0):') or summary
+        c = _channel_ctx_re.search(text)
+        return None, int(c.group(1)) if c else channel
+
+    event, ts, desc = int(m.group(1)), parse_stamp(m.group(2)), m.group(3).strip()
+
+    r = _reading_re.match(desc)
+    if r:
+        return _record(event=event, ts=ts, channel=channel, kind="reading",
+                       label=r.group(1), value=float(r.group(2))), channel
+
+    r = _state_re.match(desc)
+    if r:
+        return _record(event=event, ts=ts, channel=channel, kind="state",
+                       label=r.group(1), code=int(r.group(2))), channel
+
+    r = _alert_re.match(desc)
+    if r:
+        return _record(event=event, ts=ts, channel=channel, kind="alert",
+                       label=r.group(1), value=float(r.group(2))), channel
+
+    r = _connection_re.match(desc)
+    if r:
+        return _record(event=event, ts=ts, channel=channel, kind="connection",
+                       label=r.group(1), connected=r.group(2).lower() == "connected"), channel
+
+    r = _channel_only_re.match(desc)
+    if r:
+        ch = int(r.group(1))
+        return _record(event=event, ts=ts, channel=ch, kind="channel"), ch
+
+    return _record(event=event, ts=ts, channel=channel, kind="event", label=desc), channel
+
+
+def parse_timeline(lines):
+    """
+    Convert session/timeline bullet lines into a columnar timeline.
+
+    Returns:
+        (dict|None, list[str]): {column: [values...]} (None if no line parsed), unparsed lines
+    """
+    rows, unparsed = [], []
+    channel = None
+    for ln in lines:
+        rec, channel = parse_timeline_line(ln, channel)
+        if rec is None:
+            unparsed.append(ln)
+        else:
+            rows.append(rec)
+
+    if not rows:
+        return None, unparsed
+
+    columns = {}
+    for c in TIMELINE_COLUMNS:
+        values = [r[c] for r in rows]
+        if c in ("kind", "ts") or any(v is not None for v in values):
+            columns[c] = values
+    return columns, unparsed
+
+
+def timeline_rows(timeline: dict):
+    """Iterate a stored columnar timeline back as row dicts."""
+    if not timeline:
+        return
+    n = len(timeline["kind"])
+    for i in range(n):
+        yield {c: (timeline[c][i] if c in timeline else None) for c in TIMELINE_COLUMNS}
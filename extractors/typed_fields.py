@@ -0,0 +1,131 @@
+"""
+typed_fields.py
+---------------
+Per block type schema: converts the recognized fields of a block (all text
+after parse_fields_inline_format) to typed values at parse time, so the
+stored documents are smaller and `$sum` / `$gte` work on them directly.
+
+    'Total Events: 8 (Raw events)'              → total_events: 8
+    'Ablation Sessions: 13 (from 26 events)'    → ablation_sessions: 13
+    'Total Duration: 36:04:32'                  → total_duration_s: 129872
+    'First Occurrence: 2025.07.23_19.04.10.487' → first_occurrence: datetime
+    'Event IDs: 1115, 304'                      → event_ids: [1115, 304]
+
+The ID field a collection's unique key is built on (Errors.error_ids,
+Catheter.catheter_ids) keeps its text, so re-ingested blocks still upsert
+onto their existing documents (see schema_config.UNIQUE_KEYS).
+
+With KEEP_RAW_FIELDS=1 the original text of every converted field is kept
+under `raw_fields`; a value that doesn't convert is stored as None and its
+text is always kept there.
+"""
+
+import os
+import re
+from .date_parser import parse_datetime
+
+KEEP_RAW_FIELDS = os.getenv("KEEP_RAW_FIELDS", "0") == "1"
+RAW_FIELDS_KEY = "raw_fields"
+
+_count_re = re.compile(r"^\s*(\d+)\b")
+_duration_re = re.compile(r"^\s*([-+]?)\s*(\d+)(?::(\d{2})(?::(\d{2}))?)?\s*$")
+_list_id_re = re.compile(r"(?:^|,)\s*(\d+)\s*(?=,|\(|$)")  # an ID is followed by a comma, its name or the end
+
+
+# ------------------ converters (text → value, None if it doesn't convert) ------------------
+
+def to_count(text: str):
+    """'8 (Raw events)' / '4 occurrences' / '6' → int"""
+    m = _count_re.match(text)
+    return int(m.group(1)) if m else None
+
+
+def to_seconds(text):
+    """
+    '36:04:32' (H:MM:SS, hours may exceed 24), 'MM:SS' or plain minutes ('5', 5, 1.5),
+    optionally signed ('-153:09': an analysis.json error that closed before it opened) → int seconds.
+    The one duration parser: block fields and procedure_builder's uniqueErrors durations.
+    """
+    if isinstance(text, (int, float)):
+        return int(text * 60)
+    m = _duration_re.match(text) if isinstance(text, str) else None
+    if not m:
+        return None
+    sign, a, b, c = m.groups()
+    if b is None:
+        seconds = int(a) * 60
+    elif c is None:
+        seconds = int(a) * 60 + int(b)
+    else:
+        seconds = int(a) * 3600 + int(b) * 60 + int(c)
+    return -seconds if sign == "-" else seconds
+
+
+def to_datetime(text: str):
+    return parse_datetime(text, field="block_occurrence")
+
+
+def to_id_list(text: str):
+    """'1115, 304' / '18046 (SOUNDSTAR eco 8F ...), 18091 (...)' → [1115, 304] / [18046, 18091]"""
+    ids = [int(i) for i in _list_id_re.findall(text)]
+    return ids or None
+
+
+# ------------------ schema per block type ------------------
+
+# field → (stored name, converter)
+_COMMON = {
+    "total_events": ("total_events", to_count),
+    "first_occurrence": ("first_occurrence", to_datetime),
+    "last_occurrence": ("last_occurrence", to_datetime),
+    "total_duration": ("total_duration_s", to_seconds),
+    "event_ids": ("event_ids", to_id_list),
+}
+_ID_LISTS = {"error_ids": ("error_ids", to_id_list), "catheter_ids": ("catheter_ids", to_id_list)}
+
+FIELD_TYPES = {
+    "ABLATION EVENTS": {**_COMMON, "ablation_sessions": ("ablation_sessions", to_count)},
+    "PACING EVENTS": {**_COMMON, "pacing_sessions": ("pacing_sessions", to_count)},
+    "MAGNETIC SENSOR EVENTS": {**_COMMON, "channels_monitored": ("channels_monitored", to_count)},
+    "ERROR EVENTS": {**_COMMON, **_ID_LISTS},
+    "CATHETER EVENTS": {**_COMMON, **_ID_LISTS, "electrodes": ("electrodes", to_count),
+                        "thermocouples": ("thermocouples", to_count)},
+    "MAPPING EVENTS": _COMMON,
+    "HARDWARE EVENTS": _COMMON,
+    "PATCH EVENTS": _COMMON,
+    # error_ids stays text: Errors unique key
+    "ERROR ID BLOCK": {**_COMMON, "actual_error_occurrences": ("actual_error_occurrences", to_count),
+                       "error_frequency": ("error_frequency", to_count)},
+    # catheter_ids stays text: Catheter unique key
+    "CATHETER DETAIL BLOCK": {**_COMMON, "electrodes": ("electrodes", to_count),
+                              "thermocouples": ("thermocouples", to_count)},
+}
+
+
+def apply_field_types(doc_data: dict, block_name: str, keep_raw: bool = None) -> dict:
+    """
+    Convert the recognized fields of one block in place.
+    Block types without an entry in FIELD_TYPES (registered at runtime) get the common fields.
+
+    Args:
+        doc_data (dict): recognized fields from parse_fields_inline_format
+        block_name (str): block type name (BlockMatch.name)
+        keep_raw (bool): keep the original text under raw_fields (default: KEEP_RAW_FIELDS)
+
+    Returns:
+        dict: doc_data
+    """
+    keep_raw = KEEP_RAW_FIELDS if keep_raw is None else keep_raw
+    raw = {}
+    for field, (name, convert) in FIELD_TYPES.get(block_name, _COMMON).items():
+        text = doc_data.get(field)
+        if not isinstance(text, str):
+            continue
+        del doc_data[field]
+        value = convert(text)
+        doc_data[name] = value
+        if keep_raw or (value is None and text.strip()):
+            raw[field] = text
+    if raw:
+        doc_data[RAW_FIELDS_KEY] = raw
+    return doc_data
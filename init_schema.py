@@ -1,12 +1,11 @@
+import argparse
 import logging
-from pymongo import MongoClient
 from pymongo.errors import CollectionInvalid  # optional: if תרצי לתפוס חריגות ביצירה
-from dotenv import load_dotenv
-import os
 
 from schema_config import ensure_collections_and_indexes, get_allowed_collections
+from utils.mongo_connector import MONGO_URI, DB_NAME, get_db, close_client
 
-def init_schema():
+def init_schema(drop_unknown: bool = False, dry_run: bool = False):
     logging.basicConfig(
         filename="init_schema.log",
         filemode="w",
@@ -14,22 +13,32 @@ def init_schema():
         format="%(asctime)s | %(levelname)s | %(message)s"
     )
 
-    load_dotenv()
-    MONGO_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
-    DB_NAME = os.getenv("MONGODB_DB", "medical_db")
-
-    client = MongoClient(MONGO_URI)
-    db = client[DB_NAME]
+    # same (lazy, pooled) client as the ingest
+    db = get_db()
 
     allowed = ", ".join(get_allowed_collections())
     print(f"🔹 Initializing '{DB_NAME}' at {MONGO_URI} (allowed: {allowed})")
     logging.info(f"Initializing '{DB_NAME}' at {MONGO_URI}")
 
     # single source to create collections + indexes
-    ensure_collections_and_indexes(db)
-
-    print("✅ Database and indexes are ready.")
-    logging.info("Database and indexes are ready.")
+    plan = ensure_collections_and_indexes(db, drop_unknown=drop_unknown, dry_run=dry_run)
+    for col, todo in plan.items():
+        for action, items in todo.items():
+            for item in items:
+                print(f"   {action:<8} {col}.{item if isinstance(item, str) else item['name']}")
+    if not plan:
+        print("   indexes already match INDEX_SPECS")
+
+    if dry_run:
+        print("🔸 Dry run: nothing was changed.")
+    else:
+        print("✅ Database and indexes are ready.")
+        logging.info("Database and indexes are ready.")
+    close_client()
 
 if __name__ == "__main__":
-    init_schema()
+    parser = argparse.ArgumentParser(description="Create collections and indexes from schema_config")
+    parser.add_argument("--drop-unknown", action="store_true", help="drop indexes that INDEX_SPECS doesn't list")
+    parser.add_argument("--dry-run", action="store_true", help="only print what would be created/dropped")
+    args = parser.parse_args()
+    init_schema(drop_unknown=args.drop_unknown, dry_run=args.dry_run)
@@ -0,0 +1,23 @@
+import logging
+
+from utils.mongo_connector import DB_NAME, close_client
+from utils.rollups import rebuild_rollups
+
+def main():
+    logging.basicConfig(
+        filename="rebuild_rollups.log",
+        filemode="w",
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(message)s"
+    )
+
+    print(f"🔹 Rebuilding rollups in '{DB_NAME}' from Procedures + UniqueErrors (stop any running ingest first)")
+    written = rebuild_rollups()
+    for col, n in written.items():
+        print(f"   {col}: {n} documents")
+
+    print("✅ Rollups rebuilt.")
+    close_client()
+
+if __name__ == "__main__":
+    main()
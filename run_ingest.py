@@ -1,13 +1,47 @@
+import argparse
 import logging
-import json
-from utils.txt_parser import extract_blocks_from_txt
-from utils.lightning_loader import get_lightning_name
-from utils.mongo_connector import save_document, db, Collections, bulk_save_events
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pymongo.errors import PyMongoError
+from utils.txt_parser import iter_blocks_from_txt
+from utils.lightning_loader import get_lightning_name, lightning_name_from, load_analysis, streaming_available
+from utils.mongo_connector import (
+    save_document, Collections, BulkWriter, replace_timeseries, load_manifest, update_manifest, get_db,
+    find_ingested, record_ingest, LEDGER_OK, delete_block_docs, run_in_transaction, supports_transactions,
+    replace_unique_errors, notify_case_written,
+)
+from utils.rollups import case_contributions, apply_rollups
+from utils.fingerprint import PARSER_VERSION, block_fingerprint, case_digest
+from utils.metrics import METRICS, STAGE_SECONDS, export_metrics, profiled
 from extractors.event_parser import parse_event_block
-from extractors.procedure_builder import build_procedure_document
+from extractors.block_classifier import ASK, QUARANTINE, POLICIES, configure_classifier
+from extractors.procedure_builder import build_procedure_document, build_unique_error_documents, unique_error_fields
+from extractors.magnetic_readings import MAGNETIC_BLOCK, explode_magnetic_readings
 
+# What to do with the stored documents of blocks that failed to write:
+# ask (interactive y/n), delete (one grouped delete per collection) or keep.
+ROLLBACK_DELETE = "delete"
+ROLLBACK_KEEP = "keep"
+ROLLBACK_POLICIES = (ASK, ROLLBACK_DELETE, ROLLBACK_KEEP)
+ROLLBACK_POLICY = os.getenv("INGEST_ROLLBACK_POLICY", ASK)
+# Transactional mode: a case's Procedures/Errors/Catheter/Events/Quarantine
+# writes commit or roll back together (needs a replica set, see run_in_transaction).
+TRANSACTIONAL = os.getenv("INGEST_TRANSACTIONAL", "0") == "1"
+# Stream analysis.json with ijson (if installed): the uniqueErrors entries go
+# one by one into UniqueErrors fields and stay out of the tree / Procedures doc.
+STREAM_JSON = os.getenv("INGEST_STREAM_JSON", "0") == "1"
 
-def main(json_path: str, txt_path: str):
+
+def _check_stream_json(stream_json: bool) -> bool:
+    if stream_json and not streaming_available():
+        logging.warning("Streaming JSON needs ijson (pip install ijson); loading analysis.json whole")
+        return False
+    return stream_json
+
+
+def _setup_logging():
     logging.basicConfig(
         filename="ingest.log",
         filemode="w",
@@ -15,101 +49,381 @@ def main(json_path: str, txt_path: str):
         format="%(asctime)s | %(levelname)s | %(message)s"
     )
 
-    # Load lightningName (JSON)
+
+def load_json(json_path: str, streamed: list = None) -> dict:
+    """
+    analysis.json, parsed once.
+    streamed: stream the file instead (--stream-json); its uniqueErrors entries are
+    appended to this list as unique_error_fields and left out of the returned tree.
+    """
+    on_unique_error = None
+    if streamed is not None:
+        def on_unique_error(phase, kind, entry):
+            fields = unique_error_fields(phase, kind, entry)
+            if fields:
+                streamed.append(fields)
+    with METRICS.time("json_stream" if streamed is not None else "json_load"):
+        j = load_analysis(json_path, on_unique_error)
+    METRICS.inc("bytes_read", os.path.getsize(json_path), kind="json")
+    return j
+
+
+def build_procedure(j: dict) -> dict:
+    """Procedures doc of a loaded analysis.json."""
+    with METRICS.time("build_procedure"):
+        proc_doc = build_procedure_document(j)
+    proc_doc["_collection"] = Collections.Procedures
+    return proc_doc
+
+
+def build_unique_errors(proc_doc: dict, lightning_name: str, streamed: list = None) -> list:
+    """The procedure's uniqueErrors (+ those streamed by load_json) as flat UniqueErrors docs."""
+    with METRICS.time("build_unique_errors"):
+        return build_unique_error_documents(proc_doc, lightning_name, streamed or ())
+
+
+def txt_blocks(txt_path: str):
+    """iter_blocks_from_txt, timing the reading/splitting (stage txt_extract)."""
+    METRICS.inc("bytes_read", os.path.getsize(txt_path), kind="txt")
+    return METRICS.timed_iter(iter_blocks_from_txt(txt_path), "txt_extract")
+
+
+def _block_label(doc) -> str:
+    """
+    Metric label of a parsed block: its known block type, else the collection
+    the classifier sent it to. Never the header text (unbounded label values).
+    """
+    if not doc:
+        return "skipped"
+    return doc.get("block_type") or doc.get("_collection") or "other"
+
+
+def iter_parsed_blocks(blocks, lightning_name, stats: dict, known: set = None):
+    """
+    Parse TXT blocks lazily into MongoDB documents (no DB access).
+    Yields (index, header, doc); totals, skips and parse failures are
+    accumulated in `stats` ("total", "skipped", "problematic").
+
+    Every doc gets the block's content_hash. Blocks whose fingerprint is in
+    `known` (the case's manifest) are already stored unchanged: they are not
+    parsed at all and only counted in stats["unchanged"].
+    """
+    for idx, block in enumerate(blocks, start=1):
+        stats["total"] = idx
+        header = block[0] if block else "EMPTY"
+        with METRICS.time("fingerprint"):
+            fingerprint = block_fingerprint(block)
+        stats["seen"].add(fingerprint)
+        if known and fingerprint in known:
+            stats["unchanged"] += 1
+            METRICS.inc("blocks", result="unchanged")
+            continue
+        started = time.perf_counter()
+        try:
+            # לא מזוהה → rules / החלטה שמורה / policy (שואל רק ב-ask)
+            doc = parse_event_block(block, lightning_name)
+            METRICS.observe(STAGE_SECONDS, time.perf_counter() - started, stage="parse_block",
+                            block_type=_block_label(doc))
+            if doc:
+                METRICS.inc("blocks", result="parsed")
+                doc["content_hash"] = fingerprint
+                yield idx, header, doc
+            else:
+                stats["skipped"] += 1
+                METRICS.inc("blocks", result="skipped")
+                logging.warning(f"Skipped block {idx}: header='{header}'")
+        except Exception as e:
+            METRICS.inc("blocks", result="failed")
+            stats["skipped"] += 1
+            stats["problematic"].append({
+                "index": idx,
+                "header": header,
+                "error": str(e),
+                "doc": None
+            })
+            logging.error(f"Failed to parse block {idx}: {e}")
+
+
+def _new_block_stats():
+    return {"total": 0, "skipped": 0, "problematic": [], "unchanged": 0, "seen": set()}
+
+
+def parse_blocks(blocks, lightning_name):
+    """
+    Parse TXT blocks into MongoDB documents (no DB access).
+
+    Returns:
+        (list, int, list, int): parsed [(index, header, doc)], skipped count, problematic blocks, total blocks
+    """
+    stats = _new_block_stats()
+    parsed = list(iter_parsed_blocks(blocks, lightning_name, stats))
+    return parsed, stats["skipped"], stats["problematic"], stats["total"]
+
+
+def save_parsed_docs(parsed, written: set = None, session=None):
+    """
+    Write parsed block documents through a BulkWriter: one unordered
+    bulk upsert per collection batch instead of a round trip per block.
+    `parsed` may be a lazy iterable; buffered docs are flushed even if it raises.
+    The content_hash of every doc written successfully is added to `written`,
+    and MagneticReadings are written only for blocks whose bulk write succeeded.
+
+    With a session every write joins its transaction and a write error raises
+    (the original PyMongoError, so run_in_transaction retries transient ones).
+    Magnetic readings are then left to the caller: time-series collections
+    can't be written inside a transaction.
+
+    Returns:
+        (int, int, list): saved count, skipped count, problematic blocks
+    """
+    total = 0
+    skipped_blocks = 0
+    problematic_blocks = []
+    hashes = set()
+    magnetic = []  # [(tag, doc)] of MAGNETIC SENSOR EVENTS blocks
+
+    with BulkWriter(session=session) as writer:
+        for idx, header, doc in parsed:
+            total += 1
+            try:
+                writer.add(doc, tag=(idx, header))
+            except Exception as e:
+                if session is not None and isinstance(e, PyMongoError):
+                    raise  # keeps its TransientTransactionError label, so with_transaction can retry
+                skipped_blocks += 1
+                problematic_blocks.append({"index": idx, "header": header, "error": str(e), "doc": doc})
+                logging.error(f"Failed to save block {idx}: {e}")
+                continue
+            if doc.get("content_hash"):
+                hashes.add(doc["content_hash"])
+            if session is None and doc.get("block_type") == MAGNETIC_BLOCK:
+                magnetic.append(((idx, header), doc))
+
+    for err in writer.errors:
+        idx, header = err["tag"]
+        skipped_blocks += 1
+        problematic_blocks.append({"index": idx, "header": header, "error": err["error"], "doc": err["doc"]})
+        logging.error(f"Failed to save block {idx}: {err['error']}")
+    if written is not None:
+        written.update(hashes - {err["doc"].get("content_hash") for err in writer.errors})
+    # readings only for blocks whose bulk write went through (known after the final flush)
+    failed_tags = {err["tag"] for err in writer.errors}
+    for tag, doc in magnetic:
+        if tag not in failed_tags:
+            save_magnetic_readings(doc)
+
+    saved_blocks = total - skipped_blocks
+    return saved_blocks, skipped_blocks, problematic_blocks
+
+
+def save_magnetic_readings(doc):
+    """Explode a MAGNETIC SENSOR EVENTS doc into the MagneticReadings time-series collection."""
+    readings = explode_magnetic_readings(doc)
+    if not readings:
+        return 0
     try:
-        lightning_name = get_lightning_name(json_path)
-        logging.info(f"Loaded lightning_name={lightning_name}")
+        n = replace_timeseries(Collections.MagneticReadings, {"lightning_name": doc["lightning_name"]}, readings)
+        logging.info(f"Saved {n} magnetic readings for {doc['lightning_name']}")
+        return n
     except Exception as e:
-        logging.error(f"Failed to load JSON file {json_path}: {e}")
-        print(f"Failed to load JSON file {json_path}: {e}")
+        logging.error(f"Failed to save magnetic readings for {doc['lightning_name']}: {e}")
+        return 0
+
+
+def clear_removed_readings(lightning_name: str, known: set, seen: set):
+    """
+    Stale-block cleanup for MagneticReadings: once update_manifest has deleted the
+    documents of blocks that left the TXT, drop the case's readings if its
+    MAGNETIC SENSOR EVENTS block is gone (a changed block already replaced them).
+    """
+    if not known - seen:
         return
+    try:
+        if get_db()[Collections.Events].find_one({"lightning_name": lightning_name, "block_type": MAGNETIC_BLOCK},
+                                                 {"_id": 1}):
+            return
+        replace_timeseries(Collections.MagneticReadings, {"lightning_name": lightning_name}, [])
+        logging.info(f"Removed the magnetic readings of {lightning_name} (block no longer in the TXT)")
+    except Exception as e:
+        logging.error(f"Failed to remove stale magnetic readings for {lightning_name}: {e}")
+
 
-    # Load full JSON for procedure doc
+def rollback_blocks(problematic_blocks) -> dict:
+    """
+    Delete the stored documents of problematic blocks (one grouped delete per collection).
+    A failing delete is logged, never raised: the block errors stay the reported failure.
+    """
     try:
-        with open(json_path, "r", encoding="utf-8") as fh:
-            j = json.load(fh)
+        deleted = delete_block_docs(pb.get("doc") for pb in problematic_blocks)
     except Exception as e:
-        logging.error(f"Failed to parse JSON {json_path}: {e}")
-        print(f"Failed to parse JSON {json_path}: {e}")
+        logging.error(f"Rollback of {len(problematic_blocks)} problematic blocks failed: {e}")
+        return {}
+    for col, n in deleted.items():
+        logging.info(f"Rolled back {n} documents from {col}")
+    return deleted
+
+
+def ledger_entry(result: dict, duration_s: float) -> dict:
+    """IngestLedger fields of a case result ('ok' with problematic blocks is recorded as 'partial')."""
+    problematic = result.get("problematic_blocks") or []
+    status = result.get("status", "failed")
+    if status == LEDGER_OK and problematic:
+        status = "partial"
+    return {
+        "lightning_name": result.get("lightning_name", ""),
+        "json_path": result.get("json_path"),
+        "txt_path": result.get("txt_path"),
+        "parser_version": PARSER_VERSION,
+        "status": status,
+        "error": result.get("error"),
+        "total_blocks": result.get("total_blocks", 0),
+        "saved_blocks": result.get("saved_blocks", 0),
+        "unchanged_blocks": result.get("unchanged_blocks", 0),
+        "skipped_blocks": result.get("skipped_blocks", 0),
+        "problematic_blocks": len(problematic),
+        "duration_s": round(duration_s, 3),
+    }
+
+
+def _record_case(digest: str, result: dict, duration_s: float):
+    """Write the case's ledger entry; a ledger failure never fails the ingest."""
+    if not digest:
         return
+    try:
+        record_ingest(digest, ledger_entry(result, duration_s))
+    except Exception as e:
+        logging.error(f"Failed to record ledger entry for {result.get('lightning_name')}: {e}")
+
 
+def _ingest_streaming(j: dict, txt_path: str, known: set, streamed: list = None, incremental: bool = True) -> dict:
+    """
+    Save the procedure, then parse and write TXT blocks while the file is still being read.
+    `known` is the case's manifest: its unchanged blocks are skipped unless incremental=False,
+    and the documents of blocks that left the TXT are deleted either way.
+    """
+    lightning_name = lightning_name_from(j)
     # Save procedure (to 'Procedures')
+    procedure_error = None
     try:
-        proc_doc = build_procedure_document(j)
-        proc_doc["_collection"] = Collections.Procedures
+        proc_doc = build_procedure(j)
         save_document(proc_doc)
         logging.info("Saved procedure document to 'Procedures'")
+        unique_errors = build_unique_errors(proc_doc, lightning_name, streamed)
+        n = replace_unique_errors(lightning_name, unique_errors)
+        logging.info(f"Saved {n} uniqueErrors documents to 'UniqueErrors'")
+        apply_rollups(lightning_name, case_contributions(proc_doc, unique_errors))
     except Exception as e:
+        procedure_error = f"procedure: {e}"
         logging.error(f"Failed to save procedure document: {e}")
         print(f"Failed to save procedure document: {e}")
 
-    # Extract blocks from TXT
+    # (unknown headers: rules file → remembered decision → ask)
+    # (incremental: blocks listed in the case's manifest are skipped unparsed)
+    stats = _new_block_stats()
+    written = set()
+    blocks = txt_blocks(txt_path)
+    saved_blocks, skipped_blocks, problematic_blocks = save_parsed_docs(
+        iter_parsed_blocks(blocks, lightning_name, stats, known if incremental else None), written
+    )
+    update_manifest(lightning_name, known, stats["seen"], written)
+    clear_removed_readings(lightning_name, known, stats["seen"])
+    notify_case_written(lightning_name)
+
+    return {
+        "status": "partial" if procedure_error else LEDGER_OK,
+        "error": procedure_error,
+        "total_blocks": stats["total"],
+        "saved_blocks": saved_blocks,
+        "unchanged_blocks": stats["unchanged"],
+        "skipped_blocks": stats["skipped"] + skipped_blocks,
+        "problematic_blocks": stats["problematic"] + problematic_blocks,
+    }
+
+
+def _ingest_transaction(j: dict, json_path: str, txt_path: str, known: set, streamed: list = None,
+                        incremental: bool = True) -> dict:
+    """Parse the whole case first, then write it in one transaction."""
+    case = parse_case_data(j, txt_blocks(txt_path), json_path, txt_path, known, streamed, incremental)
+    written = write_case(case, transactional=True)
+    return {"status": LEDGER_OK, "error": None, "total_blocks": case["total_blocks"], **written}
+
+
+def main(json_path: str, txt_path: str, incremental: bool = True,
+         rollback: str = ROLLBACK_POLICY, transactional: bool = TRANSACTIONAL, stream_json: bool = STREAM_JSON):
+    """
+    Ingest one JSON/TXT pair.
+
+    Args:
+        incremental (bool): skip an already-ingested pair / unchanged blocks
+            (removed blocks are cleaned up either way)
+        rollback (str): ask / delete / keep the stored docs of blocks that failed to write
+        transactional (bool): write the case in one transaction (nothing is left half-written)
+        stream_json (bool): stream analysis.json with ijson; its uniqueErrors go straight to UniqueErrors
+    """
+    started = time.perf_counter()
+    _setup_logging()
+    result = {"json_path": json_path, "txt_path": txt_path}
+    stream_json = _check_stream_json(stream_json)
+
+    if transactional and not supports_transactions():
+        print("Transactional mode needs a replica set (e.g. a single node started with --replSet rs0).")
+        return
+
+    # Same JSON+TXT bytes already ingested successfully → nothing to do
     try:
-        blocks = extract_blocks_from_txt(txt_path)
-        logging.info(f"Extracted {len(blocks)} blocks from TXT")
+        with METRICS.time("case_digest"):
+            digest = case_digest(json_path, txt_path)
+        done = find_ingested([digest]).get(digest) if incremental else None
     except Exception as e:
-        logging.error(f"Failed to extract blocks from TXT {txt_path}: {e}")
-        print(f"Failed to extract blocks from TXT {txt_path}: {e}")
+        logging.warning(f"Ingest ledger unavailable ({e}); ingesting {json_path}")
+        digest, done = None, None
+    if done:
+        msg = (f"Already ingested: {done['lightning_name']} ({done['saved_blocks']}/{done['total_blocks']} "
+               f"blocks, {done['ingested_at']:%Y-%m-%d %H:%M}). Use --full to re-ingest.")
+        logging.info(msg)
+        print(msg)
         return
 
-    total_blocks = len(blocks)
-    saved_blocks = 0
-    skipped_blocks = 0
-    problematic_blocks = []
-    pending_events = []
+    # Load the JSON once: lightningName and the procedure doc come from the same tree
+    try:
+        streamed = [] if stream_json else None
+        j = load_json(json_path, streamed)
+        lightning_name = lightning_name_from(j)
+        logging.info(f"Loaded lightning_name={lightning_name}")
+    except Exception as e:
+        logging.error(f"Failed to load JSON file {json_path}: {e}")
+        print(f"Failed to load JSON file {json_path}: {e}")
+        _record_case(digest, {**result, "error": f"json: {e}"}, time.perf_counter() - started)
+        return
+    result["lightning_name"] = lightning_name
 
-    # Parse and insert relevant event blocks (interactive for unknown headers)
-    for idx, block in enumerate(blocks, start=1):
-        try:
-            # אינטראקטיבי כמו קודם: ישאל כשלא מזהה
-            doc = parse_event_block(block, lightning_name)
-            if doc:
-                try:
-                    if doc["_collection"] == Collections.Events:
-                        # נאסוף ל-bulk כדי לזרז שמירה
-                        pending_events.append(doc)
-                        saved_blocks += 1
-                    else:
-                        save_document(doc)
-                        saved_blocks += 1
-                except Exception as e:
-                    skipped_blocks += 1
-                    problematic_blocks.append({
-                        "index": idx,
-                        "header": block[0] if block else "EMPTY",
-                        "error": str(e),
-                        "doc": doc
-                    })
-                    logging.error(f"Failed to save block {idx}: {e}")
-            else:
-                skipped_blocks += 1
-                logging.warning(f"Skipped block {idx}: header='{block[0] if block else 'EMPTY'}'")
-        except Exception as e:
-            skipped_blocks += 1
-            problematic_blocks.append({
-                "index": idx,
-                "header": block[0] if block else "EMPTY",
-                "error": str(e),
-                "doc": None
-            })
-            logging.error(f"Failed to parse block {idx}: {e}")
+    # Procedure + blocks
+    try:
+        # --full re-parses every block but still cleans up the ones that left the TXT
+        known = load_manifest(lightning_name)
+        if transactional:
+            result.update(_ingest_transaction(j, json_path, txt_path, known, streamed, incremental))
+        else:
+            result.update(_ingest_streaming(j, txt_path, known, streamed, incremental))
+    except Exception as e:
+        rolled = " (transaction rolled back, nothing written)" if transactional else ""
+        logging.error(f"Failed to ingest blocks from TXT {txt_path}{rolled}: {e}")
+        print(f"Failed to ingest blocks from TXT {txt_path}{rolled}: {e}")
+        _record_case(digest, {**result, "status": "failed", "error": f"txt: {e}"}, time.perf_counter() - started)
+        return
 
-    # Bulk write for Events (מהיר יותר; נפילה ל-fallback בודד במקרה חריג)
-    if pending_events:
-        try:
-            bulk_save_events(pending_events)
-        except Exception as e:
-            logging.error(f"Failed bulk save events: {e}")
-            for d in pending_events:
-                try:
-                    save_document(d)
-                except Exception as ex:
-                    logging.error(f"Failed fallback save for one event: {ex}")
+    total_blocks = result["total_blocks"]
+    saved_blocks = result["saved_blocks"]
+    skipped_blocks = result["skipped_blocks"]
+    problematic_blocks = result["problematic_blocks"]
+    logging.info(f"Extracted {total_blocks} blocks from TXT")
+    _record_case(digest, result, time.perf_counter() - started)
 
     # Summary
     print("\n=== Summary Report ===")
     print(f"Total blocks: {total_blocks}")
     print(f"Saved: {saved_blocks}")
+    print(f"Unchanged: {result['unchanged_blocks']}")
     print(f"Skipped: {skipped_blocks}")
 
     if problematic_blocks:
@@ -117,36 +431,372 @@ def main(json_path: str, txt_path: str):
         for pb in problematic_blocks:
             print(f" - Block {pb['index']}: header='{pb['header']}' → error='{pb['error']}'")
 
-        # Ask user whether to delete problematic docs
-        choice = input("\nDo you want to DELETE documents related to problematic blocks from MongoDB? (y/n): ").strip().lower()
-        if choice == "y":
-            for pb in problematic_blocks:
-                doc = pb.get("doc")
-                if not doc or "_collection" not in doc:
-                    continue
-
-                key_filter = {}
-                if doc["_collection"] == Collections.Catheter:
-                    key_filter = {"lightning_name": doc["lightning_name"], "catheter_ids": doc.get("catheter_ids")}
-                elif doc["_collection"] == Collections.Errors:
-                    key_filter = {"lightning_name": doc["lightning_name"], "error_ids": doc.get("error_ids")}
-                elif doc["_collection"] == Collections.Events:
-                    key_filter = {"lightning_name": doc["lightning_name"], "event_ids": doc.get("event_ids")}
-
-                if key_filter:
-                    db[doc["_collection"]].delete_many(key_filter)
-                    print(f"❌ Deleted from {doc['_collection']} with filter {key_filter}")
-                    logging.info(f"Deleted from {doc['_collection']} with filter {key_filter}")
-
-    summary_msg = f"Summary: {saved_blocks}/{total_blocks} saved, {skipped_blocks} skipped"
+        if rollback == ASK and sys.stdin.isatty():
+            choice = input("\nDo you want to DELETE documents related to problematic blocks from MongoDB? (y/n): ").strip().lower()
+            rollback = ROLLBACK_DELETE if choice == "y" else ROLLBACK_KEEP
+        if rollback == ROLLBACK_DELETE:
+            for col, n in rollback_blocks(problematic_blocks).items():
+                print(f"❌ Deleted {n} documents from {col}")
+
+    summary_msg = (f"Summary: {saved_blocks}/{total_blocks} saved, {result['unchanged_blocks']} unchanged, "
+                   f"{skipped_blocks} skipped")
     logging.info(summary_msg)
+    METRICS.log_stage_report()
+
+
+# ------------------ batch mode ------------------
+
+def _name_components(txt_path: str, root_dir: str) -> set:
+    """Directories of the relative path + file stem (whole names, so 'PC-1' never claims 'PC-12')."""
+    rel = os.path.relpath(txt_path, root_dir)
+    dirs = os.path.dirname(rel).split(os.sep)
+    return {*dirs, os.path.splitext(os.path.basename(rel))[0]}
+
+def find_case_pairs(root_dir: str):
+    """
+    Walk root_dir and pair every analysis JSON with its Bookmarks TXT.
+
+    A TXT belongs to a case when a directory of its path (relative to root_dir)
+    or its file stem is the case's lightningName; otherwise the single TXT next
+    to the JSON is used.
+
+    Returns:
+        (list, list): pairs [(lightning_name, json_path, txt_path)], unmatched JSON paths
+    """
+    json_paths, txt_paths = [], []
+    for dirpath, _, filenames in os.walk(root_dir):
+        for fn in sorted(filenames):
+            low = fn.lower()
+            if low.endswith(".json"):
+                json_paths.append(os.path.join(dirpath, fn))
+            elif low.endswith(".txt"):
+                txt_paths.append(os.path.join(dirpath, fn))
+
+    pairs, unmatched = [], []
+    claimed = set()
+    for json_path in json_paths:
+        try:
+            lightning_name = get_lightning_name(json_path)
+        except Exception:
+            lightning_name = ""
+        if not lightning_name:
+            # not an analysis.json (or unreadable) - ignore silently
+            continue
+
+        json_dir = os.path.dirname(json_path)
+        by_name = [t for t in txt_paths if lightning_name in _name_components(t, root_dir)]
+        same_dir = [t for t in txt_paths if os.path.dirname(t) == json_dir]
+
+        candidates = by_name or same_dir
+        if len(candidates) > 1:
+            candidates = [t for t in by_name if t in same_dir]
+        candidates = [t for t in candidates if t not in claimed]
+
+        if len(candidates) == 1:
+            claimed.add(candidates[0])
+            pairs.append((lightning_name, json_path, candidates[0]))
+        else:
+            unmatched.append(json_path)
+            logging.warning(f"No unique TXT for {json_path} (lightning_name={lightning_name})")
+
+    return pairs, unmatched
+
+
+def parse_case(json_path: str, txt_path: str, known: set = None, stream: bool = False,
+               incremental: bool = True) -> dict:
+    """
+    Parse one JSON/TXT pair into documents without touching MongoDB.
+    Runs inside a worker process in batch mode; `known` is the case's manifest
+    (its blocks are skipped unparsed unless incremental=False).
+    The worker's metrics travel back in case["metrics"] (METRICS.merge them).
+    """
+    started = time.perf_counter()
+    streamed = [] if stream else None
+    j = load_json(json_path, streamed)
+    case = parse_case_data(j, txt_blocks(txt_path), json_path, txt_path, known, streamed, incremental)
+    case["parse_seconds"] = time.perf_counter() - started
+    case["metrics"] = METRICS.drain()
+    return case
+
+
+def parse_case_data(j: dict, blocks, json_path: str = None, txt_path: str = None, known: set = None,
+                    streamed: list = None, incremental: bool = True) -> dict:
+    """
+    Parse an already-loaded analysis.json dict and an iterable of TXT blocks (no DB access).
+    streamed: the uniqueErrors fields load_json streamed out of `j`.
+    incremental=False parses every block; `known` is still kept for the stale-block cleanup.
+    """
+    started = time.perf_counter()
+    lightning_name = lightning_name_from(j)
+    proc_doc = build_procedure(j)
+    unique_errors = build_unique_errors(proc_doc, lightning_name, streamed)
+    rollups = case_contributions(proc_doc, unique_errors)
+
+    stats = _new_block_stats()
+    parsed = list(iter_parsed_blocks(blocks, lightning_name, stats, known if incremental else None))
+
+    return {
+        "lightning_name": lightning_name,
+        "json_path": json_path,
+        "txt_path": txt_path,
+        "procedure": proc_doc,
+        "unique_errors": unique_errors,
+        "rollups": rollups,
+        "parsed": parsed,
+        "known": known or set(),
+        "fingerprints": stats["seen"],
+        "total_blocks": stats["total"],
+        "unchanged_blocks": stats["unchanged"],
+        "skipped_blocks": stats["skipped"],
+        "problematic_blocks": stats["problematic"],
+        "parse_seconds": time.perf_counter() - started,
+    }
+
+
+def write_case(case: dict, transactional: bool = False, rollback: str = ROLLBACK_KEEP) -> dict:
+    """
+    Write a parsed case (procedure + its UniqueErrors and rollups, blocks, then the manifest).
+    Runs on a writer thread in batch mode.
+
+    transactional: everything but the magnetic readings commits or rolls back
+    together; any block that fails to write aborts the case (raises).
+    Otherwise a failed procedure / UniqueErrors / rollup write still lets the
+    blocks through (status 'partial', like _ingest_streaming), and with
+    rollback='delete' the stored docs of failed blocks are deleted.
+    """
+    started = time.perf_counter()
+    procedure_error = None
+    with METRICS.time("write_case", transactional=transactional):
+        if transactional:
+            def write_all(session):
+                save_document(case["procedure"], session=session)
+                replace_unique_errors(case["lightning_name"], case["unique_errors"], session=session)
+                apply_rollups(case["lightning_name"], case["rollups"], session=session)
+                written = set()
+                saved, skipped, problems = save_parsed_docs(case["parsed"], written, session=session)
+                if problems:
+                    raise RuntimeError(f"{len(problems)} blocks failed to write: {problems[0]['error']}")
+                update_manifest(case["lightning_name"], case["known"], case["fingerprints"], written,
+                                session=session)
+                return saved, skipped, problems
+
+            saved_blocks, write_skipped, write_problems = run_in_transaction(write_all)
+            for _, _, doc in case["parsed"]:
+                save_magnetic_readings(doc)
+            clear_removed_readings(case["lightning_name"], case["known"], case["fingerprints"])
+        else:
+            try:
+                save_document(case["procedure"])
+                replace_unique_errors(case["lightning_name"], case["unique_errors"])
+                apply_rollups(case["lightning_name"], case["rollups"])
+            except Exception as e:
+                procedure_error = f"procedure: {e}"
+                logging.error(f"Failed to save procedure of {case['lightning_name']}: {e}")
+            written = set()
+            saved_blocks, write_skipped, write_problems = save_parsed_docs(case["parsed"], written)
+            update_manifest(case["lightning_name"], case["known"], case["fingerprints"], written)
+            clear_removed_readings(case["lightning_name"], case["known"], case["fingerprints"])
+            if rollback == ROLLBACK_DELETE and write_problems:
+                rollback_blocks(write_problems)
+        notify_case_written(case["lightning_name"])
+    return {
+        "status": "partial" if procedure_error else LEDGER_OK,
+        "error": procedure_error,
+        "saved_blocks": saved_blocks,
+        "unchanged_blocks": case["unchanged_blocks"],
+        "skipped_blocks": case["skipped_blocks"] + write_skipped,
+        "problematic_blocks": case["problematic_blocks"] + write_problems,
+        "write_seconds": time.perf_counter() - started,
+    }
+
+
+def run_batch(root_dir: str, workers: int = None, writers: int = 2, unknown_policy: str = QUARANTINE,
+              incremental: bool = True, rollback: str = ROLLBACK_KEEP, transactional: bool = TRANSACTIONAL,
+              stream_json: bool = STREAM_JSON) -> list:
+    """
+    Ingest every JSON/TXT pair under root_dir.
+    Parsing runs on a process pool; MongoDB writes are funneled through
+    a small thread pool of writers. Unrecognized blocks never prompt:
+    they follow block_rules.json, remembered decisions, then unknown_policy.
+    Pairs already ingested (same file digest in IngestLedger) are skipped
+    before parsing. With incremental=False every case and block is re-parsed
+    and rewritten (blocks that left a TXT are still deleted).
+    rollback / transactional: see write_case; stream_json: see main.
+
+    Returns:
+        list[dict]: per-case results (status 'ok' / 'partial' / 'failed')
+    """
+    _setup_logging()
+    started = time.perf_counter()
+    stream_json = _check_stream_json(stream_json)
+    if transactional and not supports_transactions():
+        raise RuntimeError("Transactional mode needs a replica set (e.g. a single node started with --replSet rs0)")
+
+    pairs, unmatched = find_case_pairs(root_dir)
+    logging.info(f"Found {len(pairs)} cases under {root_dir} ({len(unmatched)} unmatched JSON files)")
+    print(f"Found {len(pairs)} cases ({len(unmatched)} unmatched JSON files)")
+
+    results = {
+        json_path: {"lightning_name": lightning_name, "json_path": json_path, "txt_path": txt_path,
+                    "total_blocks": 0, "saved_blocks": 0, "unchanged_blocks": 0, "skipped_blocks": 0}
+        for lightning_name, json_path, txt_path in pairs
+    }
+    digests, todo = _skip_ingested(pairs, results, incremental)
+
+    write_futures = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=configure_classifier,
+                             initargs=(unknown_policy,)) as parse_pool, \
+            ThreadPoolExecutor(max_workers=max(1, writers)) as write_pool:
+        parse_futures = {
+            parse_pool.submit(parse_case, json_path, txt_path, load_manifest(lightning_name), stream_json,
+                              incremental):
+                (lightning_name, json_path, txt_path)
+            for lightning_name, json_path, txt_path in todo
+        }
+
+        for fut in as_completed(parse_futures):
+            lightning_name, json_path, txt_path = parse_futures[fut]
+            result = results[json_path]
+            try:
+                case = fut.result()
+                METRICS.merge(case.pop("metrics", None))
+            except Exception as e:
+                result.update(status="failed", error=f"parse: {e}")
+                logging.error(f"Failed to parse case {lightning_name} ({json_path}): {e}")
+                _record_case(digests.get(json_path), result, 0.0)
+                continue
+
+            result["total_blocks"] = case["total_blocks"]
+            result["parse_seconds"] = case["parse_seconds"]
+            write_futures[write_pool.submit(write_case, case, transactional, rollback)] = json_path
+
+        for fut in as_completed(write_futures):
+            result = results[write_futures[fut]]
+            try:
+                written = fut.result()
+            except Exception as e:
+                result.update(status="failed", error=f"write: {e}")
+                logging.error(f"Failed to write case {result['lightning_name']}: {e}")
+                _record_case(digests.get(write_futures[fut]), result, result.get("parse_seconds", 0.0))
+                continue
+
+            result.update(written)
+            _record_case(digests.get(write_futures[fut]), result,
+                         result.get("parse_seconds", 0.0) + result.get("write_seconds", 0.0))
+            logging.info(
+                f"Case {result['lightning_name']}: {result['saved_blocks']}/{result['total_blocks']} saved, "
+                f"{result['unchanged_blocks']} unchanged, {result['skipped_blocks']} skipped"
+            )
+
+    elapsed = time.perf_counter() - started
+    ordered = [results[json_path] for _, json_path, _ in pairs]
+    _print_batch_report(ordered, unmatched, elapsed)
+    METRICS.log_stage_report()
+    return ordered
+
+
+def _skip_ingested(pairs, results: dict, incremental: bool = True):
+    """
+    Hash every pair and mark the ones the ledger already has as 'unchanged'.
+
+    Returns:
+        (dict, list): json_path -> digest, pairs still to ingest
+    """
+    digests = {}
+    for _, json_path, txt_path in pairs:
+        try:
+            with METRICS.time("case_digest"):
+                digests[json_path] = case_digest(json_path, txt_path)
+        except OSError as e:
+            logging.warning(f"Cannot hash {json_path} / {txt_path}: {e}")
+
+    done = {}
+    if incremental and digests:
+        try:
+            done = find_ingested(digests.values())
+        except Exception as e:
+            logging.warning(f"Ingest ledger unavailable ({e}); ingesting every case")
+
+    todo = []
+    for pair in pairs:
+        json_path = pair[1]
+        entry = done.get(digests.get(json_path))
+        if entry:
+            results[json_path].update(status="unchanged", total_blocks=entry["total_blocks"])
+            logging.info(f"Case {pair[0]} already ingested ({entry['ingested_at']}), skipping")
+        else:
+            todo.append(pair)
+    return digests, todo
+
+
+def _print_batch_report(results, unmatched, elapsed):
+    ok = [r for r in results if r.get("status") in (LEDGER_OK, "partial")]
+    unchanged_cases = [r for r in results if r.get("status") == "unchanged"]
+    failed = [r for r in results if r.get("status") not in (LEDGER_OK, "partial", "unchanged")]
+    blocks = sum(r["total_blocks"] for r in ok)
+    saved = sum(r["saved_blocks"] for r in ok)
+    unchanged = sum(r.get("unchanged_blocks", 0) for r in ok)
+    rate = (lambda n: n / elapsed if elapsed > 0 else 0.0)
+
+    print("\n=== Batch Summary Report ===")
+    partial = sum(1 for r in ok if r.get("status") == "partial")
+    print(f"Cases: {len(results)} ({len(ok) - partial} ok, {partial} partial, {len(unchanged_cases)} already ingested, "
+          f"{len(failed)} failed, {len(unmatched)} unmatched JSON)")
+    print(f"Blocks: {blocks} ({saved} saved, {unchanged} unchanged)")
+    print(f"Elapsed: {elapsed:.2f}s → {rate(len(ok)):.2f} cases/sec, {rate(blocks):.1f} blocks/sec")
+
+    for r in failed:
+        print(f" - {r['lightning_name']}: {r.get('error')}")
+    for r in ok:
+        if r.get("error"):
+            print(f" - {r['lightning_name']}: {r['error']} (blocks saved)")
+        if r["problematic_blocks"]:
+            print(f" - {r['lightning_name']}: {len(r['problematic_blocks'])} problematic blocks")
+
+    logging.info(
+        f"Batch summary: {len(ok)}/{len(results)} cases ok, {blocks} blocks in {elapsed:.2f}s "
+        f"({rate(len(ok)):.2f} cases/sec, {rate(blocks):.1f} blocks/sec)"
+    )
 
 
 if __name__ == "__main__":
-    print("JSON path:")
-    json_file = input("JSON path: ").strip()
+    parser = argparse.ArgumentParser(description="Ingest Lightning analysis.json + Bookmarks TXT into MongoDB")
+    parser.add_argument("--dir", help="batch mode: ingest every JSON/TXT pair under this directory")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: CPU count)")
+    parser.add_argument("--writers", type=int, default=2, help="MongoDB writer threads")
+    parser.add_argument("--unknown-policy", choices=[p for p in POLICIES if p != ASK], default=QUARANTINE,
+                        help="batch mode: what to do with blocks no rule/decision recognizes")
+    parser.add_argument("--full", action="store_true",
+                        help="re-ingest every case and block, ignoring the ledger and stored fingerprints "
+                             "(documents of blocks no longer in the TXT are still deleted)")
+    parser.add_argument("--rollback", choices=ROLLBACK_POLICIES, default=None,
+                        help="stored docs of blocks that failed to write: ask (single case only), delete or keep "
+                             "(default: INGEST_ROLLBACK_POLICY, or keep in batch mode)")
+    parser.add_argument("--transactional", action="store_true", default=TRANSACTIONAL,
+                        help="write each case in one transaction (needs a replica set; a single node "
+                             "started with --replSet rs0 and rs.initiate() is enough)")
+    parser.add_argument("--stream-json", action="store_true", default=STREAM_JSON,
+                        help="parse analysis.json incrementally with ijson (for very large exports); its uniqueErrors "
+                             "entries go straight to UniqueErrors, not into the Procedures document")
+    parser.add_argument("--metrics-json", help="write per-stage timers/counters/histograms as JSON to this file")
+    parser.add_argument("--metrics-prom", help="write the same metrics in Prometheus text format to this file")
+    parser.add_argument("--profile", help="cProfile the run (main process) and dump pstats to this file")
+    args = parser.parse_args()
+    if args.dir and args.rollback == ASK:
+        parser.error("--rollback ask is only available for a single case")
+
+    with profiled(args.profile):
+        if args.dir:
+            run_batch(args.dir, workers=args.workers, writers=args.writers, unknown_policy=args.unknown_policy,
+                      incremental=not args.full, rollback=args.rollback or ROLLBACK_KEEP,
+                      transactional=args.transactional, stream_json=args.stream_json)
+        else:
+            print("JSON path:")
+            json_file = input("JSON path: ").strip()
 
-    print("TXT path:")
-    txt_file = input("TXT path: ").strip()
+            print("TXT path:")
+            txt_file = input("TXT path: ").strip()
 
-    main(json_file, txt_file)
+            main(json_file, txt_file, incremental=not args.full, rollback=args.rollback or ROLLBACK_POLICY,
+                 transactional=args.transactional, stream_json=args.stream_json)
+    export_metrics(args.metrics_json, args.metrics_prom)
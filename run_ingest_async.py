@@ -0,0 +1,272 @@
+"""
+run_ingest_async.py
+-------------------
+asyncio variant of the batch ingest: read → parse → write stages connected
+by bounded queues, so parsing of case N+1 overlaps the MongoDB writes of
+case N. Backpressure comes from the queue limits: a slow writer fills the
+write queue, which stalls the parsers, which stall the readers.
+
+    python run_ingest_async.py --dir ROOT [--readers 2] [--parsers N] [--writers 2] [--queue-size 4] [--full]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from utils.txt_parser import iter_blocks
+from utils.mongo_connector import LEDGER_OK, Collections, notify_case_written
+from utils.async_mongo import (
+    get_async_db, close_async_client, AsyncBulkWriter, replace_timeseries_async,
+    load_manifest_async, update_manifest_async, find_ingested_async, record_ingest_async, prune_unique_errors_async,
+    apply_rollups_async,
+)
+from utils.fingerprint import case_digest
+from extractors.block_classifier import ASK, QUARANTINE, POLICIES, configure_classifier
+from extractors.magnetic_readings import explode_magnetic_readings
+from utils.metrics import METRICS, export_metrics, profiled
+from run_ingest import _setup_logging, _print_batch_report, find_case_pairs, parse_case_data, ledger_entry, load_json
+
+_DONE = object()
+_PROCEDURE_TAG = (0, "PROCEDURE")
+_UNIQUE_ERRORS_TAG = (0, "UNIQUE ERRORS")
+
+
+def _load_files(json_path: str, txt_path: str):
+    j = load_json(json_path)
+    with METRICS.time("txt_read"), open(txt_path, "r", encoding="utf-8") as fh:
+        lines = fh.read().splitlines()
+    METRICS.inc("bytes_read", os.path.getsize(txt_path), kind="txt")
+    return j, lines
+
+
+def _parse_in_worker(j, lines, json_path, txt_path, known=None):
+    """Runs in the process pool; the worker's metrics travel back in case["metrics"]."""
+    started = time.perf_counter()
+    case = parse_case_data(j, METRICS.timed_iter(iter_blocks(lines), "txt_extract"), json_path, txt_path, known)
+    case["parse_seconds"] = time.perf_counter() - started
+    case["metrics"] = METRICS.drain()
+    return case
+
+
+async def write_case_async(adb, case: dict) -> dict:
+    """
+    Async write_case: procedure, UniqueErrors and blocks through one AsyncBulkWriter,
+    then magnetic readings, the stale UniqueErrors, the rollups and the manifest.
+    Like the sync _ingest_streaming, a failed procedure / UniqueErrors write doesn't
+    orphan the stored blocks: their manifest is still updated, the stale-entry delete
+    and the rollups are skipped, and the case is recorded as 'partial' (as it is
+    when the rollups fail).
+    """
+    started = time.perf_counter()
+    skipped_blocks = 0
+    problematic_blocks = []
+
+    writer = AsyncBulkWriter(adb)
+    writer.add(case["procedure"], tag=_PROCEDURE_TAG)
+    for doc in case["unique_errors"]:
+        writer.add({**doc, "_collection": Collections.UniqueErrors}, tag=_UNIQUE_ERRORS_TAG)
+    for idx, header, doc in case["parsed"]:
+        try:
+            writer.add(doc, tag=(idx, header))
+        except Exception as e:
+            skipped_blocks += 1
+            problematic_blocks.append({"index": idx, "header": header, "error": str(e), "doc": doc})
+    await writer.flush()
+
+    written = {doc["content_hash"] for _, _, doc in case["parsed"] if doc.get("content_hash")}
+    procedure_error = None
+    for err in writer.errors:
+        if err["tag"] in (_PROCEDURE_TAG, _UNIQUE_ERRORS_TAG):
+            procedure_error = procedure_error or f"{err['tag'][1].lower()}: {err['error']}"
+            logging.error(f"Failed to save {err['tag'][1].lower()} of {case['lightning_name']}: {err['error']}")
+            continue
+        written.discard(err["doc"].get("content_hash"))
+        idx, header = err["tag"]
+        skipped_blocks += 1
+        problematic_blocks.append({"index": idx, "header": header, "error": err["error"], "doc": err["doc"]})
+
+    for _, _, doc in case["parsed"]:
+        readings = explode_magnetic_readings(doc)
+        if readings:
+            await replace_timeseries_async(adb, Collections.MagneticReadings,
+                                           {"lightning_name": doc["lightning_name"]}, readings)
+
+    if procedure_error is None:
+        await prune_unique_errors_async(adb, case["lightning_name"], case["unique_errors"])
+        try:
+            await apply_rollups_async(adb, case["lightning_name"], case["rollups"])
+        except Exception as e:
+            procedure_error = f"rollups: {e}"
+            logging.error(f"Failed to apply rollups of {case['lightning_name']}: {e}")
+    await update_manifest_async(adb, case["lightning_name"], case["known"], case["fingerprints"], written)
+    notify_case_written(case["lightning_name"])
+
+    return {
+        "status": "partial" if procedure_error else LEDGER_OK,
+        "error": procedure_error,
+        "saved_blocks": len(case["parsed"]) - skipped_blocks,
+        "unchanged_blocks": case["unchanged_blocks"],
+        "skipped_blocks": case["skipped_blocks"] + skipped_blocks,
+        "problematic_blocks": case["problematic_blocks"] + problematic_blocks,
+        "write_seconds": time.perf_counter() - started,
+    }
+
+
+async def _run_stage(fn, in_q, out_q, concurrency: int, downstream: int):
+    """Run `concurrency` workers pulling from in_q; forward non-None results to out_q."""
+    async def worker():
+        while True:
+            item = await in_q.get()
+            if item is _DONE:
+                return
+            out = await fn(item)
+            if out is not None and out_q is not None:
+                await out_q.put(out)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    if out_q is not None:
+        for _ in range(downstream):
+            await out_q.put(_DONE)
+
+
+async def run_pipeline(root_dir: str, readers: int = 2, parsers: int = None, writers: int = 2,
+                       queue_size: int = 4, unknown_policy: str = QUARANTINE, incremental: bool = True) -> list:
+    """
+    Ingest every JSON/TXT pair under root_dir with overlapping stages.
+
+    Args:
+        readers (int): concurrent file readers (threads)
+        parsers (int): parser processes (default: CPU count)
+        writers (int): concurrent MongoDB case writers
+        queue_size (int): max cases waiting between two stages
+        incremental (bool): skip pairs already in the ingest ledger, and blocks whose
+            fingerprint is in the case's manifest
+    """
+    _setup_logging()
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+
+    pairs, unmatched = find_case_pairs(root_dir)
+    logging.info(f"Found {len(pairs)} cases under {root_dir} ({len(unmatched)} unmatched JSON files)")
+    print(f"Found {len(pairs)} cases ({len(unmatched)} unmatched JSON files)")
+
+    results = {
+        json_path: {"lightning_name": name, "json_path": json_path, "txt_path": txt_path,
+                    "total_blocks": 0, "saved_blocks": 0, "unchanged_blocks": 0, "skipped_blocks": 0}
+        for name, json_path, txt_path in pairs
+    }
+    read_q, parse_q, write_q = (asyncio.Queue(maxsize=queue_size) for _ in range(3))
+    adb = get_async_db()
+    digests = {}
+
+    async def record(json_path, duration_s):
+        if json_path not in digests:
+            return
+        try:
+            await record_ingest_async(adb, digests[json_path], ledger_entry(results[json_path], duration_s))
+        except Exception as e:
+            logging.error(f"Failed to record ledger entry for {json_path}: {e}")
+
+    pool = ProcessPoolExecutor(max_workers=parsers, initializer=configure_classifier, initargs=(unknown_policy,))
+    n_parsers = parsers or os.cpu_count() or 1
+
+    async def read(pair):
+        lightning_name, json_path, txt_path = pair
+        try:
+            with METRICS.time("case_digest"):
+                digests[json_path] = await asyncio.to_thread(case_digest, json_path, txt_path)
+            done = await find_ingested_async(adb, [digests[json_path]]) if incremental else {}
+        except Exception as e:
+            logging.warning(f"Ingest ledger check failed for {json_path}: {e}")
+            done = {}
+        if done:
+            entry = done[digests[json_path]]
+            results[json_path].update(status="unchanged", total_blocks=entry["total_blocks"])
+            logging.info(f"Case {lightning_name} already ingested ({entry['ingested_at']}), skipping")
+            return None
+        try:
+            j, lines = await asyncio.to_thread(_load_files, json_path, txt_path)
+            known = await load_manifest_async(adb, lightning_name) if incremental else None
+        except Exception as e:
+            results[json_path].update(status="failed", error=f"read: {e}")
+            logging.error(f"Failed to read case {json_path}: {e}")
+            await record(json_path, 0.0)
+            return None
+        return j, lines, json_path, txt_path, known
+
+    async def parse(item):
+        j, lines, json_path, txt_path, known = item
+        try:
+            case = await loop.run_in_executor(pool, _parse_in_worker, j, lines, json_path, txt_path, known)
+            METRICS.merge(case.pop("metrics", None))
+        except Exception as e:
+            results[json_path].update(status="failed", error=f"parse: {e}")
+            logging.error(f"Failed to parse case {json_path}: {e}")
+            await record(json_path, 0.0)
+            return None
+        results[json_path].update(total_blocks=case["total_blocks"], parse_seconds=case["parse_seconds"])
+        return case
+
+    async def write(case):
+        result = results[case["json_path"]]
+        try:
+            result.update(await write_case_async(adb, case))
+        except Exception as e:
+            result.update(status="failed", error=f"write: {e}")
+            logging.error(f"Failed to write case {result['lightning_name']}: {e}")
+            await record(case["json_path"], result.get("parse_seconds", 0.0))
+            return None
+        await record(case["json_path"], result.get("parse_seconds", 0.0) + result["write_seconds"])
+        logging.info(
+            f"Case {result['lightning_name']}: {result['saved_blocks']}/{result['total_blocks']} saved, "
+            f"{result['unchanged_blocks']} unchanged, {result['skipped_blocks']} skipped"
+        )
+        return None
+
+    async def feed():
+        for pair in pairs:
+            await read_q.put(pair)
+        for _ in range(readers):
+            await read_q.put(_DONE)
+
+    try:
+        await asyncio.gather(
+            feed(),
+            _run_stage(read, read_q, parse_q, readers, n_parsers),
+            _run_stage(parse, parse_q, write_q, n_parsers, writers),
+            _run_stage(write, write_q, None, writers, 0),
+        )
+    finally:
+        pool.shutdown()
+        await close_async_client()
+
+    elapsed = time.perf_counter() - started
+    ordered = [results[json_path] for _, json_path, _ in pairs]
+    _print_batch_report(ordered, unmatched, elapsed)
+    METRICS.log_stage_report()
+    return ordered
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Async batch ingest with overlapping read/parse/write stages")
+    parser.add_argument("--dir", required=True, help="ingest every JSON/TXT pair under this directory")
+    parser.add_argument("--readers", type=int, default=2, help="concurrent file readers")
+    parser.add_argument("--parsers", type=int, default=None, help="parser processes (default: CPU count)")
+    parser.add_argument("--writers", type=int, default=2, help="concurrent MongoDB case writers")
+    parser.add_argument("--queue-size", type=int, default=4, help="max cases queued between stages")
+    parser.add_argument("--unknown-policy", choices=[p for p in POLICIES if p != ASK], default=QUARANTINE,
+                        help="what to do with blocks no rule/decision recognizes")
+    parser.add_argument("--full", action="store_true",
+                        help="re-ingest every case and block, ignoring the ledger and stored fingerprints")
+    parser.add_argument("--metrics-json", help="write per-stage timers/counters/histograms as JSON to this file")
+    parser.add_argument("--metrics-prom", help="write the same metrics in Prometheus text format to this file")
+    parser.add_argument("--profile", help="cProfile the run (main process) and dump pstats to this file")
+    args = parser.parse_args()
+
+    with profiled(args.profile):
+        asyncio.run(run_pipeline(args.dir, readers=args.readers, parsers=args.parsers, writers=args.writers,
+                                 queue_size=args.queue_size, unknown_policy=args.unknown_policy,
+                                 incremental=not args.full))
+    export_metrics(args.metrics_json, args.metrics_prom)
@@ -5,8 +5,10 @@ Single source of truth for MongoDB schema 'nuances':
 - Allowed collections
 - Unique keys policy (by collection)
 - Index specs (unique/sparse/index names)
+- Time-series collections
 """
 
+import logging
 from typing import Dict, List, Tuple
 
 
@@ -16,6 +18,15 @@ ALLOWED_COLLECTIONS: List[str] = [
     "Errors",
     "Catheter",
     "Events",
+    "Quarantine",  # unrecognized blocks kept raw for later review
+    "MagneticReadings",  # time-series: per-channel impedance/state readings
+    "IngestManifests",   # per lightning_name: fingerprints of the blocks already stored
+    "IngestLedger",      # per JSON/TXT digest: outcome of the last ingest of that exact pair
+    "UniqueErrors",      # analysis.json uniqueErrors flattened: one doc per case × phase × closed × errorId
+    "ErrorRollups",      # totals per (error_id, hospital_name, month), maintained by ingest ($inc)
+    "CatheterRollups",   # totals per (catheter_id, part_number)
+    "ProcedureRollups",  # totals per (hospital_name, carto_version, month)
+    "RollupContributions",  # per lightning_name: what the case last added to the rollups
 ]
 
 def get_allowed_collections() -> List[str]:
@@ -28,6 +39,14 @@ UNIQUE_KEYS: Dict[str, Tuple[str, ...]] = {
     "Catheter":  ("lightning_name", "catheter_ids"),
     "Errors":    ("lightning_name", "error_ids"),
     "Events":    ("lightning_name", "event_key"),  # event_key = canonical (sorted) of event_ids
+    "Quarantine": ("lightning_name", "header"),
+    "IngestManifests": ("lightning_name",),
+    "IngestLedger": ("digest",),
+    "UniqueErrors": ("lightning_name", "phase", "closed", "error_id"),
+    "ErrorRollups": ("error_id", "hospital_name", "month"),
+    "CatheterRollups": ("catheter_id", "part_number"),
+    "ProcedureRollups": ("hospital_name", "carto_version", "month"),
+    "RollupContributions": ("lightning_name",),
     # Procedures intentionally has no unique key here
 }
 
@@ -37,6 +56,10 @@ def get_unique_keys(collection: str) -> Tuple[str, ...]:
 
 # 3) Index specifications (created only by init)
 #    For Events, we use 'sparse=True' to avoid blocking inserts while migrating to event_key.
+#    Optional per spec: "partial" (partialFilterExpression) and "ttl_seconds" (expireAfterSeconds,
+#    single date field). Changed specs are re-created by ensure_collections_and_indexes;
+#    `python advise_indexes.py` checks them against the queries we actually run.
+LEDGER_FAILED_TTL_SECONDS = 30 * 24 * 3600
 INDEX_SPECS: Dict[str, List[dict]] = {
     "Catheter": [
         {
@@ -44,7 +67,14 @@ INDEX_SPECS: Dict[str, List[dict]] = {
             "unique": True,
             "name": "uniq_catheter_lightning_id",
             "sparse": False,
-        }
+        },
+        {
+            # utils.queries.catheter_history: one catheter across cases
+            "keys": [("catheter_ids", 1), ("first_occurrence", 1)],
+            "unique": False,
+            "name": "idx_catheter_ids_first",
+            "sparse": False,
+        },
     ],
     "Errors": [
         {
@@ -52,7 +82,14 @@ INDEX_SPECS: Dict[str, List[dict]] = {
             "unique": True,
             "name": "uniq_errors_lightning_errorid",
             "sparse": False,
-        }
+        },
+        {
+            # one error ID (TXT blocks) across cases
+            "keys": [("error_id", 1), ("lightning_name", 1)],
+            "unique": False,
+            "name": "idx_errors_errorid_lightning",
+            "sparse": False,
+        },
     ],
     "Events": [
         {
@@ -60,32 +97,286 @@ INDEX_SPECS: Dict[str, List[dict]] = {
             "unique": True,
             "name": "uniq_events_lightning_eventkey",
             "sparse": True,  # allow docs missing event_key during transition
+        },
+        {
+            "keys": [("event_type", 1), ("lightning_name", 1)],
+            "unique": False,
+            "name": "idx_events_type_lightning",
+            "sparse": False,
+        },
+    ],
+    "Quarantine": [
+        {
+            "keys": [("lightning_name", 1), ("header", 1)],
+            "unique": True,
+            "name": "uniq_quarantine_lightning_header",
+            "sparse": False,
         }
     ],
-    # Procedures: add indexes here if you need in future
+    "IngestManifests": [
+        {
+            "keys": [("lightning_name", 1)],
+            "unique": True,
+            "name": "uniq_manifest_lightning",
+            "sparse": False,
+        }
+    ],
+    "IngestLedger": [
+        {
+            "keys": [("digest", 1)],
+            "unique": True,
+            "name": "uniq_ledger_digest",
+            "sparse": False,
+        },
+        {
+            "keys": [("lightning_name", 1), ("ingested_at", -1)],
+            "unique": False,
+            "name": "idx_ledger_lightning_time",
+            "sparse": False,
+        },
+        {
+            # failed attempts are retried anyway; keep their diagnostics for a month
+            "keys": [("ingested_at", 1)],
+            "unique": False,
+            "name": "ttl_ledger_failed",
+            "sparse": False,
+            "partial": {"status": "failed"},
+            "ttl_seconds": LEDGER_FAILED_TTL_SECONDS,
+        },
+    ],
+    "UniqueErrors": [
+        {
+            "keys": [("lightning_name", 1), ("phase", 1), ("closed", 1), ("error_id", 1)],
+            "unique": True,
+            "name": "uniq_unique_errors_lightning_phase_errorid",
+            "sparse": False,
+        },
+        {
+            # cross-case: one errorId in one hospital, newest first (totals live in ErrorRollups)
+            "keys": [("error_id", 1), ("hospital_name", 1), ("procedure_date", -1)],
+            "unique": False,
+            "name": "idx_unique_errors_errorid_hospital_date",
+            "sparse": False,
+        },
+        {
+            # utils.queries.errors_by_id: one errorId across cases, newest first
+            "keys": [("error_id", 1), ("procedure_date", -1)],
+            "unique": False,
+            "name": "idx_unique_errors_errorid_date",
+            "sparse": False,
+        },
+        {
+            # errors still open at the end of the case (a small slice of the collection)
+            "keys": [("error_id", 1), ("hospital_name", 1)],
+            "unique": False,
+            "name": "idx_unique_errors_unclosed",
+            "sparse": False,
+            "partial": {"closed": False},
+        },
+        {
+            "keys": [("hospital_name", 1), ("procedure_date", -1)],
+            "unique": False,
+            "name": "idx_unique_errors_hospital_date",
+            "sparse": False,
+        },
+    ],
+    # rollups: the unique key is the point lookup; prefixes serve per-hospital / per-month reads
+    "ErrorRollups": [
+        {
+            "keys": [("error_id", 1), ("hospital_name", 1), ("month", 1)],
+            "unique": True,
+            "name": "uniq_error_rollup_errorid_hospital_month",
+            "sparse": False,
+        },
+        {
+            "keys": [("hospital_name", 1), ("month", 1)],
+            "unique": False,
+            "name": "idx_error_rollup_hospital_month",
+            "sparse": False,
+        },
+    ],
+    "CatheterRollups": [
+        {
+            "keys": [("catheter_id", 1), ("part_number", 1)],
+            "unique": True,
+            "name": "uniq_catheter_rollup_id_part",
+            "sparse": False,
+        }
+    ],
+    "ProcedureRollups": [
+        {
+            "keys": [("hospital_name", 1), ("carto_version", 1), ("month", 1)],
+            "unique": True,
+            "name": "uniq_procedure_rollup_hospital_version_month",
+            "sparse": False,
+        }
+    ],
+    "RollupContributions": [
+        {
+            "keys": [("lightning_name", 1)],
+            "unique": True,
+            "name": "uniq_rollup_contrib_lightning",
+            "sparse": False,
+        }
+    ],
+    "MagneticReadings": [
+        {
+            "keys": [("meta.lightning_name", 1), ("meta.channel", 1), ("ts", 1)],
+            "unique": False,
+            "name": "ts_magnetic_lightning_channel_ts",
+            "sparse": False,
+        },
+        {
+            "keys": [("meta.channel", 1), ("ts", 1)],
+            "unique": False,
+            "name": "ts_magnetic_channel_ts",
+            "sparse": False,
+        },
+    ],
+    "Procedures": [
+        {
+            # newest procedure doc of a case (a re-ingest inserts a new one)
+            "keys": [("lightningName", 1), ("updated_at", -1)],
+            "unique": False,
+            "name": "idx_procedures_lightning_updated",
+            "sparse": False,
+        },
+        {
+            "keys": [("hospitalName", 1), ("procedureDate", -1)],
+            "unique": False,
+            "name": "idx_procedures_hospital_date",
+            "sparse": False,
+        },
+        {
+            "keys": [("cartoVersion", 1), ("procedureDate", -1)],
+            "unique": False,
+            "name": "idx_procedures_version_date",
+            "sparse": False,
+        },
+        {
+            "keys": [("procedureDate", -1)],
+            "unique": False,
+            "name": "idx_procedures_date",
+            "sparse": False,
+        },
+        {
+            "keys": [("cathetersUsed.catheterID", 1)],  # multikey
+            "unique": False,
+            "name": "idx_procedures_catheter",
+            "sparse": False,
+        },
+    ],
 }
 
 def get_index_specs(collection: str) -> List[dict]:
     return INDEX_SPECS.get(collection, [])
 
 
-# 4) One-shot function to create collections + indexes (to be called by init only)
-def ensure_collections_and_indexes(db) -> None:
+# 4) Time-series collections (created with these options; no unique indexes allowed)
+#    Re-ingest replaces a case's readings (delete by meta.lightning_name, then insert).
+TIMESERIES_SPECS: Dict[str, dict] = {
+    "MagneticReadings": {
+        "timeField": "ts",
+        "metaField": "meta",  # {"lightning_name", "channel"}
+        "granularity": "seconds",
+    },
+}
+
+def get_timeseries_spec(collection: str) -> dict:
+    return TIMESERIES_SPECS.get(collection, {})
+
+
+# 5) One-shot function to create collections + indexes (to be called by init only)
+def _index_options(spec: dict) -> dict:
+    opts = {"unique": spec.get("unique", False), "sparse": spec.get("sparse", False)}
+    if spec.get("partial"):
+        opts["partialFilterExpression"] = spec["partial"]
+    if spec.get("ttl_seconds") is not None:
+        opts["expireAfterSeconds"] = spec["ttl_seconds"]
+    return opts
+
+def _key_list(keys) -> list:
+    return [(k, int(d) if isinstance(d, (int, float)) else d) for k, d in keys]
+
+def _index_matches(spec: dict, info: dict) -> bool:
+    """Does an existing index (index_information() entry) match the spec exactly?"""
+    if _key_list(info.get("key", [])) != _key_list(spec["keys"]):
+        return False
+    want = _index_options(spec)
+    have = {
+        "unique": bool(info.get("unique", False)),
+        "sparse": bool(info.get("sparse", False)),
+        "partialFilterExpression": info.get("partialFilterExpression"),
+        "expireAfterSeconds": info.get("expireAfterSeconds"),
+    }
+    return all(have.get(k) == v for k, v in want.items()) and \
+        all(have[k] is None for k in ("partialFilterExpression", "expireAfterSeconds") if k not in want)
+
+def plan_index_changes(db, drop_unknown: bool = False) -> Dict[str, dict]:
+    """
+    Diff the existing indexes against INDEX_SPECS.
+
+    Returns:
+        dict: {collection: {"create": [spec], "recreate": [spec], "drop": [index name]}}
+        (only collections with something to do). An index with a spec's keys
+        under another name is dropped either way; other unknown indexes only
+        with drop_unknown (never _id_, nor on time-series collections, whose
+        meta/time index is created by the server).
+    """
+    plan = {}
+    for col in ALLOWED_COLLECTIONS:
+        specs = INDEX_SPECS.get(col, [])
+        existing = dict(db[col].index_information())
+        existing.pop("_id_", None)
+        by_name = {spec["name"]: spec for spec in specs}
+        wanted_keys = {tuple(_key_list(spec["keys"])): spec["name"] for spec in specs}
+
+        todo = {"create": [], "recreate": [], "drop": []}
+        for spec in specs:
+            info = existing.get(spec["name"])
+            if info is None:
+                todo["create"].append(spec)
+            elif not _index_matches(spec, info):
+                todo["recreate"].append(spec)
+        for name, info in existing.items():
+            if name in by_name:
+                continue
+            renamed = tuple(_key_list(info.get("key", []))) in wanted_keys
+            if renamed or (drop_unknown and col not in TIMESERIES_SPECS):
+                todo["drop"].append(name)
+        if any(todo.values()):
+            plan[col] = todo
+    return plan
+
+def ensure_collections_and_indexes(db, drop_unknown: bool = False, dry_run: bool = False) -> Dict[str, dict]:
+    """
+    Create missing collections, then bring every collection's indexes in line
+    with INDEX_SPECS: create missing ones, drop + re-create changed ones, and
+    drop unknown ones when drop_unknown. dry_run only computes the plan.
+
+    Returns:
+        dict: the plan_index_changes() result that was (or would be) applied
+    """
     existing = set(db.list_collection_names())
 
     # Create collections if missing
-    for name in ALLOWED_COLLECTIONS:
-        if name not in existing:
-            db.create_collection(name)
-
-    # Create indexes according to INDEX_SPECS
-    for col, specs in INDEX_SPECS.items():
-        if col not in ALLOWED_COLLECTIONS:
-            continue
-        for spec in specs:
-            db[col].create_index(
-                spec["keys"],
-                name=spec.get("name"),
-                unique=spec.get("unique", False),
-                sparse=spec.get("sparse", False),
-            )
+    if not dry_run:
+        for name in ALLOWED_COLLECTIONS:
+            if name not in existing:
+                if name in TIMESERIES_SPECS:
+                    db.create_collection(name, timeseries=TIMESERIES_SPECS[name])
+                else:
+                    db.create_collection(name)
+
+    plan = plan_index_changes(db, drop_unknown=drop_unknown)
+    if dry_run:
+        return plan
+
+    for col, todo in plan.items():
+        for name in todo["drop"] + [spec["name"] for spec in todo["recreate"]]:
+            logging.info(f"Dropping index {col}.{name}")
+            db[col].drop_index(name)
+        for spec in todo["recreate"] + todo["create"]:
+            logging.info(f"Creating index {col}.{spec['name']} {spec['keys']}")
+            db[col].create_index(spec["keys"], name=spec["name"], **_index_options(spec))
+    return plan
@@ -0,0 +1,41 @@
+import argparse
+import logging
+
+from utils.mongo_connector import DB_NAME, close_client
+from utils.snapshot import SNAPSHOT_BATCH_SIZE, SNAPSHOT_COLLECTIONS, export_snapshot, load_snapshot
+
+def main(args):
+    logging.basicConfig(
+        filename="snapshot.log",
+        filemode="w",
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(message)s"
+    )
+
+    if args.command == "export":
+        print(f"🔹 Exporting {', '.join(args.collections)} from '{DB_NAME}' to {args.root}")
+        exported = export_snapshot(args.root, args.collections, batch_size=args.batch_size)
+        for col, n in exported.items():
+            print(f"   {col}: {n} documents")
+        print("✅ Snapshot written.")
+    else:
+        mode = "upsert on _id" if args.upsert else "insert"
+        print(f"🔹 Loading {args.root} into '{DB_NAME}' ({mode})")
+        loaded = load_snapshot(args.root, args.collections, months=args.months, hospitals=args.hospitals,
+                               upsert=args.upsert, batch_size=args.batch_size)
+        for col, totals in loaded.items():
+            print(f"   {col}: {totals['written']} written, {totals['duplicates']} already present, "
+                  f"{totals['errors']} errors")
+        print("✅ Snapshot loaded. Run rebuild_rollups.py to recompute the rollups.")
+    close_client()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export / load Parquet snapshots of the ingested cases")
+    parser.add_argument("command", choices=("export", "load"))
+    parser.add_argument("root", help="snapshot directory")
+    parser.add_argument("--collections", nargs="+", default=list(SNAPSHOT_COLLECTIONS))
+    parser.add_argument("--months", nargs="+", help="load only these months (YYYY-MM)")
+    parser.add_argument("--hospitals", nargs="+", help="load only these hospitals")
+    parser.add_argument("--upsert", action="store_true", help="replace documents with the same _id instead of skipping them")
+    parser.add_argument("--batch-size", type=int, default=SNAPSHOT_BATCH_SIZE)
+    main(parser.parse_args())
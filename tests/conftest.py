@@ -0,0 +1,39 @@
+"""
+conftest.py
+-----------
+Shared fixtures: the sample case under data/ and a throwaway mongomock
+database behind mongo_connector.get_db() (tests using it are skipped when
+mongomock isn't installed: pip install mongomock).
+"""
+
+import os
+
+import pytest
+
+import run_ingest
+from utils import mongo_connector
+from extractors.block_classifier import QUARANTINE, configure_classifier
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+SAMPLE_JSON = os.path.join(DATA_DIR, "analysis.json")
+SAMPLE_TXT = os.path.join(DATA_DIR, "Bookmarks Data3.txt")
+MOCK_DB = "medical_db_test"
+
+
+@pytest.fixture
+def sample_case():
+    configure_classifier(QUARANTINE)
+    return run_ingest.parse_case(SAMPLE_JSON, SAMPLE_TXT)
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    mongo_connector.close_client()
+    monkeypatch.setattr(mongo_connector, "MongoClient", mongomock.MongoClient)
+    monkeypatch.setattr(mongo_connector, "DB_NAME", MOCK_DB)
+    db = mongo_connector.get_db()
+    db.client.drop_database(MOCK_DB)
+    yield db
+    db.client.drop_database(MOCK_DB)
+    mongo_connector.close_client()
@@ -0,0 +1,149 @@
+"""
+test_analytics.py
+-----------------
+utils.analytics against plain Python loops over the same mongomock data
+(the sample case plus a second, trimmed copy of it), and the Parquet cache.
+"""
+
+import copy
+import itertools
+from collections import defaultdict
+
+import pytest
+
+import run_ingest
+from utils import analytics
+from utils.metrics import METRICS
+from utils.mongo_connector import Collections
+
+pytest.importorskip("numpy")
+pytest.importorskip("pyarrow")
+
+OTHER = "PC-OTHER"
+
+
+def _other_case(case: dict) -> dict:
+    """The sample case under another name, with every third error gone and rescaled magnetic readings."""
+    case = copy.deepcopy(case)
+    case["lightning_name"] = case["procedure"]["lightningName"] = OTHER
+    case["unique_errors"] = [dict(e, lightning_name=OTHER) for i, e in enumerate(case["unique_errors"]) if i % 3]
+    case["rollups"] = {}
+    for _, _, doc in case["parsed"]:
+        doc["lightning_name"] = OTHER
+        timeline = doc.get("event_sessions_parsed")
+        if timeline and "value" in timeline:
+            timeline["value"] = [v * 1.1 if v is not None else None for v in timeline["value"]]
+    return case
+
+
+@pytest.fixture
+def two_cases(mock_db, sample_case):
+    other = _other_case(sample_case)
+    run_ingest.write_case(sample_case)
+    run_ingest.write_case(other)
+    return mock_db
+
+
+def _rows(table) -> list:
+    return table.to_pylist()
+
+
+def test_error_cooccurrence(two_cases):
+    errors = defaultdict(set)
+    for d in two_cases[Collections.UniqueErrors].find():
+        errors[d["lightning_name"]].add(d["error_id"])
+    expected = defaultdict(int)
+    for ids in errors.values():
+        for a, b in itertools.combinations_with_replacement(sorted(ids), 2):
+            expected[(a, b)] += 1
+
+    got = {(r["error_a"], r["error_b"]): r["cases"] for r in _rows(analytics.error_cooccurrence())}
+    assert got == dict(expected)
+    assert set(got.values()) == {1, 2}
+
+    ids, matrix = analytics.cooccurrence_matrix(analytics.error_cooccurrence())
+    pos = {e: i for i, e in enumerate(ids)}
+    for (a, b), n in expected.items():
+        assert matrix[pos[a], pos[b]] == matrix[pos[b], pos[a]] == n
+
+
+def test_impedance_drift(two_cases):
+    first, last = {}, {}
+    for d in two_cases[Collections.MagneticReadings].find({"kind": "reading"}):
+        key = (d["meta"]["lightning_name"], d["meta"]["channel"])
+        if d["label"] == "First reading" and (key not in first or d["ts"] < first[key]["ts"]):
+            first[key] = d
+        if d["label"] == "Last reading" and (key not in last or d["ts"] >= last[key]["ts"]):
+            last[key] = d
+    per_channel = defaultdict(list)
+    for key in first.keys() & last.keys():
+        f, l = first[key], last[key]
+        hours = (l["ts"] - f["ts"]).total_seconds() / 3600
+        per_channel[key[1]].append((l["value"] - f["value"], (l["value"] - f["value"]) / hours if hours > 0 else None))
+    assert per_channel
+
+    got = {r["channel"]: r for r in _rows(analytics.impedance_drift())}
+    assert set(got) == set(per_channel)
+    for channel, drifts in per_channel.items():
+        values = [d for d, _ in drifts]
+        rates = [r for _, r in drifts if r is not None]
+        row = got[channel]
+        assert row["cases"] == len(values) == 2
+        assert row["drift_mean"] == pytest.approx(sum(values) / len(values))
+        assert row["drift_min"] == pytest.approx(min(values))
+        assert row["drift_max"] == pytest.approx(max(values))
+        assert row["drift_per_hour_mean"] == (pytest.approx(sum(rates) / len(rates)) if rates else None)
+
+
+def test_catheter_connections(two_cases):
+    sessions = defaultdict(list)
+    cases = defaultdict(set)
+    for d in two_cases[Collections.Catheter].find():
+        timeline = d.get(analytics.CATHETER_SESSIONS) or {}
+        for duration in timeline.get("duration_s") or []:
+            if duration is not None:
+                key = (d["catheter_ids"], d.get("part_number"))
+                sessions[key].append(duration)
+                cases[key].add(d["lightning_name"])
+
+    got = {(r["catheter_id"], r["part_number"]): r for r in _rows(analytics.catheter_connections())}
+    assert set(got) == set(sessions)
+    for key, durations in sessions.items():
+        row = got[key]
+        assert row["cases"] == len(cases[key])
+        assert row["sessions"] == len(durations)
+        assert row["connected_s_total"] == sum(durations)
+        assert row["connected_s_mean"] == pytest.approx(sum(durations) / len(durations))
+        assert row["connected_s_max"] == max(durations)
+
+    # QDOT MICRO 18091 and 6098 report the same four connect sessions in the sample TXT
+    assert got[("18091", "D-1395-04-S")]["connected_s_total"] == got[("6098", "N/A")]["connected_s_total"] == 2 * 4450
+
+
+def _cache_counts() -> dict:
+    return {c["labels"]["result"]: c["value"] for c in METRICS.summary()["counters"]
+            if c["name"] == "analytics_cache" and c["labels"]["query"] == "catheter_connections"}
+
+
+def test_parquet_cache_hit_and_refresh(mock_db, sample_case, tmp_path, monkeypatch):
+    monkeypatch.setattr(analytics, "ANALYTICS_CACHE_DIR", str(tmp_path))
+    run_ingest.write_case(sample_case)
+    METRICS.reset()
+    try:
+        cached = analytics.catheter_connections(cache=True)
+        assert len(list(tmp_path.glob("catheter_connections-*.parquet"))) == 1
+
+        run_ingest.write_case(_other_case(sample_case))
+        fresh = analytics.catheter_connections()
+        assert fresh != cached
+
+        assert analytics.catheter_connections(cache=True) == cached          # hit: the stored table
+        assert analytics.catheter_connections(cache=True, refresh=True) == fresh
+        assert analytics.catheter_connections(cache=True) == fresh           # the refresh was stored
+        assert analytics.catheter_connections({"lightning_name": OTHER}, cache=True) != fresh  # other key
+
+        monkeypatch.setattr(analytics, "ANALYTICS_CACHE_TTL", 0)
+        assert analytics.catheter_connections(cache=True) == fresh           # expired: recomputed
+        assert _cache_counts() == {"miss": 4, "hit": 2}
+    finally:
+        METRICS.reset()
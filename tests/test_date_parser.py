@@ -0,0 +1,90 @@
+"""
+test_date_parser.py
+-------------------
+The regex fast paths, the per-field learned format and the LRU cache of
+extractors.date_parser must give exactly what plain strptime over FORMATS
+gives, for every accepted format.
+"""
+
+from datetime import datetime
+
+import pytest
+
+from extractors import date_parser
+from extractors.date_parser import FORMATS, parse_carto_stamp, parse_datetime
+
+SAMPLE_DATETIMES = (
+    datetime(2025, 7, 25, 18, 31, 49, 312000),
+    datetime(2025, 1, 5, 9, 4, 0),
+    datetime(2024, 2, 29, 0, 0, 0, 7000),   # leap day, midnight
+    datetime(2025, 12, 31, 23, 59, 59, 999000),
+)
+
+
+def _render(dt: datetime, fmt: str) -> str:
+    if fmt == "%Y.%m.%d_%H.%M.%S.%f":  # CARTO stamps have milliseconds
+        return dt.strftime("%Y.%m.%d_%H.%M.%S.") + f"{dt.microsecond // 1000:03d}"
+    return dt.strftime(fmt)
+
+
+def _strptime(s: str):
+    for fmt in FORMATS:
+        try:
+            return datetime.strptime(s, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+CASES = [(fmt, _render(dt, fmt)) for fmt in FORMATS for dt in SAMPLE_DATETIMES] + [
+    ("%d-%b-%Y %H:%M:%S", "5-Jul-2025 8:01:02"),  # unpadded day / hour
+    ("%d-%b-%Y", "05-jul-2025"),                  # lower-case month
+    ("%Y-%m-%dT%H:%M:%S", " 2025-07-25T18:31:49 "),
+]
+
+
+@pytest.fixture(autouse=True)
+def _fresh_state():
+    date_parser._parse_cached.cache_clear()
+    date_parser._learned.clear()
+    yield
+    date_parser._parse_cached.cache_clear()
+    date_parser._learned.clear()
+
+
+@pytest.mark.parametrize("fmt,text", CASES)
+def test_matches_strptime(fmt, text):
+    expected = _strptime(text.strip())
+    assert expected is not None
+    assert date_parser._fast_parse(text.strip()) in (None, expected)
+    assert parse_datetime(text) == expected
+    assert parse_datetime(text, field="procedureDate") == expected
+    assert parse_datetime(text) == expected  # cached
+
+
+def test_fast_paths_cover_the_carto_formats():
+    for text in ("2025.07.25_09.20.00.312", "25-Jul-2025 18:31:49", "25-Jul-2025", "2025-07-25", "2025-07-25 18:31:49"):
+        assert date_parser._fast_parse(text) == _strptime(text)
+
+
+def test_learned_format_does_not_change_results():
+    assert parse_datetime("25/07/2025 18:31:49", field="uploadDate") == datetime(2025, 7, 25, 18, 31, 49)
+    assert date_parser._learned["uploadDate"] == "%d/%m/%Y %H:%M:%S"
+    # another format on the same field: the learned one is tried first and fails cleanly
+    assert parse_datetime("Jul 25, 2025", field="uploadDate") == datetime(2025, 7, 25)
+    assert parse_datetime("2025/07/25", field="uploadDate") == datetime(2025, 7, 25)
+
+
+@pytest.mark.parametrize("text", ["31-Feb-2025", "32-Jul-2025 10:00:00", "2025-13-01", "2025.07.25_25.00.00.000",
+                                  "25-Foo-2025", "not a date"])
+def test_malformed_is_none(text):
+    assert parse_datetime(text) is None
+    assert parse_datetime(text, field="procedureDate") is None
+
+
+def test_nulls_and_carto_stamp():
+    for value in date_parser.NULLS:
+        assert parse_datetime(value) is None
+    assert parse_carto_stamp("2025.07.25_09.20.00.312") == datetime(2025, 7, 25, 9, 20, 0, 312000)
+    assert parse_carto_stamp("2025.02.30_09.20.00.312") is None
+    assert parse_carto_stamp("25-Jul-2025") is None
@@ -0,0 +1,73 @@
+"""
+test_field_utils.py
+-------------------
+HeaderDispatcher (one alternation regex, registration order = priority)
+against the per-pattern checks it replaced: ERROR ID, then CATHETER ID, then
+the first BLOCK_FIELDS name contained in the header.
+"""
+
+import re
+
+import pytest
+
+from conftest import SAMPLE_TXT
+from utils.mongo_connector import Collections
+from utils.txt_parser import iter_blocks_from_txt
+from extractors.field_utils import BLOCK_FIELDS, dispatch_header, to_snake_case
+
+
+def _baseline_dispatch(header: str):
+    """The pre-dispatcher lookup: (name, collection, event_type, stored id) or None."""
+    header = header.strip().upper()
+    if "ERROR ID" in header:
+        m = re.search(r"ERROR ID\s*(\d+)", header)
+        return "ERROR ID BLOCK", Collections.Errors, "error_id_block", m.group(1) if m else None
+    if "CATHETER ID" in header:
+        return "CATHETER DETAIL BLOCK", Collections.Catheter, "catheter_detail_block", None
+    for name in BLOCK_FIELDS:
+        if name in header:
+            return name, Collections.Events, to_snake_case(name), None
+    return None
+
+
+def _dispatch(header: str):
+    match = dispatch_header(header.strip())
+    if match is None:
+        return None
+    return match.name, match.collection, match.event_type, match.block_id if match.id_field else None
+
+
+SAMPLE_HEADERS = sorted({block[0] for block in iter_blocks_from_txt(SAMPLE_TXT)})
+
+OVERLAPPING_HEADERS = [
+    "ERROR EVENTS:",
+    "ERROR ID 105",
+    "ERROR ID",                                     # no ID in the header
+    "error id 7",
+    "CATHETER EVENTS:",
+    "CATHETER ID 6098 - UNKNOWN CATHETER 6098",     # CATHETER twice
+    "CATHETER ID 18107 - THERMOCOOL SMARTTOUCH SF-5D CATHETER, MICRO ELECTRODES (PART",
+    "ERROR EVENTS FOR CATHETER ID 7",               # CATHETER ID beats ERROR EVENTS
+    "CATHETER ID 1 - ERROR ID 2",                   # ERROR ID beats an earlier CATHETER ID
+    "ABLATION EVENTS - CATHETER ID 12",
+    "PATCH EVENTS (CATHETER EVENTS)",               # first BLOCK_FIELDS name wins, not the first in the text
+    "RAW DATA ANALYSIS - STRUCTURED EVENT BREAKDOWN",
+    "SOMETHING ELSE",
+]
+
+
+def test_sample_has_the_overlapping_headers():
+    upper = [h.upper() for h in SAMPLE_HEADERS]
+    assert any(h.startswith("ERROR ID") for h in upper)
+    assert any(h.startswith("CATHETER ID") and h.count("CATHETER") > 1 for h in upper)
+    assert "CATHETER EVENTS:" in upper and "ERROR EVENTS:" in upper
+
+
+@pytest.mark.parametrize("header", SAMPLE_HEADERS + OVERLAPPING_HEADERS)
+def test_dispatch_matches_baseline(header):
+    assert _dispatch(header) == _baseline_dispatch(header)
+
+
+def test_error_id_is_captured():
+    assert dispatch_header("ERROR ID 1054").block_id == "1054"
+    assert dispatch_header("CATHETER ID 1 - ERROR ID 2").block_id == "2"
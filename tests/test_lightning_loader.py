@@ -0,0 +1,54 @@
+"""
+test_lightning_loader.py
+------------------------
+get_lightning_name reads analysis.json only up to the name key, with ijson
+and with the plain-json fallback (_name_from_head) that batch pairing uses
+when ijson isn't installed.
+"""
+
+import io
+import json
+
+import pytest
+
+from conftest import SAMPLE_JSON
+from utils import lightning_loader
+from utils.lightning_loader import _name_from_head, get_lightning_name, lightning_name_from
+
+DOCS = [
+    {"lightningName": "PC-1", "rest": list(range(10))},
+    {"count": 12345678, "ratio": -1.5e3, "ok": True, "none": None, "lightningName": "PC-2"},  # numbers split by reads
+    {"nested": {"lightningName": "inner", "s": "} ] \" {"}, "Lightning Name": "PC-3"},     # top level only
+    {"lightningName": "", "x": 1},
+    {"other": "y"},
+    {},
+]
+
+
+@pytest.mark.parametrize("doc", DOCS)
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 1 << 16])
+def test_name_from_head(doc, chunk_size):
+    expected = next((doc[k] for k in doc if k in ("Lightning Name", "lightningName") and doc[k]), "")
+    assert _name_from_head(io.StringIO(json.dumps(doc, indent=1)), chunk_size) == expected
+
+
+@pytest.mark.parametrize("text", ["", "[1, 2]", "{\"a\": [1, 2", "{\"a\" 1}", "not json"])
+def test_name_from_head_malformed(text):
+    assert _name_from_head(io.StringIO(text), 2) == ""
+
+
+def test_stops_at_the_name():
+    fh = io.StringIO(json.dumps({"lightningName": "PC-1", "tail": "x" * 1_000_000}))
+    assert _name_from_head(fh, 1024) == "PC-1"
+    assert fh.tell() < 10_000
+
+
+@pytest.mark.parametrize("with_ijson", [True, False])
+def test_get_lightning_name(monkeypatch, with_ijson):
+    if with_ijson:
+        pytest.importorskip("ijson")
+    else:
+        monkeypatch.setattr(lightning_loader, "ijson", None)
+    with open(SAMPLE_JSON, "r", encoding="utf-8") as fh:
+        expected = lightning_name_from(json.load(fh))
+    assert get_lightning_name(SAMPLE_JSON) == expected
@@ -0,0 +1,132 @@
+"""
+test_rollups.py
+---------------
+utils.rollups: per-case contributions, delta application through
+RollupContributions, the pending marker of an interrupted update and
+rebuild_rollups, on the sample case and a mongomock database.
+"""
+
+import copy
+
+import pytest
+
+import run_ingest
+from schema_config import get_unique_keys
+from utils.mongo_connector import Collections
+from utils.rollups import (
+    PENDING_FIELD, ROLLUP_COLLECTIONS, apply_rollups, case_contributions, contribution_delta, rebuild_rollups,
+    rollup_updates,
+)
+
+
+def _rollups(db) -> dict:
+    """(collection, key) -> non-zero counts of every stored rollup document."""
+    out = {}
+    for col in ROLLUP_COLLECTIONS:
+        for d in db[col].find({}, {"_id": 0, "created_at": 0, "updated_at": 0}):
+            key = tuple(d.pop(k, None) for k in get_unique_keys(col))
+            counts = {f: n for f, n in d.items() if n}
+            if counts:
+                out[(col, key)] = counts
+    return out
+
+
+def _flatten(contrib: dict) -> dict:
+    return {(col, key): dict(totals) for col, rows in contrib.items() for key, totals in rows.items()}
+
+
+def _changed(case: dict, error_id: str, extra: int) -> dict:
+    """Copy of the case whose closed `error_id` entry has `extra` more occurrences."""
+    case = copy.deepcopy(case)
+    entry = next(e for e in case["unique_errors"] if e["error_id"] == error_id and e["closed"])
+    entry["count"] += extra
+    case["rollups"] = case_contributions(case["procedure"], case["unique_errors"])
+    return case
+
+
+def _error_rollup(db, error_id: str) -> dict:
+    return db[Collections.ErrorRollups].find_one({"error_id": error_id})
+
+
+def test_contributions_are_never_negative(sample_case):
+    contrib = case_contributions(sample_case["procedure"], sample_case["unique_errors"])
+    assert any(e["total_duration_s"] < 0 for e in sample_case["unique_errors"])  # unclosed entries
+
+    for totals in _flatten(contrib).values():
+        assert all(n >= 0 for n in totals.values())
+    for ops in rollup_updates(contribution_delta({}, contrib)).values():
+        assert all(n >= 0 for op in ops for n in op._doc["$inc"].values())
+
+    error_912 = [totals for (col, key), totals in _flatten(contrib).items()
+                 if col == Collections.ErrorRollups and key[0] == "912"]
+    assert error_912 == [{"cases": 1, "occurrences": 4, "total_duration_s": 2336, "unclosed_occurrences": 1}]
+
+
+def test_first_ingest_stores_the_contribution(mock_db, sample_case):
+    changed = apply_rollups(sample_case["lightning_name"], sample_case["rollups"])
+
+    assert changed == sum(len(rows) for rows in sample_case["rollups"].values())
+    assert _rollups(mock_db) == _flatten(sample_case["rollups"])
+    assert all(d.get("total_duration_s", 0) >= 0 for d in mock_db[Collections.ErrorRollups].find())
+    stored = mock_db[Collections.RollupContributions].find_one({"lightning_name": sample_case["lightning_name"]})
+    assert PENDING_FIELD not in stored
+
+
+def test_reingest_applies_the_delta_once(mock_db, sample_case):
+    name = sample_case["lightning_name"]
+    apply_rollups(name, sample_case["rollups"])
+    before = _error_rollup(mock_db, "912")
+
+    changed = _changed(sample_case, "912", 5)
+    assert apply_rollups(name, changed["rollups"]) == 1  # only error 912's rollup moves
+    assert apply_rollups(name, changed["rollups"]) == 0  # same contribution again: nothing to add
+
+    after = _error_rollup(mock_db, "912")
+    assert after["occurrences"] == before["occurrences"] + 5
+    assert after["cases"] == 1
+    assert _rollups(mock_db) == _flatten(changed["rollups"])
+
+
+def test_interrupted_update_forces_a_rebuild(mock_db, sample_case, monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    run_ingest.write_case(copy.deepcopy(sample_case))
+    changed = _changed(sample_case, "912", 5)
+
+    bulk_write = mongomock.collection.Collection.bulk_write
+
+    def crash(coll, *args, **kwargs):
+        if coll.name == Collections.ErrorRollups:
+            raise RuntimeError("connection lost")
+        return bulk_write(coll, *args, **kwargs)
+
+    monkeypatch.setattr(mongomock.collection.Collection, "bulk_write", crash)
+    result = run_ingest.write_case(copy.deepcopy(changed))
+    assert result["status"] == "partial"
+    monkeypatch.setattr(mongomock.collection.Collection, "bulk_write", bulk_write)
+
+    stored = mock_db[Collections.RollupContributions].find_one({"lightning_name": sample_case["lightning_name"]})
+    assert stored[PENDING_FIELD]
+    with pytest.raises(RuntimeError, match="rebuild_rollups"):
+        apply_rollups(sample_case["lightning_name"], changed["rollups"])
+
+    rebuild_rollups()
+    assert mock_db[Collections.RollupContributions].count_documents({PENDING_FIELD: {"$exists": True}}) == 0
+    assert _rollups(mock_db) == _flatten(changed["rollups"])
+    assert run_ingest.write_case(copy.deepcopy(changed))["status"] == "ok"
+    assert _rollups(mock_db) == _flatten(changed["rollups"])
+
+
+def test_rebuild_matches_incremental(mock_db, sample_case):
+    other = copy.deepcopy(sample_case)
+    other["lightning_name"] = other["procedure"]["lightningName"] = "PC-OTHER"
+    other["procedure"]["hospitalName"] = "Other Hospital"
+    for e in other["unique_errors"]:
+        e.update(lightning_name="PC-OTHER", hospital_name="Other Hospital")
+    other["rollups"] = case_contributions(other["procedure"], other["unique_errors"])
+
+    for case in (sample_case, _changed(sample_case, "912", 5), other, _changed(other, "912", -2)):
+        run_ingest.write_case(copy.deepcopy(case))
+    incremental = _rollups(mock_db)
+
+    rebuild_rollups()
+    assert _rollups(mock_db) == incremental
@@ -0,0 +1,104 @@
+"""
+test_run_ingest.py
+------------------
+run_ingest.py pieces around the writers: the parse_block metric labels
+and the single-case write path on a mongomock database.
+"""
+
+import pytest
+
+import run_ingest
+from conftest import SAMPLE_JSON, SAMPLE_TXT
+from utils.metrics import METRICS, STAGE_SECONDS
+from utils.mongo_connector import Collections, load_manifest
+from utils.txt_parser import iter_blocks_from_txt
+from extractors.block_classifier import QUARANTINE, TARGETS, configure_classifier
+from extractors.field_utils import BLOCK_FIELDS
+from extractors.magnetic_readings import MAGNETIC_BLOCK
+
+
+def _parse_block_labels() -> set:
+    return {h["labels"]["block_type"] for h in METRICS.summary()["histograms"]
+            if h["name"] == STAGE_SECONDS and h["labels"].get("stage") == "parse_block"}
+
+
+def test_parse_block_labels_are_bounded():
+    configure_classifier(QUARANTINE)
+    blocks = list(iter_blocks_from_txt(SAMPLE_TXT))
+    blocks += [["UNRECOGNISED HEADER 12345", "Foo: 1"], ["ANOTHER ONE 67890", "Bar: 2"]]
+    METRICS.reset()
+    try:
+        parsed, _, _, _ = run_ingest.parse_blocks(blocks, "PC-TEST")
+        labels = _parse_block_labels()
+    finally:
+        METRICS.reset()
+
+    assert any(doc.get("error_id") for _, _, doc in parsed)   # ERROR ID <n> headers were parsed
+    assert labels <= set(BLOCK_FIELDS) | set(TARGETS) | {Collections.Quarantine, "skipped", "other"}
+    assert Collections.Quarantine in labels
+    assert run_ingest._block_label({"event_type": "free header text"}) == "other"
+    assert run_ingest._block_label(None) == "skipped"
+
+
+def _sample_blocks():
+    configure_classifier(QUARANTINE)
+    parsed, _, _, _ = run_ingest.parse_blocks(iter_blocks_from_txt(SAMPLE_TXT), "PC-TEST")
+    return parsed
+
+
+@pytest.mark.parametrize("events_fail", [False, True])
+def test_magnetic_readings_follow_the_block_write(mock_db, monkeypatch, events_fail):
+    mongomock = pytest.importorskip("mongomock")
+    parsed = _sample_blocks()
+    assert any(doc.get("block_type") == MAGNETIC_BLOCK for _, _, doc in parsed)
+
+    saved = []
+    monkeypatch.setattr(run_ingest, "save_magnetic_readings", lambda doc: saved.append(doc["block_type"]))
+    if events_fail:
+        bulk_write = mongomock.collection.Collection.bulk_write
+
+        def crash(coll, *args, **kwargs):
+            if coll.name == Collections.Events:
+                raise RuntimeError("connection lost")
+            return bulk_write(coll, *args, **kwargs)
+
+        monkeypatch.setattr(mongomock.collection.Collection, "bulk_write", crash)
+
+    _, _, problems = run_ingest.save_parsed_docs(parsed)
+
+    failed = {pb["doc"].get("block_type") for pb in problems}
+    assert (MAGNETIC_BLOCK in failed) == events_fail
+    assert saved == ([] if events_fail else [MAGNETIC_BLOCK])
+
+
+def test_full_reingest_still_removes_stale_blocks(mock_db, sample_case):
+    name = sample_case["lightning_name"]
+    run_ingest.write_case(sample_case)
+    assert mock_db[Collections.MagneticReadings].count_documents({"meta.lightning_name": name}) > 0
+
+    blocks = [b for b in iter_blocks_from_txt(SAMPLE_TXT) if not b[0].upper().startswith(MAGNETIC_BLOCK)]
+    case = run_ingest.parse_case_data(run_ingest.load_json(SAMPLE_JSON), blocks, known=load_manifest(name),
+                                      incremental=False)
+    assert case["unchanged_blocks"] == 0   # --full: every block re-parsed
+    run_ingest.write_case(case)
+
+    assert load_manifest(name) <= case["fingerprints"]   # the removed block left the manifest too
+    assert mock_db[Collections.Events].count_documents({"lightning_name": name, "block_type": MAGNETIC_BLOCK}) == 0
+    assert mock_db[Collections.MagneticReadings].count_documents({"meta.lightning_name": name}) == 0
+
+
+def test_rollback_keeps_the_original_error(mock_db, sample_case, monkeypatch):
+    idx, header, doc = sample_case["parsed"][0]
+    sample_case["parsed"][0] = (idx, header, {**doc, "_collection": "NotACollection"})
+
+    result = run_ingest.write_case(sample_case, rollback=run_ingest.ROLLBACK_DELETE)
+
+    assert [pb["index"] for pb in result["problematic_blocks"]] == [idx]
+    assert "not allowed" in result["problematic_blocks"][0]["error"]
+    assert result["saved_blocks"] == len(sample_case["parsed"]) - 1
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("connection lost")
+
+    monkeypatch.setattr(run_ingest, "delete_block_docs", broken)
+    assert run_ingest.rollback_blocks(result["problematic_blocks"]) == {}
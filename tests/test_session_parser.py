@@ -0,0 +1,118 @@
+"""
+test_session_parser.py
+----------------------
+Line-level tests of the columnar session/timeline parser
+(extractors.session_parser) and of what parse_fields_inline_format keeps
+of the original bullet lines next to it.
+"""
+
+from datetime import datetime
+
+import pytest
+
+from extractors import field_parser
+from extractors.field_parser import parse_fields_inline_format
+from extractors.session_parser import TIMELINE_COLUMNS, parse_timeline, parse_timeline_line, timeline_rows
+
+T1 = datetime(2025, 7, 25, 8, 23, 45, 737000)
+T2 = datetime(2025, 7, 25, 9, 11, 8, 833000)
+
+
+def _row(**kw):
+    return {c: kw.get(c) for c in TIMELINE_COLUMNS}
+
+
+@pytest.mark.parametrize("line,record", [
+    ("• Session 1: 2025.07.25_08.23.45.737 to 2025.07.25_09.11.08.833 (Duration: 00:47:23)",
+     _row(event=1, ts=T1, kind="session", end_ts=T2, duration_s=2843)),
+    ("• Session 2: 2025.07.25_09.11.08.833 to 2025.07.25_08.23.45.737 (Duration: -00:47:23)",
+     _row(event=2, ts=T2, kind="session", end_ts=T1, duration_s=-2843)),
+    ("• Session 3: 2025.07.25_08.23.45.737 to 2025.07.25_08.23.45.737 (Duration: -00:00:05)",
+     _row(event=3, ts=T1, kind="session", end_ts=T1, duration_s=-5)),
+    ("• Session 4: 2025.07.25_08.23.45.737 to 2025.07.25_09.11.08.833 (Duration: 38:54:07)",
+     _row(event=4, ts=T1, kind="session", end_ts=T2, duration_s=140047)),
+    ("• Event 3: 2025.07.25_08.23.45.737 -     First reading: 392.944031 (Range: None, Variance: None)",
+     _row(event=3, ts=T1, channel=7, kind="reading", label="First reading", value=392.944031)),
+    ("• Event 4: 2025.07.25_08.23.45.737 -     Min value: -12.5",
+     _row(event=4, ts=T1, channel=7, kind="reading", label="Min value", value=-12.5)),
+    ("• Event 6: 2025.07.25_08.23.45.737 -     State: OK (Code: 0)",
+     _row(event=6, ts=T1, channel=7, kind="state", label="OK", code=0)),
+    ("• Event 6: 2025.07.25_08.23.45.737 -     ⚠️ State: SHORTED (Code: -2)",
+     _row(event=6, ts=T1, channel=7, kind="state", label="SHORTED", code=-2)),
+    ("• Event 58: 2025.07.25_08.23.45.737 -     🚨 DISCONNECTED: Impedance=6235.268066, Range=None, Variance=None",
+     _row(event=58, ts=T1, channel=7, kind="alert", label="DISCONNECTED", value=6235.268066)),
+    ("  - Event 1: 2025.07.25_08.23.45.737 - Connection: Catheter Connected [Catheter ID: 18046]",
+     _row(event=1, ts=T1, channel=7, kind="connection", label="Catheter Connected", connected=True)),
+    ("  - Event 2: 2025.07.25_08.23.45.737 - Connection: Catheter disconnected [Catheter ID: 18046]",
+     _row(event=2, ts=T1, channel=7, kind="connection", label="Catheter disconnected", connected=False)),
+    ("• Event 9: 2025.07.25_08.23.45.737 - Mapping started",
+     _row(event=9, ts=T1, channel=7, kind="event", label="Mapping started")),
+])
+def test_record_lines(line, record):
+    rec, channel = parse_timeline_line(line, channel=7)
+    assert rec == record
+    assert channel == 7
+
+
+def test_channel_lines_set_the_context():
+    rec, channel = parse_timeline_line("• Event 25: 2025.07.25_08.23.45.737 - Channel 3", channel=7)
+    assert rec == _row(event=25, ts=T1, channel=3, kind="channel")
+    assert channel == 3
+
+    for line, expected in [("• Channel 0", 0), ("•   Impedance Timeline (Channel 12):", 12),
+                           ("• Channel 18 (CRITICAL: 3 disconnects)", 18)]:
+        assert parse_timeline_line(line, channel=7) == (None, expected)
+
+
+@pytest.mark.parametrize("line", [
+    "• SUMMARY: 13 actual ablation sessions (from 26 events)",
+    "• Ablation Session Unknown",
+    "• Event 1: not a stamp - First reading: 1.0",
+    "• Session 1: 2025.07.25_08.23.45.737 to 2025.07.25_09.11.08.833",   # no duration
+])
+def test_unparsed_lines_keep_the_context(line):
+    assert parse_timeline_line(line, channel=7) == (None, 7)
+
+
+def test_parse_timeline_is_columnar():
+    lines = [
+        "• SUMMARY: 2 channels monitored",
+        "•   Impedance Timeline (Channel 0):",
+        "• Event 3: 2025.07.25_08.23.45.737 -     First reading: 392.944031 (Range: None, Variance: None)",
+        "• Event 4: 2025.07.25_09.11.08.833 -     Last reading: 614.049988 (Range: None, Variance: None)",
+        "• Event 25: 2025.07.25_09.11.08.833 - Channel 3",
+        "• Event 26: 2025.07.25_09.11.08.833 -     State: OK (Code: 0)",
+    ]
+    timeline, unparsed = parse_timeline(lines)
+
+    assert unparsed == lines[:2]
+    assert set(timeline) == {"event", "ts", "channel", "kind", "label", "value", "code"}  # all-None columns dropped
+    assert timeline["kind"] == ["reading", "reading", "channel", "state"]
+    assert timeline["channel"] == [0, 0, 3, 3]
+    assert timeline["value"] == [392.944031, 614.049988, None, None]
+
+    rows = list(timeline_rows(timeline))
+    assert rows[1] == _row(event=4, ts=T2, channel=0, kind="reading", label="Last reading", value=614.049988)
+    assert parse_timeline(lines[:2]) == (None, lines[:2])
+
+
+BODY = [
+    "Total Events: 2",
+    "Event Sessions:",
+    "• SUMMARY: 1 actual ablation sessions (from 2 events)",
+    "• Session 1: 2025.07.25_08.23.45.737 to 2025.07.25_09.11.08.833 (Duration: 00:47:23)",
+]
+
+
+def test_only_unconverted_lines_are_kept_by_default(monkeypatch):
+    monkeypatch.setattr(field_parser, "KEEP_RAW_TIMELINES", False)
+    doc, _ = parse_fields_inline_format(BODY, {"Total Events", "Event Sessions"})
+    assert doc["event_sessions"] == [BODY[2]]
+    assert doc["event_sessions_parsed"]["duration_s"] == [2843]
+
+
+def test_keep_raw_timelines(monkeypatch):
+    monkeypatch.setattr(field_parser, "KEEP_RAW_TIMELINES", True)
+    doc, _ = parse_fields_inline_format(BODY, {"Total Events", "Event Sessions"})
+    assert doc["event_sessions"] == BODY[2:]
+    assert doc["event_sessions_parsed"]["kind"] == ["session"]
@@ -0,0 +1,70 @@
+"""
+test_snapshot.py
+----------------
+utils.snapshot: export -> load round trip of the sample case on mongomock,
+and which E11000 conflicts a reload counts as duplicates.
+"""
+
+import pytest
+
+import run_ingest
+from schema_config import get_unique_keys
+from utils.mongo_connector import Collections
+from utils.snapshot import DUPLICATE_KEY, SNAPSHOT_COLLECTIONS, _id_conflict, export_snapshot, load_snapshot
+
+pytest.importorskip("pyarrow")
+
+
+def _unique_indexes(db):
+    for col in SNAPSHOT_COLLECTIONS:
+        keys = get_unique_keys(col)
+        if keys:
+            db[col].create_index([(k, 1) for k in keys], unique=True)
+
+
+def _dump(db) -> dict:
+    return {col: sorted(db[col].find(), key=lambda d: str(d["_id"])) for col in SNAPSHOT_COLLECTIONS}
+
+
+@pytest.mark.parametrize("err,verdict", [
+    ({"code": DUPLICATE_KEY, "keyPattern": {"_id": 1}, "errmsg": "E11000 duplicate key error"}, True),
+    ({"code": DUPLICATE_KEY, "keyPattern": {"lightning_name": 1, "error_ids": 1}, "errmsg": "E11000"}, False),
+    ({"code": DUPLICATE_KEY, "errmsg": "E11000 duplicate key error collection: db.Errors index: _id_ dup key"}, True),
+    ({"code": DUPLICATE_KEY, "errmsg": "E11000 duplicate key error collection: db.Errors index: "
+                                       "lightning_name_1_error_ids_1 dup key"}, False),
+    ({"code": DUPLICATE_KEY, "errmsg": "E11000 Duplicate Key Error"}, None),
+    ({"code": 121, "errmsg": "Document failed validation"}, False),
+])
+def test_id_conflict(err, verdict):
+    assert _id_conflict(err) is verdict
+
+
+def test_round_trip(mock_db, sample_case, tmp_path):
+    _unique_indexes(mock_db)
+    run_ingest.write_case(sample_case)
+    before = _dump(mock_db)
+
+    exported = export_snapshot(str(tmp_path))
+    assert exported == {col: len(docs) for col, docs in before.items()}
+    assert (tmp_path / "snapshot.json").exists()
+
+    for col in SNAPSHOT_COLLECTIONS:
+        mock_db[col].delete_many({})
+    loaded = load_snapshot(str(tmp_path))
+    assert loaded == {col: {"written": n, "duplicates": 0, "errors": 0} for col, n in exported.items()}
+    assert _dump(mock_db) == before
+
+    # again: every _id is already there
+    loaded = load_snapshot(str(tmp_path))
+    assert loaded == {col: {"written": 0, "duplicates": n, "errors": 0} for col, n in exported.items()}
+
+    # the same error block stored under a new _id: a unique-key conflict is an error, not a duplicate
+    doc = mock_db[Collections.Errors].find_one()
+    mock_db[Collections.Errors].delete_one({"_id": doc["_id"]})
+    mock_db[Collections.Errors].insert_one({k: v for k, v in doc.items() if k != "_id"})
+    loaded = load_snapshot(str(tmp_path), collections=[Collections.Errors])
+    assert loaded[Collections.Errors] == {"written": 0, "duplicates": exported[Collections.Errors] - 1, "errors": 1}
+
+    # upsert replaces on _id; the moved document still conflicts on its unique key
+    loaded = load_snapshot(str(tmp_path), collections=[Collections.Errors], upsert=True)
+    assert loaded[Collections.Errors]["errors"] == 1
@@ -0,0 +1,115 @@
+"""
+test_transactional_ingest.py
+----------------------------
+Transactional write_case (run_ingest.py --transactional).
+
+The database tests need a replica set and are skipped unless
+MONGODB_TEST_REPLSET_URI is set, e.g. for a local single node started with
+`mongod --replSet rs0` (then `rs.initiate()` once):
+
+    MONGODB_TEST_REPLSET_URI="mongodb://localhost:27017/?replicaSet=rs0" python -m pytest tests
+
+They write to a throwaway database (MONGODB_TEST_DB, default medical_db_tx_test)
+that is dropped afterwards.
+"""
+
+import os
+
+import pytest
+from pymongo.errors import OperationFailure
+
+import run_ingest
+from schema_config import ensure_collections_and_indexes
+from utils import mongo_connector
+from utils.mongo_connector import Collections, get_db
+from utils.rollups import ROLLUP_COLLECTIONS
+from extractors.block_classifier import QUARANTINE, configure_classifier
+
+REPLSET_URI = os.getenv("MONGODB_TEST_REPLSET_URI")
+TEST_DB = os.getenv("MONGODB_TEST_DB", "medical_db_tx_test")
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+needs_replset = pytest.mark.skipif(not REPLSET_URI, reason="MONGODB_TEST_REPLSET_URI not set (needs a replica set)")
+
+
+@pytest.fixture
+def replset_db(monkeypatch):
+    mongo_connector.close_client()
+    monkeypatch.setattr(mongo_connector, "MONGO_URI", REPLSET_URI)
+    monkeypatch.setattr(mongo_connector, "DB_NAME", TEST_DB)
+    db = get_db()
+    db.client.drop_database(TEST_DB)
+    ensure_collections_and_indexes(db)
+    yield db
+    db.client.drop_database(TEST_DB)
+    mongo_connector.close_client()
+
+
+def _sample_case():
+    configure_classifier(QUARANTINE)
+    return run_ingest.parse_case(os.path.join(DATA_DIR, "analysis.json"), os.path.join(DATA_DIR, "Bookmarks Data3.txt"))
+
+
+def _stored(db, lightning_name: str) -> dict:
+    counts = {Collections.Procedures: db[Collections.Procedures].count_documents({"lightningName": lightning_name})}
+    for col in (Collections.UniqueErrors, Collections.Errors, Collections.Catheter, Collections.Events,
+                Collections.Quarantine, Collections.IngestManifests, Collections.RollupContributions):
+        counts[col] = db[col].count_documents({"lightning_name": lightning_name})
+    for col in ROLLUP_COLLECTIONS:
+        counts[col] = db[col].count_documents({})
+    return counts
+
+
+@needs_replset
+def test_failing_block_leaves_nothing_behind(replset_db):
+    case = _sample_case()
+    case["parsed"].append((len(case["parsed"]) + 1, "BROKEN BLOCK",
+                           {"lightning_name": case["lightning_name"], "_collection": "NotAllowed"}))
+
+    with pytest.raises(RuntimeError, match="blocks failed to write"):
+        run_ingest.write_case(case, transactional=True)
+
+    assert set(_stored(replset_db, case["lightning_name"]).values()) == {0}
+
+
+@needs_replset
+def test_case_commits_together(replset_db):
+    case = _sample_case()
+    run_ingest.write_case(case, transactional=True)
+
+    stored = _stored(replset_db, case["lightning_name"])
+    assert stored[Collections.Procedures] == 1
+    assert stored[Collections.UniqueErrors] == len(case["unique_errors"])
+    assert stored[Collections.Errors] > 0
+    assert stored[Collections.RollupContributions] == 1
+
+
+class _ConflictingWriter:
+    """BulkWriter stand-in whose writes hit a transaction write conflict."""
+
+    errors = []
+
+    def __init__(self, session=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def add(self, doc, tag=None):
+        raise OperationFailure("WriteConflict", 112, {"errorLabels": ["TransientTransactionError"]})
+
+
+def test_session_write_error_keeps_transient_label(monkeypatch):
+    monkeypatch.setattr(run_ingest, "BulkWriter", _ConflictingWriter)
+    parsed = [(1, "ERROR ID 1", {"lightning_name": "PC-TEST", "_collection": Collections.Errors})]
+
+    with pytest.raises(OperationFailure) as raised:
+        run_ingest.save_parsed_docs(parsed, session=object())
+    assert raised.value.has_error_label("TransientTransactionError")
+
+    # outside a transaction the block is only reported as problematic
+    saved, skipped, problems = run_ingest.save_parsed_docs(parsed)
+    assert (saved, skipped, len(problems)) == (0, 1, 1)
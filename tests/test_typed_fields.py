@@ -0,0 +1,105 @@
+"""
+test_typed_fields.py
+--------------------
+extractors.typed_fields: the converters (to_seconds is also the uniqueErrors
+duration parser) and every FIELD_TYPES entry, including the ID fields that
+stay text because they are unique keys.
+"""
+
+from datetime import datetime
+
+import pytest
+
+from extractors.typed_fields import (
+    FIELD_TYPES, RAW_FIELDS_KEY, apply_field_types, to_count, to_datetime, to_id_list, to_seconds,
+)
+from utils.mongo_connector import Collections
+
+# converter -> (text, value) stored for it
+SAMPLE_TEXT = {
+    to_count: ("8 (Raw events)", 8),
+    to_seconds: ("36:04:32", 129872),
+    to_datetime: ("2025.07.23_19.04.10.487", datetime(2025, 7, 23, 19, 4, 10, 487000)),
+    to_id_list: ("18046 (SOUNDSTAR eco 8F), 18091 (QDOT MICRO)", [18046, 18091]),
+}
+
+FIELD_ENTRIES = [(block, field, name, convert)
+                 for block, fields in FIELD_TYPES.items() for field, (name, convert) in fields.items()]
+
+
+@pytest.mark.parametrize("text,seconds", [
+    ("36:04:32", 129872),     # H:MM:SS, hours past 24
+    ("0:00:01", 1),
+    ("01:00", 60),            # MM:SS
+    ("153:09", 9189),         # MM:SS, minutes past 60
+    ("-153:09", -9189),       # unclosed uniqueErrors entry
+    ("-1:00:00", -3600),
+    ("+01:30", 90),
+    (" - 02:00 ", -120),
+    ("5", 300),               # bare number: minutes
+    (5, 300),
+    (1.5, 90),
+    ("1:2:3:4", None),
+    ("1:5", None),            # seconds need two digits
+    ("", None),
+    (None, None),
+    ("Unknown", None),
+])
+def test_to_seconds(text, seconds):
+    assert to_seconds(text) == seconds
+
+
+def test_other_converters():
+    assert to_count("4 occurrences") == 4
+    assert to_count("13 (from 26 events)") == 13
+    assert to_count("Unknown") is None
+    assert to_datetime("25-Jul-2025 18:31:49") == datetime(2025, 7, 25, 18, 31, 49)
+    assert to_datetime("yesterday") is None
+    assert to_id_list("1115, 304") == [1115, 304]
+    assert to_id_list("none") is None
+
+
+@pytest.mark.parametrize("block,field,name,convert", FIELD_ENTRIES)
+def test_field_types(block, field, name, convert):
+    text, value = SAMPLE_TEXT[convert]
+    doc = apply_field_types({field: text, "block_type": "x"}, block, keep_raw=False)
+    assert doc[name] == value
+    assert RAW_FIELDS_KEY not in doc
+    if name != field:
+        assert field not in doc
+
+    kept = apply_field_types({field: text}, block, keep_raw=True)
+    assert kept[RAW_FIELDS_KEY] == {field: text}
+
+    failed = apply_field_types({field: "Unknown"}, block, keep_raw=False)
+    assert failed[name] is None
+    assert failed[RAW_FIELDS_KEY] == {field: "Unknown"}  # always kept when it doesn't convert
+
+
+def test_negative_total_duration():
+    doc = apply_field_types({"total_duration": "-0:01:05"}, "ERROR ID BLOCK", keep_raw=False)
+    assert doc == {"total_duration_s": -65}
+
+
+@pytest.mark.parametrize("block,field", [("ERROR ID BLOCK", "error_ids"), ("CATHETER DETAIL BLOCK", "catheter_ids")])
+def test_unique_key_ids_stay_text(block, field):
+    assert field not in FIELD_TYPES[block]
+    assert apply_field_types({field: "18091"}, block, keep_raw=False) == {field: "18091"}
+
+
+def test_unknown_block_type_gets_the_common_fields():
+    doc = apply_field_types({"total_events": "3", "total_duration": "00:10", "custom": "7"}, "RUNTIME BLOCK",
+                            keep_raw=False)
+    assert doc == {"total_events": 3, "total_duration_s": 10, "custom": "7"}
+
+
+def test_sample_case_types(sample_case):
+    docs = [doc for _, _, doc in sample_case["parsed"]]
+    for doc in docs:
+        if doc["_collection"] == Collections.Errors:
+            assert isinstance(doc["error_ids"], str)
+        if doc["_collection"] == Collections.Catheter:
+            assert isinstance(doc["catheter_ids"], str)
+        if "total_duration_s" in doc:
+            assert doc["total_duration_s"] is None or isinstance(doc["total_duration_s"], int)
+    assert any(isinstance(doc.get("error_ids"), list) for doc in docs)  # ERROR EVENTS summary block
@@ -0,0 +1,277 @@
+"""
+analytics.py
+------------
+Cross-case analytics on columnar tables instead of per-document loops.
+Selected fields are pulled from MongoDB in raw BSON batches
+(find_raw_batches + projection) into typed pyarrow tables; the computations are
+NumPy / pyarrow.compute kernels over whole columns.
+
+    from utils.analytics import error_cooccurrence, cooccurrence_matrix, impedance_drift, catheter_connections
+
+    pairs = error_cooccurrence(cache=True)          # error_a, error_b, cases
+    ids, matrix = cooccurrence_matrix(pairs)        # square NumPy matrix
+    impedance_drift()                               # per magnetic channel: last - first reading
+    catheter_connections()                          # per catheter: connect sessions / durations
+
+Every function takes an optional MongoDB filter, and with cache=True keeps
+its result as Parquet under ANALYTICS_CACHE_DIR for ANALYTICS_CACHE_TTL
+seconds (refresh=True recomputes). Needs numpy and pyarrow
+(pip install numpy pyarrow); the ingest doesn't.
+"""
+
+import functools
+import hashlib
+import itertools
+import json
+import logging
+import os
+import time
+
+import bson
+
+try:  # optional: analytics only
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    np = pa = pc = pq = None
+
+from utils.metrics import METRICS
+from utils.mongo_connector import Collections, get_db
+
+ANALYTICS_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", "5000"))
+ANALYTICS_CACHE_DIR = os.getenv("ANALYTICS_CACHE_DIR", "analytics_cache")
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "3600"))
+
+CATHETER_SESSIONS = "catheter_connection_and_disconnection_event_sessions_parsed"
+
+
+def analytics_available() -> bool:
+    return pa is not None and np is not None
+
+
+def _require():
+    if not analytics_available():
+        raise RuntimeError("utils.analytics needs numpy and pyarrow (pip install numpy pyarrow)")
+
+
+# ------------------ columnar fetch ------------------
+
+def get_path(doc: dict, path: str):
+    for part in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+
+def iter_batches(coll, flt: dict, projection: dict, batch_size: int):
+    """
+    Lists of documents, one per server batch: raw BSON batches decoded in one
+    bson.decode_all call each, or a projection cursor where find_raw_batches
+    isn't available (mongomock).
+    """
+    try:
+        raw_batches = coll.find_raw_batches(flt, projection, batch_size=batch_size)
+    except (AttributeError, NotImplementedError):
+        cursor = iter(coll.find(flt, projection, batch_size=batch_size))
+        while True:
+            docs = list(itertools.islice(cursor, batch_size))
+            if not docs:
+                return
+            yield docs
+    for raw in raw_batches:
+        yield bson.decode_all(raw)
+
+
+def fetch_table(collection: str, fields: dict, schema, flt: dict = None,
+                batch_size: int = ANALYTICS_BATCH_SIZE):
+    """
+    Pull fields of every matching document into a pyarrow table.
+
+    Args:
+        collection (str): source collection
+        fields (dict): column name -> document path ('meta.channel')
+        schema (pa.Schema): column types (columns in `fields` order)
+        flt (dict): MongoDB filter
+        batch_size (int): documents per server batch
+
+    Returns:
+        pa.Table
+    """
+    _require()
+    projection = {"_id": 0, **{path: 1 for path in fields.values()}}
+    chunks = {name: [] for name in fields}
+    rows = 0
+    for docs in iter_batches(get_db()[collection], flt or {}, projection, batch_size):
+        for name, path in fields.items():
+            chunks[name].append(pa.array([get_path(d, path) for d in docs], type=schema.field(name).type))
+        rows += len(docs)
+    METRICS.inc("analytics_docs", rows, collection=collection)
+    return pa.Table.from_arrays(
+        [pa.chunked_array(chunks[name], type=schema.field(name).type) for name in fields], schema=schema)
+
+
+# ------------------ parquet cache ------------------
+
+def _cache_path(name: str, params: dict) -> str:
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(ANALYTICS_CACHE_DIR, f"{name}-{digest}.parquet")
+
+
+def parquet_cached(fn):
+    """
+    Adds cache=False / refresh=False keyword arguments: with cache=True the
+    resulting table is read from / written to a Parquet file keyed by the
+    function name and its arguments, valid for ANALYTICS_CACHE_TTL seconds.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, cache: bool = False, refresh: bool = False, **kwargs):
+        _require()
+        if not cache:
+            with METRICS.time("analytics", query=fn.__name__):
+                return fn(*args, **kwargs)
+        path = _cache_path(fn.__name__, {"args": args, "kwargs": kwargs})
+        if not refresh and os.path.exists(path) and time.time() - os.path.getmtime(path) < ANALYTICS_CACHE_TTL:
+            METRICS.inc("analytics_cache", result="hit", query=fn.__name__)
+            return pq.read_table(path)
+        METRICS.inc("analytics_cache", result="miss", query=fn.__name__)
+        with METRICS.time("analytics", query=fn.__name__):
+            table = fn(*args, **kwargs)
+        os.makedirs(ANALYTICS_CACHE_DIR, exist_ok=True)
+        tmp = f"{path}.tmp"
+        pq.write_table(table, tmp)
+        os.replace(tmp, path)
+        logging.info(f"analytics: cached {fn.__name__} ({table.num_rows} rows) at {path}")
+        return table
+    return wrapper
+
+
+# ------------------ error co-occurrence ------------------
+
+@parquet_cached
+def error_cooccurrence(flt: dict = None):
+    """
+    Number of cases in which each pair of errorIds appears together
+    (analysis.json uniqueErrors, any phase, closed or not).
+
+    Returns:
+        pa.Table: error_a, error_b (error_a <= error_b; a == b: cases with that error), cases
+    """
+    t = fetch_table(Collections.UniqueErrors, {"lightning_name": "lightning_name", "error_id": "error_id"},
+                    pa.schema([("lightning_name", pa.string()), ("error_id", pa.string())]), flt)
+    t = t.drop_null()
+    cases, case_idx = np.unique(t["lightning_name"].to_numpy(zero_copy_only=False), return_inverse=True)
+    errors, error_idx = np.unique(t["error_id"].to_numpy(zero_copy_only=False), return_inverse=True)
+
+    incidence = np.zeros((len(cases), len(errors)), dtype=np.int32)
+    incidence[case_idx, error_idx] = 1  # several phases of one case count once
+    together = incidence.T @ incidence
+
+    a, b = np.triu_indices(len(errors))
+    counts = together[a, b]
+    keep = counts > 0
+    return pa.table({
+        "error_a": pa.array(errors[a[keep]], type=pa.string()),
+        "error_b": pa.array(errors[b[keep]], type=pa.string()),
+        "cases": pa.array(counts[keep], type=pa.int64()),
+    })
+
+
+def cooccurrence_matrix(pairs):
+    """error_cooccurrence table → (error ids, symmetric NumPy matrix of case counts)."""
+    _require()
+    a = pairs["error_a"].to_numpy(zero_copy_only=False)
+    b = pairs["error_b"].to_numpy(zero_copy_only=False)
+    ids, idx = np.unique(np.concatenate([a, b]), return_inverse=True)
+    ia, ib = idx[:len(a)], idx[len(a):]
+    matrix = np.zeros((len(ids), len(ids)), dtype=np.int64)
+    counts = pairs["cases"].to_numpy()
+    matrix[ia, ib] = counts
+    matrix[ib, ia] = counts
+    return ids, matrix
+
+
+# ------------------ impedance drift ------------------
+
+def _reading_schema():
+    return pa.schema([("lightning_name", pa.string()), ("channel", pa.int64()),
+                      ("label", pa.string()), ("ts", pa.timestamp("ms")), ("value", pa.float64())])
+
+
+@parquet_cached
+def impedance_drift(flt: dict = None, per_case: bool = False):
+    """
+    Impedance drift of the magnetic sensor channels: last minus first reading
+    of every channel in every case (MagneticReadings), summarized per channel
+    across cases (one row per case and channel with per_case=True).
+
+    Returns:
+        pa.Table: [lightning_name,] channel, cases, drift_mean, drift_min, drift_max, drift_per_hour_mean
+    """
+    query = {"kind": "reading", "label": {"$in": ["First reading", "Last reading"]}, **(flt or {})}
+    t = fetch_table(Collections.MagneticReadings,
+                    {"lightning_name": "meta.lightning_name", "channel": "meta.channel",
+                     "label": "label", "ts": "ts", "value": "value"},
+                    _reading_schema(), query)
+    keys = ["lightning_name", "channel"]
+    t = t.sort_by([("ts", "ascending")])
+
+    def edge(label, how):  # earliest 'First reading' / latest 'Last reading' of each case × channel
+        rows = t.filter(pc.equal(t["label"], label))
+        agg = rows.group_by(keys, use_threads=False).aggregate([("ts", how), ("value", how)])
+        return agg.rename_columns([{f"ts_{how}": "ts", f"value_{how}": "value"}.get(c, c) for c in agg.column_names])
+
+    pairs = edge("First reading", "first").join(edge("Last reading", "last"), keys,
+                                                left_suffix="_first", right_suffix="_last", join_type="inner")
+
+    drift = pc.subtract(pairs["value_last"], pairs["value_first"])
+    hours = pc.divide(pc.cast(pc.milliseconds_between(pairs["ts_first"], pairs["ts_last"]), pa.float64()),
+                      3_600_000.0)
+    per_hour = pc.if_else(pc.greater(hours, 0), pc.divide(drift, hours), pa.scalar(None, pa.float64()))
+    pairs = pairs.append_column("drift", drift).append_column("drift_per_hour", per_hour)
+
+    group = ["lightning_name", "channel"] if per_case else ["channel"]
+    out = pairs.group_by(group).aggregate([
+        ("drift", "count"), ("drift", "mean"), ("drift", "min"), ("drift", "max"), ("drift_per_hour", "mean"),
+    ])
+    out = out.rename_columns([{"drift_count": "cases"}.get(c, c) for c in out.column_names])
+    return out.sort_by([(c, "ascending") for c in group])
+
+
+# ------------------ catheter connections ------------------
+
+@parquet_cached
+def catheter_connections(flt: dict = None):
+    """
+    Connect sessions of every catheter across cases, from the parsed
+    connection/disconnection timelines of the Catheter blocks.
+
+    Returns:
+        pa.Table: catheter_id, part_number, cases, sessions, connected_s_total, connected_s_mean, connected_s_max
+    """
+    t = fetch_table(Collections.Catheter,
+                    {"lightning_name": "lightning_name", "catheter_id": "catheter_ids",
+                     "part_number": "part_number", "duration_s": f"{CATHETER_SESSIONS}.duration_s"},
+                    pa.schema([("lightning_name", pa.string()), ("catheter_id", pa.string()),
+                               ("part_number", pa.string()), ("duration_s", pa.list_(pa.int64()))]), flt)
+    durations = t["duration_s"].combine_chunks()
+    rows = pc.list_parent_indices(durations)
+    sessions = pa.table({
+        "catheter_id": t["catheter_id"].take(rows),
+        "part_number": t["part_number"].take(rows),
+        "lightning_name": t["lightning_name"].take(rows),
+        "duration_s": pc.list_flatten(durations),
+    })
+    sessions = sessions.filter(pc.is_valid(sessions["duration_s"]))  # event rows of the timeline have none
+
+    out = sessions.group_by(["catheter_id", "part_number"]).aggregate([
+        ("lightning_name", "count_distinct"), ("duration_s", "count"),
+        ("duration_s", "sum"), ("duration_s", "mean"), ("duration_s", "max"),
+    ])
+    names = {"lightning_name_count_distinct": "cases", "duration_s_count": "sessions",
+             "duration_s_sum": "connected_s_total", "duration_s_mean": "connected_s_mean",
+             "duration_s_max": "connected_s_max"}
+    out = out.rename_columns([names.get(c, c) for c in out.column_names])
+    return out.sort_by([("connected_s_total", "descending")])
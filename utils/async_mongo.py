@@ -0,0 +1,183 @@
+"""
+async_mongo.py
+--------------
+Async counterparts of the mongo_connector write helpers, for the asyncio
+ingest pipeline (run_ingest_async.py).
+
+Uses PyMongo's native async client (PyMongo >= 4.10); falls back to Motor.
+With neither installed the module still imports, and get_async_db() raises.
+"""
+
+import asyncio
+import logging
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+from schema_config import get_timeseries_spec
+from utils.metrics import METRICS
+from utils.rollups import (
+    PENDING_FIELD, contribution_delta, rollup_updates, _contributions_update, _pending_update, _previous_contribution,
+)
+from utils.mongo_connector import (
+    MONGO_URI, DB_NAME, BulkWriter, Collections, BLOCK_COLLECTIONS, _ensure_allowed, client_options,
+    _manifest_update, _stale_filter, reconcile_manifest, _ledger_update, LEDGER_OK, _unique_errors_stale_filter,
+)
+
+try:
+    from pymongo import AsyncMongoClient
+except ImportError:  # older PyMongo → Motor
+    try:
+        from motor.motor_asyncio import AsyncIOMotorClient as AsyncMongoClient
+    except ImportError:
+        AsyncMongoClient = None
+
+ASYNC_CLIENT_MISSING = ("The async ingest needs PyMongo >= 4.10 (AsyncMongoClient) or Motor: "
+                        "pip install 'pymongo>=4.10' (or pip install motor)")
+
+_async_client = None
+
+
+def get_async_db():
+    """Lazily create the process' async client (must be called inside the running loop)."""
+    global _async_client
+    if AsyncMongoClient is None:
+        raise RuntimeError(ASYNC_CLIENT_MISSING)
+    if _async_client is None:
+        _async_client = AsyncMongoClient(MONGO_URI, **client_options())
+    return _async_client[DB_NAME]
+
+
+async def close_async_client():
+    global _async_client
+    if _async_client is not None:
+        res = _async_client.close()
+        if asyncio.iscoroutine(res):
+            await res
+        _async_client = None
+
+
+class AsyncBulkWriter(BulkWriter):
+    """
+    BulkWriter whose flush is awaited: add() only buffers, flush() sends every
+    collection's buffered batches concurrently with unordered bulk_write.
+    Per-document errors end up in `errors` exactly as with BulkWriter.
+
+    Usage (the sync close() / `with` would leave the buffers unwritten, so they raise):
+        async with AsyncBulkWriter(adb) as w:
+            w.add(doc, tag=block_index)
+    """
+
+    def __init__(self, adb, batch_size: int = None):
+        super().__init__(batch_size=batch_size, max_delay=float("inf"))
+        self.adb = adb
+
+    def add(self, doc: dict, tag=None):
+        self._buffer(doc, tag)
+
+    async def flush(self, collection: str = None):
+        cols = [collection] if collection else list(self._buffers)
+        batches = []
+        for col in cols:
+            buf = self._buffers.get(col) or []
+            self._buffers[col] = []
+            for start in range(0, len(buf), self.batch_size):
+                batches.append((col, buf[start:start + self.batch_size]))
+        await asyncio.gather(*(self._write_batch_async(col, buf) for col, buf in batches))
+
+    async def aclose(self):
+        await self.flush()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+        return False
+
+    def close(self):
+        raise TypeError("AsyncBulkWriter must be closed with 'await aclose()' or used with 'async with'")
+
+    def __enter__(self):
+        raise TypeError("use 'async with AsyncBulkWriter(...)'")
+
+    def __exit__(self, exc_type, exc, tb):
+        raise TypeError("use 'async with AsyncBulkWriter(...)'")
+
+    async def _write_batch_async(self, col, buf):
+        failed = {}
+        try:
+            with METRICS.time("mongo_bulk_write", collection=col):
+                res = await self.adb[col].bulk_write([op for op, _, _ in buf], ordered=False)
+            details = res.bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+            for err in details.get("writeErrors", []):
+                failed[err.get("index")] = err.get("errmsg")
+        except Exception as e:
+            details = {}
+            failed = {i: str(e) for i in range(len(buf))}
+        self._record(col, buf, details, failed)
+
+
+async def replace_timeseries_async(adb, collection: str, meta_filter: dict, docs) -> int:
+    """Async mongo_connector.replace_timeseries: delete by metaField filter, then insert_many."""
+    _ensure_allowed(collection)
+    meta_field = get_timeseries_spec(collection).get("metaField", "meta")
+    await adb[collection].delete_many({f"{meta_field}.{k}": v for k, v in meta_filter.items()})
+
+    payload = [{k: v for k, v in d.items() if k != "_collection"} for d in docs]
+    if not payload:
+        return 0
+    res = await adb[collection].insert_many(payload, ordered=False)
+    logging.info(f"Saved {len(res.inserted_ids)} docs to {collection} for {meta_filter}")
+    return len(res.inserted_ids)
+
+
+async def prune_unique_errors_async(adb, lightning_name: str, docs) -> int:
+    """Delete the case's UniqueErrors docs that `docs` (the current entries) no longer list."""
+    res = await adb[Collections.UniqueErrors].delete_many(_unique_errors_stale_filter(lightning_name, docs))
+    return res.deleted_count
+
+
+async def apply_rollups_async(adb, lightning_name: str, contrib: dict) -> int:
+    """Async utils.rollups.apply_rollups."""
+    contrib_col = adb[Collections.RollupContributions]
+    prev = await contrib_col.find_one_and_update(
+        {"lightning_name": lightning_name}, _pending_update(), {"contributions": 1, PENDING_FIELD: 1},
+        upsert=True, return_document=ReturnDocument.BEFORE)
+    delta = contribution_delta(_previous_contribution(lightning_name, prev), contrib)
+    updates = rollup_updates(delta)
+    await asyncio.gather(*(adb[col].bulk_write(ops, ordered=False) for col, ops in updates.items()))
+    await contrib_col.update_one({"lightning_name": lightning_name}, _contributions_update(contrib), upsert=True)
+    return sum(len(ops) for ops in updates.values())
+
+
+async def load_manifest_async(adb, lightning_name: str) -> set:
+    """Async mongo_connector.load_manifest."""
+    m = await adb[Collections.IngestManifests].find_one({"lightning_name": lightning_name}, {"fingerprints": 1})
+    return set(m.get("fingerprints", [])) if m else set()
+
+
+async def update_manifest_async(adb, lightning_name: str, known: set, seen: set, written: set) -> int:
+    """Async mongo_connector.update_manifest."""
+    manifest, stale = reconcile_manifest(known, seen, written)
+    deleted = 0
+    if stale:
+        flt = _stale_filter(lightning_name, stale)
+        results = await asyncio.gather(*(adb[col].delete_many(flt) for col in BLOCK_COLLECTIONS))
+        deleted = sum(r.deleted_count for r in results)
+        logging.info(f"Deleted {deleted} stale block docs for {lightning_name}")
+    await adb[Collections.IngestManifests].update_one(
+        {"lightning_name": lightning_name}, _manifest_update(manifest), upsert=True
+    )
+    return deleted
+
+
+async def find_ingested_async(adb, digests) -> dict:
+    """Async mongo_connector.find_ingested."""
+    cur = adb[Collections.IngestLedger].find({"digest": {"$in": list(digests)}, "status": LEDGER_OK}, {"_id": 0})
+    return {e["digest"]: e for e in await cur.to_list(length=None)}
+
+
+async def record_ingest_async(adb, digest: str, entry: dict) -> None:
+    """Async mongo_connector.record_ingest."""
+    await adb[Collections.IngestLedger].update_one({"digest": digest}, _ledger_update(entry), upsert=True)
@@ -0,0 +1,147 @@
+"""
+block_index.py
+--------------
+Byte-offset index of the header/underline blocks in a Bookmarks TXT file.
+
+The file is scanned through mmap (no full decode, no line list) and each
+block is recorded as (header, header_start, body_start, body_end), with the
+same boundaries as utils.txt_parser.iter_blocks_from_txt. The index is kept
+in a sidecar '<txt>.idx.json' and reused while the TXT size/mtime match, so a
+single block ('ERROR ID 105', 'CATHETER ID 18046 ...') can be re-read by
+header without touching the rest of the file.
+
+Note: line ends are '\\n' or '\\r\\n' (as in CARTO exports); bare '\\r' is not supported.
+"""
+
+import io
+import json
+import mmap
+import os
+import re
+
+INDEX_VERSION = 1
+SIDECAR_SUFFIX = ".idx.json"
+
+# same rule as txt_parser.is_equals_line, applied to raw bytes
+_UNDERLINE_RE = re.compile(rb"^[ \t\f\v]*={3,}[ \t\f\v\r]*$", re.MULTILINE)
+
+
+def _header_key(header: str) -> str:
+    return header.strip().rstrip(":").strip().upper()
+
+def _line_start(mm, pos: int) -> int:
+    """Offset of the start of the line that contains pos-1 (i.e. the line before offset pos)."""
+    if pos <= 0:
+        return 0
+    return mm.rfind(b"\n", 0, pos - 1) + 1
+
+def _decode_line(raw: bytes) -> str:
+    return raw.rstrip(b"\n").rstrip(b"\r").decode("utf-8")
+
+def _file_stamp(txt_path: str) -> dict:
+    st = os.stat(txt_path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+def sidecar_path(txt_path: str) -> str:
+    return txt_path + SIDECAR_SUFFIX
+
+
+def build_block_index(txt_path: str) -> dict:
+    """Scan txt_path via mmap and return its block index (does not write the sidecar)."""
+    stamp = _file_stamp(txt_path)
+    blocks = []
+    if stamp["size"] == 0:
+        return {"version": INDEX_VERSION, **stamp, "blocks": blocks}
+
+    with open(txt_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        size = len(mm)
+        current = None  # [header, header_start, body_start]
+
+        for m in _UNDERLINE_RE.finditer(mm):
+            ul_start = m.start()
+            if ul_start == 0:
+                continue  # an underline on the first line has no header
+
+            header_start = _line_start(mm, ul_start)
+            if current is not None:
+                # body ends two lines before this underline (drops the header and the line before it)
+                body_end = max(current[2], _line_start(mm, header_start))
+                blocks.append(current + [body_end])
+
+            nl = mm.find(b"\n", m.end())
+            body_start = size if nl < 0 else nl + 1
+            header = _decode_line(mm[header_start:ul_start])
+            current = [header, header_start, body_start]
+
+        if current is not None:
+            blocks.append(current + [size])
+
+    blocks = [b for b in blocks if b[0].strip()]
+    return {"version": INDEX_VERSION, **stamp, "blocks": blocks}
+
+
+def load_block_index(txt_path: str, rebuild: bool = False) -> dict:
+    """Return the block index from the sidecar, (re)building it when missing or stale."""
+    path = sidecar_path(txt_path)
+    if not rebuild and os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                index = json.load(fh)
+            if index.get("version") == INDEX_VERSION and all(
+                    index.get(k) == v for k, v in _file_stamp(txt_path).items()):
+                return index
+        except (OSError, ValueError):
+            pass
+
+    index = build_block_index(txt_path)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(index, fh, ensure_ascii=False)
+    os.replace(tmp, path)
+    return index
+
+
+def find_block_entries(index: dict, header: str) -> list:
+    """
+    Index entries whose header matches `header` (case-insensitive, trailing ':' ignored).
+    Falls back to a prefix match, so 'CATHETER ID 18046' finds the full catheter header.
+    """
+    key = _header_key(header)
+    exact = [b for b in index["blocks"] if _header_key(b[0]) == key]
+    if exact:
+        return exact
+    return [b for b in index["blocks"] if _header_key(b[0]).startswith(key)]
+
+
+def read_block(txt_path: str, header: str, index: dict = None, occurrence: int = 0):
+    """
+    Read one block ([header] + body lines) by header, decoding only its own bytes.
+    Returns None if the header is not in the file.
+    """
+    index = index or load_block_index(txt_path)
+    entries = find_block_entries(index, header)
+    if len(entries) <= occurrence:
+        return None
+
+    block_header, _, body_start, body_end = entries[occurrence]
+    with open(txt_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        body = mm[body_start:body_end].decode("utf-8")
+
+    lines = [ln.rstrip("\n") for ln in io.StringIO(body, newline=None)]
+    return [block_header] + lines
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("usage: python -m utils.block_index <txt_path> [header]")
+        sys.exit(1)
+
+    idx = load_block_index(sys.argv[1])
+    if len(sys.argv) == 2:
+        for h, _, start, end in idx["blocks"]:
+            print(f"{start:>10} {end:>10}  {h}")
+    else:
+        block = read_block(sys.argv[1], sys.argv[2], index=idx)
+        print("\n".join(block) if block else f"Block '{sys.argv[2]}' not found")
@@ -0,0 +1,43 @@
+"""
+fingerprint.py
+--------------
+Content fingerprints of TXT blocks, for incremental re-ingest: a block whose
+normalized text hashes to a fingerprint already listed in the case's
+manifest (IngestManifests) is stored unchanged and is not parsed again.
+A whole JSON/TXT pair is identified by case_digest (see IngestLedger).
+"""
+
+import hashlib
+import os
+
+# Bump when the extractors change the documents they produce, so every
+# fingerprint (and every ledger digest) changes and cases are re-parsed.
+PARSER_VERSION = "5"
+
+
+def normalize_block(block_lines) -> str:
+    """Header + body with trailing whitespace and trailing blank lines removed."""
+    lines = [ln.rstrip() for ln in block_lines]
+    while lines and not lines[-1]:
+        lines.pop()
+    if lines:
+        lines[0] = lines[0].strip()
+    return "\n".join(lines)
+
+
+def block_fingerprint(block_lines) -> str:
+    """SHA-256 of the normalized block text (and the parser version)."""
+    h = hashlib.sha256(f"v{PARSER_VERSION}\n".encode("utf-8"))
+    h.update(normalize_block(block_lines).encode("utf-8"))
+    return h.hexdigest()
+
+
+def case_digest(json_path: str, txt_path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 over both files (and the parser version): identifies one exact JSON/TXT pair."""
+    h = hashlib.sha256(f"v{PARSER_VERSION}\n".encode("utf-8"))
+    for path in (json_path, txt_path):
+        h.update(f"{os.path.getsize(path)}\n".encode("utf-8"))
+        with open(path, "rb") as fh:
+            for chunk in iter(lambda: fh.read(chunk_size), b""):
+                h.update(chunk)
+    return h.hexdigest()
@@ -0,0 +1,137 @@
+"""
+index_advisor.py
+----------------
+Runs explain() on a registered set of representative queries (the read
+paths of utils.queries, the rollup lookups and the usual dashboard filters)
+and reports, per query, the winning plan: which index it uses, or whether it
+falls back to a COLLSCAN or an in-memory SORT. Non-unique, non-TTL indexes
+that no registered query uses are listed as unused, with their $indexStats
+operation count since the server started.
+
+    python advise_indexes.py [--strict]
+
+Register a query here whenever a new read path is added, with sample values
+shaped like the real ones (the plan doesn't depend on the data).
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+from schema_config import ALLOWED_COLLECTIONS
+from utils.mongo_connector import Collections, get_db
+
+_SINCE = datetime(2025, 1, 1)
+
+# (description, collection, filter, sort, projection)
+REPRESENTATIVE_QUERIES = [
+    ("case summary: newest procedure", Collections.Procedures,
+     {"lightningName": "PC-001927524"}, [("updated_at", -1)], {"hospitalName": 1}),
+    ("case summary: uniqueErrors", Collections.UniqueErrors,
+     {"lightning_name": "PC-001927524"}, [("phase", 1), ("closed", 1), ("error_id", 1)], None),
+    ("case summary: Errors of a case", Collections.Errors, {"lightning_name": "PC-001927524"}, None, None),
+    ("case summary: Catheter of a case", Collections.Catheter, {"lightning_name": "PC-001927524"}, None, None),
+    ("case summary: Events of a case", Collections.Events, {"lightning_name": "PC-001927524"}, None, None),
+    ("case summary: last ingest", Collections.IngestLedger,
+     {"lightning_name": "PC-001927524"}, [("ingested_at", -1)], None),
+    ("errors_by_id", Collections.UniqueErrors,
+     {"error_id": "912"}, [("procedure_date", -1), ("lightning_name", 1)], None),
+    ("errors_by_id per hospital", Collections.UniqueErrors,
+     {"error_id": "912", "hospital_name": "Stanford Hospital and Clinics"}, [("procedure_date", -1)], None),
+    ("unclosed errors of an errorId", Collections.UniqueErrors,
+     {"error_id": "912", "closed": False}, None, None),
+    ("TXT error blocks of an errorId", Collections.Errors, {"error_id": "912"}, None, None),
+    ("catheter_history", Collections.Catheter,
+     {"catheter_ids": "18091"}, [("first_occurrence", 1), ("lightning_name", 1)], None),
+    ("procedures of a hospital", Collections.Procedures,
+     {"hospitalName": "Stanford Hospital and Clinics"}, [("procedureDate", -1)], None),
+    ("procedures of a CARTO version", Collections.Procedures,
+     {"cartoVersion": "8.1.1.944"}, [("procedureDate", -1)], None),
+    ("procedures in a date range", Collections.Procedures,
+     {"procedureDate": {"$gte": _SINCE, "$lt": _SINCE + timedelta(days=31)}}, None, None),
+    ("procedures that used a catheter", Collections.Procedures, {"cathetersUsed.catheterID": "18091"}, None, None),
+    ("events of a type", Collections.Events, {"event_type": "Ablation procedure events"}, None, None),
+    ("error rollup point lookup", Collections.ErrorRollups,
+     {"error_id": "912", "hospital_name": "Stanford Hospital and Clinics", "month": "2025-07"}, None, None),
+    ("error rollups of a hospital/month", Collections.ErrorRollups,
+     {"hospital_name": "Stanford Hospital and Clinics", "month": "2025-07"}, None, None),
+    ("catheter rollup point lookup", Collections.CatheterRollups,
+     {"catheter_id": "18091", "part_number": "D-1395-04-S"}, None, None),
+    ("ingest ledger lookup", Collections.IngestLedger, {"digest": {"$in": ["0" * 64]}, "status": "ok"}, None, None),
+    ("ingest manifest", Collections.IngestManifests, {"lightning_name": "PC-001927524"}, None, None),
+    ("rollup contributions", Collections.RollupContributions, {"lightning_name": "PC-001927524"}, None, None),
+    ("magnetic readings of a channel", Collections.MagneticReadings,
+     {"meta.lightning_name": "PC-001927524", "meta.channel": 1, "ts": {"$gte": _SINCE}}, [("ts", 1)], None),
+]
+
+
+def _stages(plan: dict):
+    """Every stage of a winning plan (classic or SBE 'queryPlan' form), depth first."""
+    plan = plan.get("queryPlan", plan)
+    stack = [plan]
+    while stack:
+        stage = stack.pop()
+        yield stage
+        if "inputStage" in stage:
+            stack.append(stage["inputStage"])
+        stack.extend(stage.get("inputStages", []))
+
+
+def explain_query(db, collection: str, flt: dict, sort=None, projection=None) -> dict:
+    """
+    Returns:
+        dict: {"indexes": [names], "collscan": bool, "in_memory_sort": bool,
+               "docs_examined": int, "keys_examined": int}
+    """
+    cursor = db[collection].find(flt, projection)
+    if sort:
+        cursor = cursor.sort(sort)
+    explained = cursor.explain()
+    if "queryPlanner" not in explained:  # e.g. time-series: explained as an aggregation
+        explained = explained["stages"][0]["$cursor"]
+    stages = list(_stages(explained["queryPlanner"]["winningPlan"]))
+    stats = explained.get("executionStats", {})
+    return {
+        "indexes": [s["indexName"] for s in stages if s.get("indexName")],
+        "collscan": any(s.get("stage") == "COLLSCAN" for s in stages),
+        "in_memory_sort": any(s.get("stage") in ("SORT", "SORT_KEY_GENERATOR") for s in stages),
+        "docs_examined": stats.get("totalDocsExamined"),
+        "keys_examined": stats.get("totalKeysExamined"),
+    }
+
+
+def index_usage(db, collection: str) -> dict:
+    """index name -> ops since the server started ($indexStats; {} when unavailable)."""
+    try:
+        return {s["name"]: s["accesses"]["ops"] for s in db[collection].aggregate([{"$indexStats": {}}])}
+    except Exception as e:
+        logging.warning(f"$indexStats unavailable for {collection}: {e}")
+        return {}
+
+
+def advise(db=None, queries=REPRESENTATIVE_QUERIES) -> dict:
+    """
+    Explain every registered query and collect index usage.
+
+    Returns:
+        dict: {"queries": [{"description", "collection", **explain_query}],
+               "unused": [(collection, index, ops or None)]}
+    """
+    db = db if db is not None else get_db()
+    results, used = [], set()
+    for description, col, flt, sort, projection in queries:
+        try:
+            plan = explain_query(db, col, flt, sort, projection)
+        except Exception as e:
+            plan = {"error": str(e)}
+        results.append({"description": description, "collection": col, **plan})
+        used.update((col, name) for name in plan.get("indexes", []))
+
+    unused = []
+    for col in ALLOWED_COLLECTIONS:
+        ops = index_usage(db, col)
+        for name, info in db[col].index_information().items():
+            # unique and TTL indexes earn their keep on writes / expiry
+            if name == "_id_" or (col, name) in used or info.get("unique") or "expireAfterSeconds" in info:
+                continue
+            unused.append((col, name, ops.get(name)))
+    return {"queries": results, "unused": unused}
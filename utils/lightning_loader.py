@@ -1,6 +1,162 @@
 import json
 
-def get_lightning_name(json_path: str) -> str:
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+try:
+    import ijson  # optional: incremental parsing of very large analysis.json exports
+except ImportError:
+    ijson = None
+
+_NAME_KEYS = ("Lightning Name", "lightningName")
+UNIQUE_ERRORS_PREFIX = "systemPerformanceAndErrorAnalysis.uniqueErrors"
+UNIQUE_ERRORS_PHASES = ("beforeInitialize", "afterInitialize")
+UNIQUE_ERRORS_KINDS = ("closedErrors", "unclosedErrors")
+# ijson prefix of the items of every uniqueErrors list → (phase, kind)
+_ERROR_ITEM_PREFIXES = {
+    f"{UNIQUE_ERRORS_PREFIX}.{phase}.{kind}.item": (phase, kind)
+    for phase in UNIQUE_ERRORS_PHASES for kind in UNIQUE_ERRORS_KINDS
+}
+
+
+def lightning_name_from(data: dict) -> str:
     return data.get("Lightning Name") or data.get("lightningName") or ""
+
+
+def streaming_available() -> bool:
+    return ijson is not None
+
+
+def load_analysis(json_path: str, on_unique_error=None) -> dict:
+    """
+    Parse analysis.json once.
+
+    on_unique_error: called as on_unique_error(phase, kind, entry) for every
+    uniqueErrors entry, e.g. ("afterInitialize", "closedErrors", {"errorId": 948, "count": 330, ...});
+    those entries are then left out of the returned tree (its uniqueErrors
+    lists are empty). With ijson installed the file is streamed, so an entry
+    is only held until the callback returns.
+    """
+    with open(json_path, "rb") as fh:
+        if on_unique_error is None:
+            return json.load(fh)
+        if ijson is None:
+            data = json.load(fh)
+            _pop_unique_errors(data, on_unique_error)
+            return data
+
+        builder = ijson.ObjectBuilder()
+        item, key, depth = None, None, 0
+        for prefix, event, value in ijson.parse(fh, use_float=True):
+            if item is None:
+                key = _ERROR_ITEM_PREFIXES.get(prefix)
+                if key is None:
+                    builder.event(event, value)
+                    continue
+                if event not in ("start_map", "start_array"):
+                    on_unique_error(*key, value)  # scalar list item
+                    continue
+                item, depth = ijson.ObjectBuilder(), 0
+            item.event(event, value)
+            if event in ("start_map", "start_array"):
+                depth += 1
+            elif event in ("end_map", "end_array"):
+                depth -= 1
+                if depth == 0:
+                    on_unique_error(*key, item.value)
+                    item = None
+        return builder.value
+
+
+def _pop_unique_errors(data: dict, on_unique_error):
+    """load_analysis without ijson: hand the entries of an already-parsed tree over and empty its lists."""
+    lists = (data.get("systemPerformanceAndErrorAnalysis") or {}).get("uniqueErrors")
+    if not isinstance(lists, dict):
+        return
+    for phase in UNIQUE_ERRORS_PHASES:
+        for kind in UNIQUE_ERRORS_KINDS:
+            group = lists.get(phase)
+            if not isinstance(group, dict) or not isinstance(group.get(kind), list):
+                continue
+            for entry in group[kind]:
+                on_unique_error(phase, kind, entry)
+            group[kind] = []
+
+
+def get_lightning_name(json_path: str) -> str:
+    """lightningName only; the file is read just up to that key (with ijson, else _name_from_head)."""
+    if ijson is None:
+        with open(json_path, "r", encoding="utf-8") as fh:
+            return _name_from_head(fh)
+    with open(json_path, "rb") as fh:
+        events = ijson.parse(fh)
+        for prefix, event, value in events:
+            if prefix == "" and event == "map_key" and value in _NAME_KEYS:
+                _, event, value = next(events)
+                if event == "string" and value:
+                    return value
+    return ""
+
+
+_WS = " \t\n\r"
+
+
+def _name_from_head(fh, chunk_size: int = 1 << 16) -> str:
+    """
+    get_lightning_name without ijson: decode the top-level object one key/value
+    pair at a time, reading more of the file only while the next value is
+    incomplete, and stop at the name key (CARTO puts it near the top).
+    """
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+
+    def more() -> bool:
+        nonlocal buf, eof, chunk_size
+        data = fh.read(chunk_size)
+        chunk_size *= 2  # a large value before the name is re-decoded O(log n) times, not per chunk
+        eof = not data
+        buf += data
+        return not eof
+
+    def skip_ws():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _WS:
+                pos += 1
+            if pos < len(buf) or not more():
+                return
+
+    def decode():
+        nonlocal pos
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                if not more():
+                    raise
+                continue
+            if end < len(buf) or not more():  # a number at the end of the buffer may go on
+                pos = end
+                return value
+
+    try:
+        skip_ws()
+        if buf[pos:pos + 1] != "{":
+            return ""
+        pos += 1
+        while True:
+            skip_ws()
+            if buf[pos:pos + 1] == "}":
+                return ""
+            key = decode()
+            skip_ws()
+            if buf[pos:pos + 1] != ":":
+                return ""
+            pos += 1
+            skip_ws()
+            value = decode()
+            if key in _NAME_KEYS and isinstance(value, str) and value:
+                return value
+            skip_ws()
+            if buf[pos:pos + 1] != ",":
+                return ""
+            pos += 1
+    except ValueError:
+        return ""
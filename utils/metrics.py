@@ -0,0 +1,247 @@
+"""
+metrics.py
+----------
+In-process ingest metrics: per-stage timers (histograms), counters and
+value histograms, exportable as a JSON summary or Prometheus text format.
+
+    from utils.metrics import METRICS
+
+    with METRICS.time("json_load"):
+        j = json.load(fh)
+    METRICS.inc("bytes_read", os.path.getsize(path), kind="json")
+
+Stage timings go to the `ingest_stage_seconds` histogram (label `stage`);
+counters are exported as `ingest_<name>_total`. Worker processes ship their
+metrics back with drain() → merge().
+"""
+
+import bisect
+import cProfile
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+# seconds; the last bucket is +Inf
+TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 10, 50, 100, 250, 500, 1000, 5000, 10000)
+STAGE_SECONDS = "stage_seconds"
+PREFIX = "ingest_"
+
+
+class Histogram:
+    def __init__(self, buckets=TIME_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "Histogram"):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        for v in (other.min, other.max):
+            if v is not None:
+                self.min = v if self.min is None else min(self.min, v)
+                self.max = v if self.max is None else max(self.max, v)
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "min": self.min,
+            "max": self.max,
+            "mean": self.sum / self.count if self.count else None,
+            "buckets": {str(le): n for le, n in zip(self.buckets + ("+Inf",), self.counts)},
+        }
+
+
+def _labels_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _prom_labels(labels, extra=()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Metrics:
+    """Thread-safe registry of counters and histograms keyed by (name, labels)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}    # (name, labels) -> number
+        self._histograms = {}  # (name, labels) -> Histogram
+
+    def inc(self, name: str, value=1, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets=TIME_BUCKETS, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram(buckets)
+            hist.observe(value)
+
+    @contextmanager
+    def time(self, stage: str, **labels):
+        """Observe the duration of the with-block in ingest_stage_seconds{stage=...}."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(STAGE_SECONDS, time.perf_counter() - started, stage=stage, **labels)
+
+    def timed_iter(self, iterable, stage: str, **labels):
+        """Yield from iterable, timing only the time spent producing items (e.g. reading the TXT)."""
+        it = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            self.observe(STAGE_SECONDS, time.perf_counter() - started, stage=stage, **labels)
+            yield item
+
+    # ---- transfer between processes ----
+
+    def drain(self) -> dict:
+        """Picklable snapshot of everything recorded so far; the registry is reset."""
+        with self._lock:
+            snap = {"counters": self._counters, "histograms": self._histograms}
+            self._counters, self._histograms = {}, {}
+        return snap
+
+    def merge(self, snap: dict):
+        if not snap:
+            return
+        with self._lock:
+            for key, value in snap["counters"].items():
+                self._counters[key] = self._counters.get(key, 0) + value
+            for key, hist in snap["histograms"].items():
+                if key in self._histograms:
+                    self._histograms[key].merge(hist)
+                else:
+                    self._histograms[key] = hist
+
+    def reset(self):
+        self.drain()
+
+    # ---- export ----
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self._counters.items())
+                ],
+                "histograms": [
+                    {"name": name, "labels": dict(labels), **hist.to_dict()}
+                    for (name, labels), hist in sorted(self._histograms.items())
+                ],
+            }
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name in sorted({n for n, _ in self._counters}):
+                metric = f"{PREFIX}{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                for (n, labels), value in sorted(self._counters.items()):
+                    if n == name:
+                        lines.append(f"{metric}{_prom_labels(labels)} {value}")
+            for name in sorted({n for n, _ in self._histograms}):
+                metric = f"{PREFIX}{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                for (n, labels), hist in sorted(self._histograms.items()):
+                    if n != name:
+                        continue
+                    cumulative = 0
+                    for le, count in zip(hist.buckets + ("+Inf",), hist.counts):
+                        cumulative += count
+                        lines.append(f"{metric}_bucket{_prom_labels(labels, [('le', le)])} {cumulative}")
+                    lines.append(f"{metric}_sum{_prom_labels(labels)} {hist.sum}")
+                    lines.append(f"{metric}_count{_prom_labels(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def stage_report(self) -> list:
+        """[(stage + labels, count, total seconds, mean ms)] sorted by total time."""
+        rows = []
+        with self._lock:
+            for (name, labels), hist in self._histograms.items():
+                if name != STAGE_SECONDS:
+                    continue
+                labels = dict(labels)
+                stage = labels.pop("stage", "")
+                label = " ".join([stage] + [f"{k}={v}" for k, v in labels.items()])
+                rows.append((label, hist.count, hist.sum, 1000 * hist.sum / hist.count if hist.count else 0.0))
+        return sorted(rows, key=lambda r: -r[2])
+
+    def log_stage_report(self):
+        for label, count, total, mean_ms in self.stage_report():
+            logging.info(f"Stage {label}: {count} calls, {total:.3f}s total, {mean_ms:.2f}ms mean")
+
+
+METRICS = Metrics()
+
+def _forget_metrics_after_fork():
+    # a forked worker starts empty, so drain() only ships what it recorded itself
+    METRICS._lock = threading.Lock()
+    METRICS._counters, METRICS._histograms = {}, {}
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_metrics_after_fork)
+
+
+def export_metrics(json_path: str = None, prom_path: str = None, metrics: Metrics = METRICS):
+    """Write the JSON summary and/or the Prometheus text exposition."""
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as fh:
+            json.dump(metrics.summary(), fh, indent=2, default=str)
+        logging.info(f"Metrics written to {json_path}")
+    if prom_path:
+        with open(prom_path, "w", encoding="utf-8") as fh:
+            fh.write(metrics.to_prometheus())
+        logging.info(f"Prometheus metrics written to {prom_path}")
+
+
+@contextmanager
+def profiled(path: str = None, top: int = 25):
+    """
+    cProfile the with-block (this process/thread only) and dump pstats to path;
+    the top functions by cumulative time are logged. No-op without a path.
+    """
+    if not path:
+        yield
+        return
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        prof.dump_stats(path)
+        stats = pstats.Stats(prof)
+        stats.sort_stats("cumulative")
+        logging.info(f"Profile written to {path} (view: python -m pstats {path})")
+        print(f"Profile written to {path}")
+        stats.print_stats(top)
@@ -0,0 +1,209 @@
+"""
+queries.py
+----------
+Read side for dashboards and scripts: a few typed lookups that fetch only the
+fields they need (projections - never the `extra` dicts or the event-session
+arrays), hit the lightning_name-prefixed unique indexes from schema_config,
+and sit behind an in-process TTL/LRU cache.
+
+    from utils.queries import case_summary, errors_by_id, catheter_history
+
+    case_summary("PC-001927524")
+    errors_by_id("912", hospital_name="Stanford Hospital and Clinics")
+    catheter_history("18091")
+
+A cached result is dropped as soon as this process ingests its case
+(mongo_connector.notify_case_written); writes from other processes show up
+within QUERY_CACHE_TTL seconds. Results are shared between callers: treat
+them as read-only.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional, TypedDict
+
+from utils.metrics import METRICS
+from utils.mongo_connector import Collections, get_db, on_case_written
+
+QUERY_BATCH_SIZE = int(os.getenv("MONGODB_QUERY_BATCH_SIZE", "500"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "60"))
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "256"))
+
+
+# ------------------ result types ------------------
+
+class CaseSummary(TypedDict):
+    lightning_name: str
+    procedure: dict        # PROCEDURE_FIELDS of the newest Procedures doc
+    blocks: dict           # collection -> stored block documents
+    errors: List[dict]     # UniqueErrors entries (UNIQUE_ERROR_FIELDS)
+    ingest: Optional[dict]  # newest IngestLedger entry
+
+
+class ErrorOccurrence(TypedDict, total=False):
+    lightning_name: str
+    hospital_name: str
+    procedure_date: datetime
+    phase: str
+    closed: bool
+    error_id: str
+    message: str
+    count: int
+    total_duration_s: int
+    max_duration_s: int
+
+
+class CatheterUse(TypedDict, total=False):
+    lightning_name: str
+    catheter_ids: str
+    event_type: str
+    part_number: str
+    clinical_category: str
+    total_events: int
+    first_occurrence: datetime
+    last_occurrence: datetime
+    total_duration_s: int
+
+
+# ------------------ projections ------------------
+
+PROCEDURE_FIELDS = (
+    "lightningName", "hospitalName", "Country", "cartoVersion", "workstationModel", "procedureDate",
+    "primaryArrhythmia", "targetedChamber", "procedureTime", "numberOfAblationSessions",
+    "numberOfMapsCreated", "totalPointsCollected", "uniqueErrorsCount",
+    "cathetersUsed.catheterID", "cathetersUsed.name", "cathetersUsed.partNumber",
+)
+UNIQUE_ERROR_FIELDS = tuple(ErrorOccurrence.__annotations__)
+CATHETER_FIELDS = tuple(CatheterUse.__annotations__)
+LEDGER_FIELDS = ("status", "ingested_at", "total_blocks", "saved_blocks", "problematic_blocks", "parser_version")
+
+
+def _projection(fields) -> dict:
+    return {"_id": 0, **{f: 1 for f in fields}}
+
+
+# ------------------ cache ------------------
+
+ALL_CASES = "*"  # tag of results that span every case (any ingest invalidates them)
+
+
+class TTLCache:
+    """
+    LRU cache whose entries expire after `ttl` seconds and are tagged with
+    the lightning_names they were read from (ALL_CASES for cross-case results).
+
+    Loaders run outside the lock. Every invalidation bumps a generation
+    counter of the tags it drops, and a value whose tag was invalidated while
+    it was loading is returned to its caller but not cached (it may predate
+    the write that invalidated it).
+    """
+
+    def __init__(self, maxsize: int = QUERY_CACHE_SIZE, ttl: float = QUERY_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, tag, value)
+        self._generations = {}         # tag -> invalidations since the last clear
+        self._clears = 0               # invalidate() without a name
+
+    def _generation(self, tag: str) -> tuple:
+        return self._clears, self._generations.get(tag, 0)
+
+    def get_or_load(self, key, tag: str, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                METRICS.inc("query_cache", result="hit", query=key[0])
+                return entry[2]
+            generation = self._generation(tag)
+        METRICS.inc("query_cache", result="miss", query=key[0])
+
+        with METRICS.time("query", query=key[0]):
+            value = loader()
+        with self._lock:
+            if self._generation(tag) != generation:
+                METRICS.inc("query_cache", result="discarded", query=key[0])
+                return value
+            self._entries[key] = (time.monotonic() + self.ttl, tag, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, lightning_name: str = None):
+        """Drop that case's entries and every cross-case entry (no name: drop everything)."""
+        with self._lock:
+            if lightning_name is None:
+                self._entries.clear()
+                self._generations.clear()
+                self._clears += 1
+                return
+            for tag in (lightning_name, ALL_CASES):
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+            for key in [k for k, (_, tag, _) in self._entries.items() if tag in (lightning_name, ALL_CASES)]:
+                del self._entries[key]
+
+
+CACHE = TTLCache()
+on_case_written(CACHE.invalidate)
+
+
+# ------------------ queries ------------------
+
+def case_summary(lightning_name: str) -> Optional[CaseSummary]:
+    """Procedure fields, stored block counts, uniqueErrors and last ingest of one case (None if unknown)."""
+    def load():
+        db = get_db()
+        proc = db[Collections.Procedures].find_one(
+            {"lightningName": lightning_name}, _projection(PROCEDURE_FIELDS), sort=[("updated_at", -1)]
+        )
+        if proc is None:
+            return None
+        errors = list(db[Collections.UniqueErrors].find(
+            {"lightning_name": lightning_name}, _projection(UNIQUE_ERROR_FIELDS), batch_size=QUERY_BATCH_SIZE
+        ).sort([("phase", 1), ("closed", 1), ("error_id", 1)]))
+        blocks = {
+            col: db[col].count_documents({"lightning_name": lightning_name})
+            for col in (Collections.Errors, Collections.Catheter, Collections.Events, Collections.Quarantine)
+        }
+        ingest = db[Collections.IngestLedger].find_one(
+            {"lightning_name": lightning_name}, _projection(LEDGER_FIELDS), sort=[("ingested_at", -1)]
+        )
+        return {"lightning_name": lightning_name, "procedure": proc, "blocks": blocks,
+                "errors": errors, "ingest": ingest}
+
+    return CACHE.get_or_load(("case_summary", lightning_name), lightning_name, load)
+
+
+def errors_by_id(error_id, hospital_name: str = None, limit: int = 1000) -> List[ErrorOccurrence]:
+    """uniqueErrors entries of one errorId across cases, newest procedure first."""
+    error_id = str(error_id).strip()
+
+    def load():
+        flt = {"error_id": error_id}
+        if hospital_name is not None:
+            flt["hospital_name"] = hospital_name
+        cur = get_db()[Collections.UniqueErrors].find(
+            flt, _projection(UNIQUE_ERROR_FIELDS), batch_size=QUERY_BATCH_SIZE
+        ).sort([("procedure_date", -1), ("lightning_name", 1)]).limit(limit)
+        return list(cur)
+
+    return CACHE.get_or_load(("errors_by_id", error_id, hospital_name, limit), ALL_CASES, load)
+
+
+def catheter_history(catheter_id, limit: int = 1000) -> List[CatheterUse]:
+    """Catheter blocks of one catheter ID across cases, by first occurrence."""
+    catheter_id = str(catheter_id).strip()
+
+    def load():
+        cur = get_db()[Collections.Catheter].find(
+            {"catheter_ids": catheter_id}, _projection(CATHETER_FIELDS), batch_size=QUERY_BATCH_SIZE
+        ).sort([("first_occurrence", 1), ("lightning_name", 1)]).limit(limit)
+        return list(cur)
+
+    return CACHE.get_or_load(("catheter_history", catheter_id, limit), ALL_CASES, load)
@@ -0,0 +1,234 @@
+"""
+rollups.py
+----------
+Pre-aggregated totals maintained at ingest time, so dashboards read one
+small document instead of running a pipeline over Procedures/UniqueErrors:
+
+    ErrorRollups      (error_id, hospital_name, month)       cases, occurrences, unclosed_occurrences, total_duration_s
+    CatheterRollups   (catheter_id, part_number)             cases, connections
+    ProcedureRollups  (hospital_name, carto_version, month)  cases, ablation_sessions, maps_created,
+                                                             points_collected, unique_errors
+
+Ingest writes `$inc` bulk upserts. What each case added is kept in
+RollupContributions, so a re-ingest of a case only applies the difference
+(a changed analysis.json moves its counts, an unchanged one adds nothing).
+A key whose counts moved away stays, at zero, until the next rebuild.
+ErrorRollups.total_duration_s only sums closed errors: an unclosed entry's
+duration is negative in analysis.json (it never closed), so it is left out.
+
+Outside a transaction the `$inc` writes and the contribution update aren't
+atomic: the contribution is marked `pending_since` before the rollups move
+and unmarked with the new contribution. A marker left behind (crash or failed
+write in between) means the rollups no longer match the contributions, so
+the case's next apply_rollups raises until the rollups are rebuilt.
+
+    python rebuild_rollups.py    # recompute everything from Procedures + UniqueErrors
+"""
+
+import logging
+from collections import defaultdict
+from pymongo import ReturnDocument, UpdateOne
+from schema_config import get_unique_keys
+from utils.metrics import METRICS
+from utils.mongo_connector import Collections, get_db, now_utc
+
+ROLLUP_COLLECTIONS = (Collections.ErrorRollups, Collections.CatheterRollups, Collections.ProcedureRollups)
+PENDING_FIELD = "pending_since"
+
+
+def _month(dt):
+    return dt.strftime("%Y-%m") if hasattr(dt, "strftime") else None
+
+
+def _key(col: str, **fields) -> tuple:
+    return tuple(fields.get(k) for k in get_unique_keys(col))
+
+
+def case_contributions(proc_doc: dict, unique_errors) -> dict:
+    """
+    What one case adds to every rollup (no DB access).
+
+    Args:
+        proc_doc (dict): build_procedure_document output
+        unique_errors (list): build_unique_error_documents output
+
+    Returns:
+        dict: {collection: {key tuple (UNIQUE_KEYS order): {field: amount}}}
+    """
+    contrib = {col: defaultdict(lambda: defaultdict(int)) for col in ROLLUP_COLLECTIONS}
+    month = _month(proc_doc.get("procedureDate"))
+    hospital = proc_doc.get("hospitalName")
+
+    errors = contrib[Collections.ErrorRollups]
+    for e in unique_errors:
+        key = _key(Collections.ErrorRollups, error_id=e["error_id"], hospital_name=hospital, month=month)
+        totals = errors[key]
+        totals["cases"] = 1  # the same errorId in several phases is still one case
+        totals["occurrences"] += e.get("count") or 0
+        if e.get("closed") and (e.get("total_duration_s") or 0) > 0:
+            totals["total_duration_s"] += e["total_duration_s"]
+        if not e.get("closed"):
+            totals["unclosed_occurrences"] += e.get("count") or 0
+
+    catheters = contrib[Collections.CatheterRollups]
+    for c in proc_doc.get("cathetersUsed") or []:
+        if not c.get("catheterID"):
+            continue
+        key = _key(Collections.CatheterRollups, catheter_id=str(c["catheterID"]), part_number=c.get("partNumber"))
+        catheters[key]["cases"] = 1
+        catheters[key]["connections"] += len(c.get("connectionTimes") or [])
+
+    key = _key(Collections.ProcedureRollups, hospital_name=hospital, carto_version=proc_doc.get("cartoVersion"),
+               month=month)
+    totals = contrib[Collections.ProcedureRollups][key]
+    totals["cases"] = 1
+    totals["ablation_sessions"] = proc_doc.get("numberOfAblationSessions") or 0
+    totals["maps_created"] = proc_doc.get("numberOfMapsCreated") or 0
+    totals["points_collected"] = proc_doc.get("totalPointsCollected") or 0
+    totals["unique_errors"] = proc_doc.get("uniqueErrorsCount") or 0
+
+    # zero amounts are left out, like the fields a $inc never touched
+    return {col: {k: {f: n for f, n in v.items() if n} for k, v in rows.items()} for col, rows in contrib.items()}
+
+
+def _to_stored(contrib: dict) -> list:
+    """RollupContributions form (keys become documents)."""
+    return [
+        {"collection": col, "key": dict(zip(get_unique_keys(col), key)), "inc": totals}
+        for col, rows in contrib.items() for key, totals in rows.items()
+    ]
+
+
+def _from_stored(entries) -> dict:
+    contrib = {}
+    for e in entries or []:
+        col = e["collection"]
+        contrib.setdefault(col, {})[_key(col, **e["key"])] = e["inc"]
+    return contrib
+
+
+def contribution_delta(old: dict, new: dict) -> dict:
+    """new - old, per collection/key/field; zero amounts are dropped."""
+    delta = {}
+    for col in set(old) | set(new):
+        old_rows, new_rows = old.get(col, {}), new.get(col, {})
+        for key in set(old_rows) | set(new_rows):
+            o, n = old_rows.get(key, {}), new_rows.get(key, {})
+            inc = {f: n.get(f, 0) - o.get(f, 0) for f in set(o) | set(n)}
+            inc = {f: v for f, v in inc.items() if v}
+            if inc:
+                delta.setdefault(col, {})[key] = inc
+    return delta
+
+
+def rollup_updates(delta: dict) -> dict:
+    """{collection: [UpdateOne $inc upsert]} for a contribution delta."""
+    now = now_utc()
+    return {
+        col: [
+            UpdateOne(dict(zip(get_unique_keys(col), key)),
+                      {"$inc": inc, "$set": {"updated_at": now}, "$setOnInsert": {"created_at": now}},
+                      upsert=True)
+            for key, inc in rows.items()
+        ]
+        for col, rows in delta.items()
+    }
+
+
+def _contributions_update(contrib: dict) -> dict:
+    now = now_utc()
+    return {"$set": {"contributions": _to_stored(contrib), "updated_at": now}, "$unset": {PENDING_FIELD: ""},
+            "$setOnInsert": {"created_at": now}}
+
+
+def _pending_update() -> dict:
+    now = now_utc()
+    return {"$set": {PENDING_FIELD: now}, "$setOnInsert": {"created_at": now}}
+
+
+def _previous_contribution(lightning_name: str, prev) -> dict:
+    """Contribution stored before this apply; raises if an earlier apply was interrupted."""
+    if prev and prev.get(PENDING_FIELD):
+        raise RuntimeError(f"Rollups out of sync: an update for {lightning_name} was interrupted "
+                           f"({prev[PENDING_FIELD]:%Y-%m-%d %H:%M}); run rebuild_rollups.py")
+    return _from_stored(prev and prev.get("contributions"))
+
+
+def apply_rollups(lightning_name: str, contrib: dict, session=None) -> int:
+    """
+    Move the rollups from this case's previous contribution to `contrib`
+    (one unordered $inc bulk upsert per rollup collection). With a session
+    everything joins its transaction. The contribution is marked pending
+    first; if any write fails the marker stays and the error is raised
+    (see the module docstring).
+
+    Returns:
+        int: number of rollup documents changed
+    """
+    db = get_db()
+    with METRICS.time("mongo_rollups"):
+        prev = db[Collections.RollupContributions].find_one_and_update(
+            {"lightning_name": lightning_name}, _pending_update(), {"contributions": 1, PENDING_FIELD: 1},
+            upsert=True, return_document=ReturnDocument.BEFORE, session=session)
+        delta = contribution_delta(_previous_contribution(lightning_name, prev), contrib)
+        changed = 0
+        for col, ops in rollup_updates(delta).items():
+            db[col].bulk_write(ops, ordered=False, session=session)
+            changed += len(ops)
+        db[Collections.RollupContributions].update_one(
+            {"lightning_name": lightning_name}, _contributions_update(contrib), upsert=True, session=session)
+    METRICS.inc("rollup_updates", changed)
+    return changed
+
+
+def _latest_procedures(db):
+    """The newest Procedures doc per lightningName (a re-ingest inserts a new one)."""
+    return db[Collections.Procedures].aggregate([
+        {"$sort": {"updated_at": -1}},
+        {"$group": {"_id": "$lightningName", "doc": {"$first": "$$ROOT"}}},
+    ], allowDiskUse=True)
+
+
+def rebuild_rollups(batch_size: int = 1000) -> dict:
+    """
+    Recompute every rollup and RollupContributions from Procedures + UniqueErrors.
+    Run it while no ingest is writing: the rollups are replaced, not incremented.
+    Also clears the pending markers of interrupted apply_rollups calls.
+
+    Returns:
+        dict: documents written per collection
+    """
+    db = get_db()
+    unique_errors = defaultdict(list)
+    for e in db[Collections.UniqueErrors].find({}, {"_id": 0}, batch_size=batch_size):
+        unique_errors[e["lightning_name"]].append(e)
+
+    totals = {col: defaultdict(lambda: defaultdict(int)) for col in ROLLUP_COLLECTIONS}
+    contributions = []
+    for row in _latest_procedures(db):
+        lightning_name = row["_id"]
+        if not lightning_name:
+            continue
+        contrib = case_contributions(row["doc"], unique_errors.get(lightning_name, []))
+        for col, rows in contrib.items():
+            for key, inc in rows.items():
+                for field, amount in inc.items():
+                    totals[col][key][field] += amount
+        contributions.append(UpdateOne({"lightning_name": lightning_name}, _contributions_update(contrib),
+                                       upsert=True))
+
+    now = now_utc()
+    written = {}
+    for col in ROLLUP_COLLECTIONS + (Collections.RollupContributions,):
+        db[col].delete_many({})
+    for col, rows in totals.items():
+        docs = [{**dict(zip(get_unique_keys(col), key)), **inc, "created_at": now, "updated_at": now}
+                for key, inc in rows.items()]
+        for i in range(0, len(docs), batch_size):
+            db[col].insert_many(docs[i:i + batch_size], ordered=False)
+        written[col] = len(docs)
+    for i in range(0, len(contributions), batch_size):
+        db[Collections.RollupContributions].bulk_write(contributions[i:i + batch_size], ordered=False)
+    written[Collections.RollupContributions] = len(contributions)
+    logging.info(f"Rebuilt rollups: {written}")
+    return written
@@ -0,0 +1,257 @@
+"""
+snapshot.py
+-----------
+Parquet snapshots of the ingested cases, for offline analysis and for
+restoring / seeding a database without re-parsing the TXT exports.
+
+    python snapshot.py export snapshots/2025-10 [--collections Procedures Errors]
+    python snapshot.py load snapshots/2025-10 [--months 2025-07] [--upsert]
+
+Layout: one hive-partitioned Parquet dataset per collection,
+
+    <root>/<Collection>/month=2025-07/hospital=<hospitalName>/part-<batch>-<n>.parquet
+    <root>/snapshot.json   (documents per collection, export time, parser version)
+
+Block collections take month / hospital from their case's newest Procedures
+document ("unknown" without one). Every row holds the whole document as BSON
+(`doc`, restored as-is, _id included) next to a few typed columns for
+pyarrow / pandas (SNAPSHOT_COLUMNS).
+
+The loader writes large unordered batches (insert_many, or ReplaceOne upserts
+on _id). Ingest bookkeeping (IngestLedger / IngestManifests), MagneticReadings
+and the rollups are not part of a snapshot: run rebuild_rollups.py after a
+load; a case ingested again later is simply re-parsed.
+"""
+
+import json
+import logging
+import os
+import re
+
+import bson
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+
+try:  # optional: snapshots only
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = ds = None
+
+from utils.analytics import get_path, iter_batches
+from utils.fingerprint import PARSER_VERSION
+from utils.metrics import METRICS
+from utils.mongo_connector import Collections, get_db, notify_case_written, now_utc
+
+SNAPSHOT_BATCH_SIZE = int(os.getenv("SNAPSHOT_BATCH_SIZE", "10000"))
+SNAPSHOT_COLLECTIONS = (Collections.Procedures, Collections.Events, Collections.Errors, Collections.Catheter,
+                        Collections.UniqueErrors)
+UNKNOWN = "unknown"
+DUPLICATE_KEY = 11000
+
+# typed columns next to `doc`, per collection: column -> (document path, arrow type name)
+SNAPSHOT_COLUMNS = {
+    Collections.Procedures: {"cartoVersion": ("cartoVersion", "string"),
+                             "procedureDate": ("procedureDate", "timestamp"),
+                             "ablationSessions": ("numberOfAblationSessions", "int64"),
+                             "pointsCollected": ("totalPointsCollected", "int64"),
+                             "uniqueErrors": ("uniqueErrorsCount", "int64")},
+    Collections.Events: {"block_type": ("block_type", "string"), "total_events": ("total_events", "int64"),
+                         "total_duration_s": ("total_duration_s", "int64")},
+    Collections.Errors: {"error_id": ("error_id", "string"), "total_events": ("total_events", "int64"),
+                         "total_duration_s": ("total_duration_s", "int64"),
+                         "first_occurrence": ("first_occurrence", "timestamp")},
+    Collections.Catheter: {"catheter_ids": ("catheter_ids", "string"), "part_number": ("part_number", "string"),
+                           "total_duration_s": ("total_duration_s", "int64")},
+    Collections.UniqueErrors: {"error_id": ("error_id", "string"), "phase": ("phase", "string"),
+                               "closed": ("closed", "bool"), "count": ("count", "int64"),
+                               "total_duration_s": ("total_duration_s", "int64")},
+}
+
+
+def snapshot_available() -> bool:
+    return pa is not None
+
+
+def _require():
+    if not snapshot_available():
+        raise RuntimeError("Parquet snapshots need pyarrow (pip install pyarrow)")
+
+
+def _arrow_type(name: str):
+    return {"string": pa.string(), "int64": pa.int64(), "bool": pa.bool_(), "timestamp": pa.timestamp("ms")}[name]
+
+
+def _column(values, arrow_type):
+    """Typed column; values of another type (e.g. documents parsed before typed fields) become null."""
+    try:
+        return pa.array(values, type=arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        out = []
+        for v in values:
+            try:
+                pa.array([v], type=arrow_type)
+                out.append(v)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                out.append(None)
+        return pa.array(out, type=arrow_type)
+
+
+# ------------------ export ------------------
+
+def _month(dt) -> str:
+    return dt.strftime("%Y-%m") if hasattr(dt, "strftime") else UNKNOWN
+
+
+def case_partitions(db) -> dict:
+    """lightningName -> (month, hospital) from each case's newest Procedures document."""
+    rows = db[Collections.Procedures].aggregate([
+        {"$sort": {"updated_at": -1}},
+        {"$group": {"_id": "$lightningName", "procedureDate": {"$first": "$procedureDate"},
+                    "hospitalName": {"$first": "$hospitalName"}}},
+    ], allowDiskUse=True)
+    return {r["_id"]: (_month(r.get("procedureDate")), r.get("hospitalName") or UNKNOWN) for r in rows if r["_id"]}
+
+
+def _partition(col: str, doc: dict, cases: dict):
+    if col == Collections.Procedures:
+        return _month(doc.get("procedureDate")), doc.get("hospitalName") or UNKNOWN
+    return cases.get(doc.get("lightning_name"), (UNKNOWN, UNKNOWN))
+
+
+def _batch_table(col: str, docs, cases: dict):
+    name_field = "lightningName" if col == Collections.Procedures else "lightning_name"
+    parts = [_partition(col, d, cases) for d in docs]
+    columns = {
+        "lightning_name": pa.array([d.get(name_field) for d in docs], type=pa.string()),
+        "month": pa.array([p[0] for p in parts], type=pa.string()),
+        "hospital": pa.array([p[1] for p in parts], type=pa.string()),
+    }
+    for column, (path, type_name) in SNAPSHOT_COLUMNS.get(col, {}).items():
+        columns[column] = _column([get_path(d, path) for d in docs], _arrow_type(type_name))
+    columns["doc"] = pa.array([bson.encode(d) for d in docs], type=pa.binary())
+    return pa.table(columns)
+
+
+def export_snapshot(root: str, collections=SNAPSHOT_COLLECTIONS, batch_size: int = SNAPSHOT_BATCH_SIZE) -> dict:
+    """
+    Write every document of `collections` to <root>/<collection> (partitioned by month / hospital).
+
+    Returns:
+        dict: documents exported per collection
+    """
+    _require()
+    os.makedirs(root, exist_ok=True)
+    db = get_db()
+    cases = case_partitions(db)
+    exported = {}
+    for col in collections:
+        target = os.path.join(root, col)
+        if os.path.isdir(target) and os.listdir(target):
+            raise FileExistsError(f"{target} is not empty - export into a new snapshot root")
+        n = 0
+        with METRICS.time("snapshot_export", collection=col):
+            for i, docs in enumerate(iter_batches(db[col], {}, None, batch_size)):
+                ds.write_dataset(
+                    _batch_table(col, docs, cases), target, format="parquet",
+                    partitioning=["month", "hospital"], partitioning_flavor="hive",
+                    basename_template=f"part-{i}-{{i}}.parquet",
+                    existing_data_behavior="overwrite_or_ignore",
+                )
+                n += len(docs)
+        exported[col] = n
+        METRICS.inc("snapshot_docs", n, collection=col, direction="export")
+        logging.info(f"Exported {n} {col} documents to {target}")
+
+    with open(os.path.join(root, "snapshot.json"), "w", encoding="utf-8") as fh:
+        json.dump({"collections": exported, "exported_at": now_utc().isoformat(),
+                   "parser_version": PARSER_VERSION}, fh, indent=2)
+    return exported
+
+
+# ------------------ load ------------------
+
+def _id_conflict(err: dict):
+    """
+    Whether a writeError is an _id duplicate (True), another E11000 - a UNIQUE_KEYS
+    index - or a different error (False); None when the server doesn't name the index.
+    """
+    if err.get("code") != DUPLICATE_KEY:
+        return False
+    if err.get("keyPattern"):
+        return list(err["keyPattern"]) == ["_id"]
+    m = re.search(r"index: (\S+)", err.get("errmsg") or "")
+    return m.group(1) == "_id_" if m else None
+
+
+def _write(coll, docs, upsert: bool) -> dict:
+    """
+    One unordered batch. In insert mode documents whose _id is already stored are
+    counted as duplicates, not failures; any other error - including E11000 on a
+    unique key index (the same block under a new _id) - is an error.
+    """
+    try:
+        if upsert:
+            res = coll.bulk_write([ReplaceOne({"_id": d["_id"]}, d, upsert=True) for d in docs], ordered=False)
+            return {"written": res.upserted_count + res.matched_count, "duplicates": 0, "errors": 0}
+        res = coll.insert_many(docs, ordered=False)
+        return {"written": len(res.inserted_ids), "duplicates": 0, "errors": 0}
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        verdicts = [False if upsert else _id_conflict(err) for err in errors]
+        unnamed = [docs[err["index"]]["_id"] for err, v in zip(errors, verdicts) if v is None]
+        if unnamed:  # no index in the error: an _id conflict iff that _id is stored (this batch's insert failed)
+            stored = {d["_id"] for d in coll.find({"_id": {"$in": unnamed}}, {"_id": 1})}
+            verdicts = [docs[err["index"]]["_id"] in stored if v is None else v for err, v in zip(errors, verdicts)]
+        duplicates = sum(1 for v in verdicts if v)
+        for err, v in zip(errors, verdicts):
+            if not v:
+                logging.error(f"{coll.name} snapshot load error: {err.get('errmsg')}")
+        return {"written": len(docs) - len(errors), "duplicates": duplicates, "errors": len(errors) - duplicates}
+
+
+def load_snapshot(root: str, collections=SNAPSHOT_COLLECTIONS, months=None, hospitals=None,
+                  upsert: bool = False, batch_size: int = SNAPSHOT_BATCH_SIZE) -> dict:
+    """
+    Load a snapshot back into the database.
+
+    Args:
+        root (str): export_snapshot root
+        collections: collections to load (missing ones are skipped)
+        months / hospitals (list[str]): load only these partitions
+        upsert (bool): ReplaceOne on _id instead of insert_many (existing _ids are then replaced, not skipped)
+        batch_size (int): documents per unordered batch
+
+    Returns:
+        dict: {collection: {"written", "duplicates", "errors"}}
+    """
+    _require()
+    db = get_db()
+    flt = None
+    if months:
+        flt = ds.field("month").isin(list(months))
+    if hospitals:
+        by_hospital = ds.field("hospital").isin(list(hospitals))
+        flt = by_hospital if flt is None else flt & by_hospital
+
+    loaded = {}
+    for col in collections:
+        source = os.path.join(root, col)
+        if not os.path.isdir(source):
+            logging.warning(f"Snapshot {root} has no {col}")
+            continue
+        dataset = ds.dataset(source, format="parquet", partitioning="hive")
+        totals = {"written": 0, "duplicates": 0, "errors": 0}
+        with METRICS.time("snapshot_load", collection=col):
+            for batch in dataset.to_batches(columns=["doc"], filter=flt, batch_size=batch_size):
+                docs = [bson.decode(b) for b in batch.column(0).to_pylist()]
+                if not docs:
+                    continue
+                for k, v in _write(db[col], docs, upsert).items():
+                    totals[k] += v
+        loaded[col] = totals
+        METRICS.inc("snapshot_docs", totals["written"], collection=col, direction="load")
+        logging.info(f"Loaded {col} from {source}: {totals}")
+
+    notify_case_written(None)
+    return loaded
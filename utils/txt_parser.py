@@ -1,23 +1,46 @@
+from collections import deque
+
+
 def is_equals_line(line: str) -> bool:
     s = line.strip()
     return len(s) >= 3 and set(s) == {"="}
 
-def extract_blocks_from_txt(txt_path):
-    with open(txt_path, "r", encoding="utf-8") as f:
-        lines = [ln.rstrip("\n") for ln in f]
+def iter_blocks(lines):
+    """
+    Yield blocks ([header] + body lines) one at a time from an iterable of lines.
 
-    underline_idxs = [i for i, ln in enumerate(lines) if is_equals_line(ln) and i - 1 >= 0]
+    A block starts at a header/underline pair. Its body runs until two lines
+    before the next underline (the next header and the line preceding it are
+    not part of the body), or until the end for the last block - the same
+    boundaries extract_blocks_from_txt has always produced.
+    """
+    header = None      # header of the block being collected (None before the first underline)
+    body = []
+    pending = deque()  # last (up to) two body lines; dropped if an underline follows
+    prev = None        # previous line, candidate header for the next underline
 
-    blocks = []
-    for idx, ul_i in enumerate(underline_idxs):
-        header_i = ul_i - 1
-        next_ul = underline_idxs[idx + 1] if idx + 1 < len(underline_idxs) else None
+    for i, raw in enumerate(lines):
+        ln = raw.rstrip("\n")
 
-        start = ul_i + 1
-        end = len(lines) if next_ul is None else max(start, next_ul - 2)
+        if i >= 1 and is_equals_line(ln):
+            if header is not None and header.strip():
+                yield [header] + body
+            header, body = prev, []
+            pending.clear()
+        elif header is not None:
+            pending.append(ln)
+            if len(pending) > 2:
+                body.append(pending.popleft())
 
-        block = [lines[header_i]] + lines[start:end]
-        if block and block[0].strip():
-            blocks.append(block)
+        prev = ln
 
-    return blocks
+    if header is not None and header.strip():
+        yield [header] + body + list(pending)
+
+def iter_blocks_from_txt(txt_path):
+    """Yield blocks while reading txt_path (see iter_blocks)."""
+    with open(txt_path, "r", encoding="utf-8") as f:
+        yield from iter_blocks(f)
+
+def extract_blocks_from_txt(txt_path):
+    return list(iter_blocks_from_txt(txt_path))